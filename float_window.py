@@ -1,5 +1,5 @@
 import sys
-from PyQt5.QtCore import QDateTime, QObject, Qt, QPoint, QTimer, pyqtSignal
+from PyQt5.QtCore import QDateTime, QObject, Qt, QPoint, pyqtSignal
 from PyQt5.QtGui import QPainter, QColor, QBrush, QPen, QFont, QMouseEvent
 from PyQt5.QtWidgets import QApplication, QWidget, QHBoxLayout, QSlider, QPushButton
 
@@ -130,11 +130,8 @@ class FloatWindow(QWidget):
         self.progress_slider.sliderMoved.connect(self.seek_position)
         self.progress_slider.sliderPressed.connect(self.progress_pressed)
         self.progress_slider.sliderReleased.connect(self.progress_released)
-        
-        # 设置定时器更新进度
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_progress)
-        self.timer.start(500)  # 每500ms更新一次
+        # 进度由主窗口的播放时钟推送，不再单独轮询
+        self.update_progress()
         
     def toggle_play(self):
         if self.main_window.media_player.state() == self.main_window.media_player.PlayingState:
@@ -144,14 +141,12 @@ class FloatWindow(QWidget):
             self.main_window.play_song()
             self.play_btn.setText("❚❚")
             
-    def update_progress(self):
-        if (hasattr(self.main_window, 'media_player') and 
-            self.main_window.media_player.duration() > 0 and
-            not self.progress_slider.isSliderDown()):
-            
+    def update_progress(self, position=None, duration=None):
+        if position is None and hasattr(self.main_window, 'media_player'):
             position = self.main_window.media_player.position()
             duration = self.main_window.media_player.duration()
-            progress = int(1000 * position / duration) if duration > 0 else 0
+        if duration and duration > 0 and not self.progress_slider.isSliderDown():
+            progress = int(1000 * position / duration)
             self.progress_slider.setValue(progress)
             
             # 更新播放按钮状态
@@ -1,30 +1,48 @@
+import array
 import asyncio
+import atexit
+import base64
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import copy
 import datetime
+import difflib
 import hashlib
+import heapq
 import io
+import itertools
 import json
 import logging
+import multiprocessing
 import os
 import sqlite3
 import random
 import re
+import shutil
 import socket
 import ssl
 import subprocess
 import sys
 import time
 import traceback
+import unicodedata
 import urllib.parse
+import urllib.request
 import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 import aiofiles
 import aiohttp
 import httpx
-import requests
 import threading
 import numpy as np
 import websockets  
 import uuid     
+import weakref
+import xml.etree.ElementTree as ElementTree
+from xml.sax.saxutils import escape as xml_escape
 from float_window import FloatWindow
 from flask import Flask, request, jsonify, send_from_directory
 from bs4 import BeautifulSoup
@@ -33,21 +51,22 @@ from bilibili_api import Credential, video
 from bilibili_api.video import VideoDownloadURLDataDetecter
 from PIL import Image, ImageDraw, ImageFont
 from PyQt5.QtCore import (
-    QByteArray, QObject, QPoint, QSettings, QSize, Qt, QThread, QTimer, QUrl, pyqtSignal, QEvent
+    QAbstractListModel, QByteArray, QFileSystemWatcher, QModelIndex, QObject, QPoint, QRect, QSettings, QSize, Qt,
+    QThread, QTimer, QUrl, pyqtSignal, QEvent
 )
 from PyQt5.QtGui import (
-    QColor, QDesktopServices, QFont, QFontDatabase, QIcon, QImage, 
-    QPalette, QPen, QPixmap, QCursor
+    QColor, QDesktopServices, QFont, QFontDatabase, QFontMetricsF, QIcon, QImage,
+    QPainterPath, QPalette, QPen, QPixmap, QCursor
 )
-from PyQt5.QtMultimedia import QMediaContent, QMediaMetaData, QMediaPlayer
+from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer
 from PyQt5.QtWidgets import (
     QAbstractItemView, QAction, QApplication, QCheckBox, QColorDialog,
     QComboBox, QDialog, QDialogButtonBox, QFileDialog, QFontDialog, QFormLayout, QFrame,
     QGridLayout, QGroupBox, QHBoxLayout, QHeaderView, QInputDialog, QLabel, QLayout,
-    QLineEdit, QListWidget, QListWidgetItem, QMainWindow, QMenu, QMenuBar,
+    QLineEdit, QListView, QListWidget, QListWidgetItem, QMainWindow, QMenu, QMenuBar,
     QMessageBox, QPlainTextEdit, QProgressBar, QProgressDialog, QPushButton,
-    QScrollArea, QSlider, QSpinBox, QStatusBar, QTabWidget, QTableWidget,
-    QTableWidgetItem, QTextEdit, QTreeWidget, QVBoxLayout, QWidget, QTreeWidget
+    QScrollArea, QSizePolicy, QSlider, QSpinBox, QStatusBar, QTabWidget, QTableWidget,
+    QTableWidgetItem, QTextEdit, QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
 )
 from PyQt5.QtMultimediaWidgets import QVideoWidget
 from PyQt5.QtMultimedia import QAudioProbe, QAudioFormat
@@ -63,6 +82,12 @@ try:
 except ImportError:
     AUDIO_FEATURES_ENABLED = False
     logging.warning("librosa or scikit-learn not installed, audio feature extraction disabled")
+try:
+    import mutagen
+    MUTAGEN_AVAILABLE = True
+except ImportError:
+    MUTAGEN_AVAILABLE = False
+    logging.warning("mutagen not installed, audio tag reading disabled")
 
 # =============== 自定义事件类 ===============
 class PlayEvent(QEvent):
@@ -102,6 +127,12 @@ class PlayFileEvent(QEvent):
         super().__init__(PlayFileEvent.event_type)
         self.file_path = file_path
 
+class SearchEvent(QEvent):
+    event_type = QEvent.Type(QEvent.registerEventType())
+    def __init__(self, keyword):
+        super().__init__(SearchEvent.event_type)
+        self.keyword = keyword
+
 # =============== 设置管理功能 ===============
 def get_settings_path():
     """获取设置文件路径"""
@@ -233,49 +264,236 @@ def load_default_settings():
         "custom_tools": []
     }
 
-def load_settings():
-    """加载设置"""
-    settings_path = get_settings_path()
-    os.makedirs(os.path.dirname(settings_path), exist_ok=True)
-    
-    if not os.path.exists(settings_path):
-        logger.info("创建默认设置文件")
-        default_settings = load_default_settings()
-        save_settings(default_settings)
-        return default_settings
-    
-    try:
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-            
-            if "bilibili" not in settings:
-                settings["bilibili"] = {
-                    "cookie": "",
-                    "max_duration": 600
-                }
-            if "save_paths" not in settings:
-                settings["save_paths"] = load_default_settings()["save_paths"]
-            elif "videos" not in settings["save_paths"]:
-                settings["save_paths"]["videos"] = os.path.join(os.path.expanduser("~"), "Videos")
-            if "custom_tools" not in settings:
-                settings["custom_tools"] = []   
-            if "sources" not in settings:
-                settings["sources"] = load_default_settings()["sources"]
-            elif "sources_list" not in settings["sources"]:
-                settings["sources"]["sources_list"] = load_default_settings()["sources"]["sources_list"]
-    
+def _apply_settings_defaults(settings):
+    """补全旧版设置文件中缺失的字段"""
+    if "bilibili" not in settings:
+        settings["bilibili"] = {
+            "cookie": "",
+            "max_duration": 600
+        }
+    if "save_paths" not in settings:
+        settings["save_paths"] = load_default_settings()["save_paths"]
+    elif "videos" not in settings["save_paths"]:
+        settings["save_paths"]["videos"] = os.path.join(os.path.expanduser("~"), "Videos")
+    if "custom_tools" not in settings:
+        settings["custom_tools"] = []   
+    if "sources" not in settings:
+        settings["sources"] = load_default_settings()["sources"]
+    elif "sources_list" not in settings["sources"]:
+        settings["sources"]["sources_list"] = load_default_settings()["sources"]["sources_list"]
+    return settings
+
+def atomic_write_json(path, data, indent=4):
+    """以临时文件+重命名的方式原子写入JSON文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _write_settings_file(settings_path, settings):
+    """原子写入设置文件"""
+    atomic_write_json(settings_path, settings)
+
+class SettingsStore(QObject):
+    """进程内设置服务：启动时读取一次settings.json，之后所有读取都走内存，
+    写入经过防抖合并后再原子落盘"""
+    settings_changed = pyqtSignal(str)  # 变化的键路径，整体替换时为空字符串
+    _save_requested = pyqtSignal()
+
+    SAVE_DELAY_MS = 500
+
+    def __init__(self, settings_path=None, parent=None):
+        super().__init__(parent)
+        self.settings_path = settings_path or get_settings_path()
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._data = self._read_from_disk()
+
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(self.SAVE_DELAY_MS)
+        self._save_timer.timeout.connect(self.flush)
+        # 工作线程里的写入通过排队信号回到定时器所在线程
+        self._save_requested.connect(self._start_save_timer)
+
+    def _read_from_disk(self):
+        """从磁盘读取设置，文件不存在时写入默认设置"""
+        if not os.path.exists(self.settings_path):
+            logger.info("创建默认设置文件")
+            settings = load_default_settings()
+            try:
+                _write_settings_file(self.settings_path, settings)
+            except Exception as e:
+                logger.error(f"保存设置失败: {str(e)}")
             return settings
-    except Exception as e:
-        logging.error(f"加载设置失败: {str(e)}，使用默认设置")
-        return load_default_settings()
+        try:
+            with open(self.settings_path, 'r', encoding='utf-8') as f:
+                return _apply_settings_defaults(json.load(f))
+        except Exception as e:
+            logger.error(f"加载设置失败: {str(e)}，使用默认设置")
+            return load_default_settings()
+
+    def _start_save_timer(self):
+        self._save_timer.start()
+
+    def _schedule_save(self):
+        self._dirty = True
+        if QApplication.instance() is None:
+            # 没有事件循环时无法防抖，直接落盘
+            self.flush()
+        else:
+            self._save_requested.emit()
+
+    def _resolve(self, key_path):
+        node = self._data
+        for part in key_path.split("."):
+            if not isinstance(node, dict) or part not in node:
+                return None, False
+            node = node[part]
+        return node, True
+
+    def snapshot(self):
+        """返回当前设置的完整副本"""
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def get(self, key_path, default=None):
+        """按点分路径读取设置，如 get("other.max_results", 20)"""
+        with self._lock:
+            value, found = self._resolve(key_path)
+            if not found:
+                return default
+            return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def get_str(self, key_path, default=""):
+        value = self.get(key_path, default)
+        return value if isinstance(value, str) else default
+
+    def get_int(self, key_path, default=0):
+        value = self.get(key_path, default)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
+    def get_float(self, key_path, default=0.0):
+        value = self.get(key_path, default)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key_path, default=False):
+        value = self.get(key_path, default)
+        return value if isinstance(value, bool) else default
+
+    def set(self, key_path, value):
+        """按点分路径写入设置，值未变化时不触发保存"""
+        parts = key_path.split(".")
+        with self._lock:
+            node = self._data
+            for part in parts[:-1]:
+                if not isinstance(node.get(part), dict):
+                    node[part] = {}
+                node = node[part]
+            if parts[-1] in node and node[parts[-1]] == value:
+                return
+            node[parts[-1]] = copy.deepcopy(value)
+            self._schedule_save()
+        self.settings_changed.emit(key_path)
+
+    def update(self, key_path, values):
+        """批量更新某个分组下的多个键"""
+        with self._lock:
+            section = self.get(key_path, {}) or {}
+            section.update(values)
+        self.set(key_path, section)
+
+    def replace(self, settings):
+        """整体替换设置（兼容旧的 save_settings 调用）"""
+        with self._lock:
+            self._data = _apply_settings_defaults(copy.deepcopy(settings))
+            self._schedule_save()
+        self.settings_changed.emit("")
+
+    def active_source_name(self):
+        return self.get_str("sources.active_source")
+
+    def sources_list(self):
+        with self._lock:
+            sources, found = self._resolve("sources.sources_list")
+            return list(sources) if found and isinstance(sources, list) else []
+
+    def active_source_config(self):
+        """获取当前激活的音源配置（副本）"""
+        with self._lock:
+            sources = self.sources_list()
+            if not sources:
+                return {}
+            active_source = self.active_source_name()
+            for source in sources:
+                if source.get("name") == active_source:
+                    return copy.deepcopy(source)
+            return copy.deepcopy(sources[0])
+
+    def source_names(self):
+        with self._lock:
+            return [source.get("name", "") for source in self.sources_list()]
+
+    def source_config(self, name):
+        """按名称获取音源配置（副本），找不到时返回 None"""
+        with self._lock:
+            for source in self.sources_list():
+                if source.get("name") == name:
+                    return copy.deepcopy(source)
+            return None
+
+    def save_path(self, kind, default=""):
+        """获取保存路径，如 music / cache / videos"""
+        return self.get_str(f"save_paths.{kind}", default)
+
+    def flush(self):
+        """立即把未保存的修改写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return True
+            try:
+                _write_settings_file(self.settings_path, self._data)
+                self._dirty = False
+                logger.info(f"设置已保存到: {self.settings_path}")
+                return True
+            except Exception as e:
+                logger.error(f"保存设置失败: {str(e)}")
+                return False
+
+_settings_store = None
+_settings_store_lock = threading.Lock()
+
+def get_settings_store():
+    """获取进程内唯一的设置服务"""
+    global _settings_store
+    if _settings_store is None:
+        with _settings_store_lock:
+            if _settings_store is None:
+                store = SettingsStore()
+                app = QApplication.instance()
+                if app is not None and store.thread() is not app.thread():
+                    store.moveToThread(app.thread())
+                atexit.register(store.flush)
+                _settings_store = store
+    return _settings_store
+
+def load_settings():
+    """加载设置（返回内存中设置的副本）"""
+    return get_settings_store().snapshot()
 
 def save_settings(settings):
-    """保存设置"""
-    settings_path = get_settings_path()
+    """保存设置（写入内存，防抖后原子落盘）"""
     try:
-        with open(settings_path, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, ensure_ascii=False, indent=4)
-        logger.info(f"设置已保存到: {settings_path}")
+        get_settings_store().replace(settings)
         return True
     except Exception as e:
         logging.error(f"保存设置失败: {str(e)}")
@@ -283,24 +501,28 @@ def save_settings(settings):
 
 def get_active_source_config():
     """获取当前激活的音源配置"""
-    settings = load_settings()
-    active_source = settings["sources"]["active_source"]
-    for source in settings["sources"]["sources_list"]:
-        if source["name"] == active_source:
-            return source
-    return settings["sources"]["sources_list"][0]
+    return get_settings_store().active_source_config()
 
 def get_source_names():
     """获取所有音源名称"""
-    settings = load_settings()
-    return [source["name"] for source in settings["sources"]["sources_list"]]
+    return get_settings_store().source_names()
+
+def get_song_request_source(song):
+    """搜索结果下载时使用的请求头来源：按歌曲所属音源（聚合搜索时各不相同）选择，
+    网易云使用内置请求头，其他音源使用其配置中的请求头"""
+    store = get_settings_store()
+    name = (song or {}).get("source") or store.active_source_name()
+    if name == "网易云音乐":
+        return "netease"
+    return store.source_config(name) or "netease"
 
 def ensure_settings_file_exists():
     """确保设置文件存在"""
-    settings_path = get_settings_path()
-    if not os.path.exists(settings_path):
+    store = get_settings_store()
+    if not os.path.exists(store.settings_path):
         logger.warning("settings.json 文件不存在，创建默认设置")
-        save_settings(load_default_settings())
+        store._dirty = True
+        store.flush()
 
 # =============== 日志配置 ===============
 class UTF8StreamHandler(logging.StreamHandler):
@@ -326,6 +548,1165 @@ logging.basicConfig(
 )
 logger = logging.getLogger("MusicApp")
 
+# =============== 网络连接池 ===============
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2 包
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+
+class HttpClientPool:
+    """全局HTTP连接池：同步请求共享一个 httpx.Client，异步请求在每个事件循环里共享一个 httpx.AsyncClient，
+    按主机复用长连接，安装了 h2 时自动协商HTTP/2"""
+    DEFAULT_TIMEOUT = 15
+    DEFAULT_RETRIES = 2
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    # 各音源的默认请求头，调用方的 headers 会覆盖同名字段
+    SOURCE_HEADERS = {
+        "netease": {
+            "User-Agent": BROWSER_USER_AGENT,
+            "Referer": "https://music.163.com/",
+            "Origin": "https://music.163.com"
+        },
+        "bilibili": {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36",
+            "Referer": "https://www.bilibili.com",
+            "Origin": "https://www.bilibili.com",
+            "Accept": "application/json, text/plain, */*"
+        },
+        "kugou": {
+            "User-Agent": BROWSER_USER_AGENT,
+            "Referer": "https://www.kugou.com/",
+            "Origin": "https://www.kugou.com",
+            "Accept": "application/json, text/plain, */*"
+        },
+        "default": {
+            "User-Agent": BROWSER_USER_AGENT
+        }
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _timeout(self, timeout=None):
+        if timeout is None:
+            timeout = get_settings_store().get_float("network.timeout", self.DEFAULT_TIMEOUT)
+        return httpx.Timeout(timeout, connect=min(timeout, 10))
+
+    def _limits(self):
+        max_connections = get_settings_store().get_int("network.max_connections", 32)
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60
+        )
+
+    def _client_options(self):
+        return {
+            "http2": HTTP2_ENABLED and get_settings_store().get_bool("network.http2", True),
+            "limits": self._limits(),
+            "timeout": self._timeout(),
+            "follow_redirects": True
+        }
+
+    @property
+    def client(self):
+        """共享的同步客户端（线程安全）"""
+        if self._client is None or self._client.is_closed:
+            with self._lock:
+                if self._client is None or self._client.is_closed:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+
+    def async_client(self):
+        """当前事件循环共享的异步客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**self._client_options())
+            self._async_clients[loop] = client
+        return client
+
+    def build_headers(self, source=None, headers=None, cookies=None):
+        """合并音源默认请求头、调用方请求头和Cookie"""
+        if isinstance(source, dict):
+            merged = dict(self.SOURCE_HEADERS["default"])
+            merged.update(source.get("headers", {}))
+        else:
+            merged = dict(self.SOURCE_HEADERS.get(source or "default", self.SOURCE_HEADERS["default"]))
+        if headers:
+            merged.update(headers)
+        if cookies:
+            cookie_str = "; ".join(f"{key}={value}" for key, value in cookies.items())
+            merged["Cookie"] = f"{merged['Cookie']}; {cookie_str}" if merged.get("Cookie") else cookie_str
+        return merged
+
+    def _retries(self, retries):
+        if retries is None:
+            return get_settings_store().get_int("network.retries", self.DEFAULT_RETRIES)
+        return retries
+
+    def request(self, method, url, source=None, headers=None, cookies=None, timeout=None, retries=None, **kwargs):
+        """发送同步请求，连接错误或 429/5xx 时按指数退避重试"""
+        retries = self._retries(retries)
+        headers = self.build_headers(source, headers, cookies)
+        for attempt in range(retries + 1):
+            try:
+                response = self.client.request(method, url, headers=headers, timeout=self._timeout(timeout), **kwargs)
+                if response.status_code in self.RETRY_STATUS and attempt < retries:
+                    logger.warning(f"请求返回 {response.status_code}，重试 ({attempt + 1}/{retries}): {url}")
+                    time.sleep(0.5 * 2 ** attempt)
+                    continue
+                return response
+            except httpx.TransportError as e:
+                if attempt >= retries:
+                    raise
+                logger.warning(f"请求失败: {str(e)}，重试 ({attempt + 1}/{retries}): {url}")
+                time.sleep(0.5 * 2 ** attempt)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    @contextlib.contextmanager
+    def stream(self, method, url, source=None, headers=None, cookies=None, timeout=None, **kwargs):
+        """流式请求，用于下载大文件"""
+        headers = self.build_headers(source, headers, cookies)
+        with self.client.stream(method, url, headers=headers, timeout=self._timeout(timeout), **kwargs) as response:
+            yield response
+
+    async def arequest(self, method, url, source=None, headers=None, cookies=None, timeout=None, retries=None, **kwargs):
+        """发送异步请求，重试策略与 request 相同"""
+        retries = self._retries(retries)
+        headers = self.build_headers(source, headers, cookies)
+        client = self.async_client()
+        for attempt in range(retries + 1):
+            try:
+                response = await client.request(method, url, headers=headers, timeout=self._timeout(timeout), **kwargs)
+                if response.status_code in self.RETRY_STATUS and attempt < retries:
+                    logger.warning(f"请求返回 {response.status_code}，重试 ({attempt + 1}/{retries}): {url}")
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+                    continue
+                return response
+            except httpx.TransportError as e:
+                if attempt >= retries:
+                    raise
+                logger.warning(f"请求失败: {str(e)}，重试 ({attempt + 1}/{retries}): {url}")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    @contextlib.asynccontextmanager
+    async def astream(self, method, url, source=None, headers=None, cookies=None, timeout=None, **kwargs):
+        """异步流式请求"""
+        headers = self.build_headers(source, headers, cookies)
+        async with self.async_client().stream(method, url, headers=headers, timeout=self._timeout(timeout), **kwargs) as response:
+            yield response
+
+    async def aclose_loop_client(self):
+        """关闭当前事件循环的异步客户端（事件循环结束前调用）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        client = self._async_clients.pop(loop, None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    def close(self):
+        """关闭同步客户端"""
+        with self._lock:
+            if self._client is not None and not self._client.is_closed:
+                self._client.close()
+            self._client = None
+
+_http_pool = None
+_http_pool_lock = threading.Lock()
+
+def get_http_pool():
+    """获取进程内共享的HTTP连接池"""
+    global _http_pool
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                _http_pool = HttpClientPool()
+                atexit.register(_http_pool.close)
+    return _http_pool
+
+# =============== 搜索结果缓存 ===============
+def get_data_dir():
+    """获取持久化数据目录（与设置文件同目录）"""
+    data_dir = os.path.dirname(get_settings_path())
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+class SearchCache:
+    """搜索结果磁盘缓存（SQLite），按 (音源, 归一化关键词, 页码, 条数) 索引。
+    超过TTL的结果仍会先返回、由调用方后台刷新；条目数超过上限时淘汰最久未访问的"""
+    DEFAULT_TTL = 3600              # 结果新鲜期（秒）
+    DEFAULT_MAX_STALE = 7 * 86400   # 过期结果最多保留多久（秒）
+    DEFAULT_MAX_ENTRIES = 500
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir(), "search_cache.db")
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache (
+                source TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                page_size INTEGER NOT NULL,
+                results TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (source, keyword, page, page_size)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache(accessed_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def normalize_keyword(keyword):
+        """归一化关键词：全半角统一、小写、合并空白"""
+        return " ".join(unicodedata.normalize("NFKC", str(keyword)).lower().split())
+
+    def _config(self):
+        store = get_settings_store()
+        return (
+            store.get_bool("search_cache.enabled", True),
+            store.get_int("search_cache.ttl", self.DEFAULT_TTL),
+            store.get_int("search_cache.max_stale", self.DEFAULT_MAX_STALE),
+            store.get_int("search_cache.max_entries", self.DEFAULT_MAX_ENTRIES)
+        )
+
+    def get(self, source, keyword, page=1, page_size=20):
+        """查询缓存，命中时返回 (结果列表, 是否过期)，未命中返回 None"""
+        enabled, ttl, max_stale, _ = self._config()
+        if not enabled:
+            return None
+        key = (source, self.normalize_keyword(keyword), page, page_size)
+        now = time.time()
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT results, created_at FROM search_cache WHERE source=? AND keyword=? AND page=? AND page_size=?",
+                    key
+                ).fetchone()
+                if row is None:
+                    return None
+                age = now - row[1]
+                if age > ttl + max_stale:
+                    self.conn.execute(
+                        "DELETE FROM search_cache WHERE source=? AND keyword=? AND page=? AND page_size=?", key
+                    )
+                    self.conn.commit()
+                    return None
+                self.conn.execute(
+                    "UPDATE search_cache SET accessed_at=? WHERE source=? AND keyword=? AND page=? AND page_size=?",
+                    (now, *key)
+                )
+                self.conn.commit()
+            return json.loads(row[0]), age > ttl
+        except Exception as e:
+            logger.error(f"读取搜索缓存失败: {str(e)}")
+            return None
+
+    def put(self, source, keyword, page, page_size, results):
+        """写入缓存并按LRU裁剪"""
+        enabled, _, _, max_entries = self._config()
+        if not enabled or not results:
+            return
+        now = time.time()
+        try:
+            payload = json.dumps(results, ensure_ascii=False)
+            with self._lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source, self.normalize_keyword(keyword), page, page_size, payload, now, now)
+                )
+                self.conn.execute(
+                    "DELETE FROM search_cache WHERE rowid IN "
+                    "(SELECT rowid FROM search_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (max_entries,)
+                )
+                self.conn.commit()
+        except Exception as e:
+            logger.error(f"写入搜索缓存失败: {str(e)}")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.conn.execute("DELETE FROM search_cache")
+            self.conn.commit()
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache():
+    """获取进程内共享的搜索缓存"""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache()
+    return _search_cache
+
+# =============== 专辑封面服务 ===============
+class CoverArtService(QObject):
+    """专辑封面服务：在有界线程池中下载封面并预先缩放成 40px/100px 缩略图，
+    缩略图按内容哈希存放在 save_paths["cache"]/covers 下，生成后通过 cover_ready 通知界面"""
+    cover_ready = pyqtSignal(str, int, str)  # 封面URL, 缩略图尺寸, 缩略图路径
+
+    THUMB_SIZES = (40, 100)
+    MAX_WORKERS = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.MAX_WORKERS, thread_name_prefix="cover-art"
+        )
+        self._lock = threading.Lock()
+        self._index = {}        # URL哈希 -> 图片内容哈希
+        self._index_dir = None  # 已加载索引对应的缓存目录
+        self._pending = set()   # 正在下载的URL
+
+    def cache_dir(self):
+        cache_root = get_settings_store().save_path("cache") or get_temp_dir("pics")
+        return os.path.join(cache_root, "covers")
+
+    @staticmethod
+    def _url_key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def thumbnail_path(self, content_hash, size):
+        return os.path.join(self.cache_dir(), content_hash[:2], f"{content_hash}_{size}.png")
+
+    def _load_index(self):
+        """加载 URL -> 内容哈希 索引（追加写入的文本文件），缓存目录变化时重新加载"""
+        cache_dir = self.cache_dir()
+        if self._index_dir == cache_dir:
+            return
+        self._index = {}
+        self._index_dir = cache_dir
+        index_path = os.path.join(cache_dir, "index.txt")
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.strip().split("\t")
+                    if len(parts) == 2:
+                        self._index[parts[0]] = parts[1]
+        except Exception as e:
+            logger.error(f"读取封面索引失败: {str(e)}")
+
+    def _remember(self, url, content_hash):
+        with self._lock:
+            self._load_index()
+            url_key = self._url_key(url)
+            if self._index.get(url_key) == content_hash:
+                return
+            self._index[url_key] = content_hash
+            try:
+                with open(os.path.join(self.cache_dir(), "index.txt"), "a", encoding="utf-8") as f:
+                    f.write(f"{url_key}\t{content_hash}\n")
+            except Exception as e:
+                logger.error(f"写入封面索引失败: {str(e)}")
+
+    def cached_thumbnail(self, url, size):
+        """缩略图已缓存时返回其路径，否则返回 None"""
+        with self._lock:
+            self._load_index()
+            content_hash = self._index.get(self._url_key(url))
+        if content_hash:
+            path = self.thumbnail_path(content_hash, size)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def request(self, url, size):
+        """请求封面缩略图：已缓存时直接返回路径，否则提交后台下载并返回 None"""
+        if not url:
+            return None
+        path = self.cached_thumbnail(url, size)
+        if path:
+            return path
+        with self._lock:
+            if url in self._pending:
+                return None
+            self._pending.add(url)
+        self._executor.submit(self._fetch, url)
+        return None
+
+    def _fetch(self, url):
+        """后台线程：下载封面并生成各尺寸缩略图（QImage 可在非GUI线程使用）"""
+        paths = {}
+        try:
+            logger.info(f"下载专辑封面: {url}")
+            response = get_http_pool().get(url, timeout=10)
+            if response.status_code != 200:
+                logger.warning(f"封面下载失败: HTTP {response.status_code}")
+                return
+            data = response.content
+            content_hash = hashlib.sha1(data).hexdigest()
+            image = QImage.fromData(data)
+            if image.isNull():
+                logger.warning(f"无效的图片文件: {url}")
+                return
+            for size in self.THUMB_SIZES:
+                path = self.thumbnail_path(content_hash, size)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    thumb = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                    tmp_path = path + ".tmp"
+                    if not thumb.save(tmp_path, "PNG"):
+                        logger.warning(f"保存封面缩略图失败: {path}")
+                        continue
+                    os.replace(tmp_path, path)
+                paths[size] = path
+            self._remember(url, content_hash)
+        except Exception as e:
+            logger.error(f"加载专辑封面失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+        for size, path in paths.items():
+            self.cover_ready.emit(url, size, path)
+
+    def shutdown(self):
+        """停止接收新任务，不等待正在进行的下载"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# =============== 分段下载引擎 ===============
+class SegmentedDownloader:
+    """分段断点续传下载器：探测服务器是否支持 Range，大文件拆成多段并行写入预分配的 .part 文件，
+    进度记录在 .part.json 清单中，中断后可从断点继续；校验大小（及可用时的MD5）后才重命名为目标文件"""
+    CHUNK_SIZE = 64 * 1024
+    MIN_SEGMENT_SIZE = 2 * 1024 * 1024
+    MAX_SEGMENTS = 4
+    SEGMENT_RETRIES = 3
+    MANIFEST_INTERVAL = 1.0      # 清单落盘间隔（秒）
+    PROGRESS_INTERVAL = 0.1      # 进度回调间隔（秒）
+
+    def __init__(self, url, file_path, source=None, headers=None, progress_callback=None,
+                 cancel_check=None, timeout=30, max_segments=None):
+        self.url = url
+        self.file_path = file_path
+        self.part_path = file_path + ".part"
+        self.manifest_path = file_path + ".part.json"
+        self.source = source
+        self.headers = headers or {}
+        self.progress_callback = progress_callback
+        self.cancel_check = cancel_check or (lambda: False)
+        self.timeout = timeout
+        self.max_segments = max_segments or self.MAX_SEGMENTS
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._last_manifest_save = 0.0
+        self._last_progress = 0.0
+        self._cancelled = False
+
+    # ---------- 探测与清单 ----------
+    def probe(self):
+        """用 Range: bytes=0-0 探测文件大小、是否支持分段以及校验信息"""
+        pool = get_http_pool()
+        headers = dict(self.headers, Range="bytes=0-0")
+        with pool.stream("GET", self.url, source=self.source, headers=headers, timeout=self.timeout) as response:
+            if response.status_code not in (200, 206):
+                raise IOError(f"HTTP状态码 {response.status_code}")
+            info = {
+                "url": str(response.url),
+                "etag": response.headers.get("etag", ""),
+                "last_modified": response.headers.get("last-modified", ""),
+                "content_md5": response.headers.get("content-md5", ""),
+                "accept_ranges": False,
+                "total": 0
+            }
+            content_range = response.headers.get("content-range", "")
+            if response.status_code == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                if total.isdigit():
+                    info["total"] = int(total)
+                    info["accept_ranges"] = True
+            else:
+                info["total"] = int(response.headers.get("content-length", 0) or 0)
+        return info
+
+    def _load_manifest(self, info):
+        """读取已有清单，服务器文件未变化且 .part 完整存在时才可续传"""
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.part_path)):
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取下载清单失败，重新下载: {str(e)}")
+            return None
+        if (manifest.get("total") != info["total"] or not info["accept_ranges"]
+                or manifest.get("etag") != info["etag"]
+                or manifest.get("last_modified") != info["last_modified"]
+                or os.path.getsize(self.part_path) != info["total"]):
+            return None
+        return manifest
+
+    def _new_manifest(self, info):
+        total = info["total"]
+        segments = []
+        if info["accept_ranges"] and total > 0:
+            count = max(1, min(self.max_segments, total // self.MIN_SEGMENT_SIZE))
+            size = total // count
+            for i in range(count):
+                start = i * size
+                end = total - 1 if i == count - 1 else start + size - 1
+                segments.append({"start": start, "end": end, "done": 0})
+        manifest = dict(info, segments=segments)
+        # 预分配 .part 文件，各段直接写入自己的偏移位置
+        with open(self.part_path, "wb") as f:
+            if total > 0:
+                f.truncate(total)
+        return manifest
+
+    def _save_manifest(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_manifest_save < self.MANIFEST_INTERVAL:
+            return
+        self._last_manifest_save = now
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remove_artifacts(self):
+        for path in (self.part_path, self.manifest_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除临时下载文件失败: {str(e)}")
+
+    # ---------- 进度 ----------
+    def downloaded_bytes(self):
+        return sum(segment["done"] for segment in self._manifest["segments"])
+
+    def _report_progress(self, force=False):
+        if self.progress_callback is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.progress_callback(self.downloaded_bytes(), self._manifest["total"])
+
+    # ---------- 下载 ----------
+    def _download_segment(self, segment):
+        """下载单个分段，失败时从已完成的位置重试"""
+        pool = get_http_pool()
+        for attempt in range(self.SEGMENT_RETRIES):
+            start = segment["start"] + segment["done"]
+            if start > segment["end"] or self._cancelled:
+                return
+            headers = dict(self.headers, Range=f"bytes={start}-{segment['end']}")
+            try:
+                with pool.stream("GET", self.url, source=self.source, headers=headers, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise IOError(f"分段请求返回 HTTP {response.status_code}")
+                    with open(self.part_path, "r+b") as f:
+                        f.seek(start)
+                        for chunk in response.iter_bytes(chunk_size=self.CHUNK_SIZE):
+                            if self.cancel_check():
+                                self._cancelled = True
+                            if self._cancelled:
+                                return
+                            remaining = segment["end"] - (segment["start"] + segment["done"]) + 1
+                            chunk = chunk[:remaining]
+                            f.write(chunk)
+                            with self._lock:
+                                segment["done"] += len(chunk)
+                                self._save_manifest()
+                                self._report_progress()
+                            if remaining <= len(chunk):
+                                return
+                    # 响应提前结束也算失败，下次从已完成的位置继续
+                    if segment["done"] != segment["end"] - segment["start"] + 1:
+                        raise IOError(f"分段数据不完整: {segment['done']}/{segment['end'] - segment['start'] + 1}")
+                return
+            except Exception as e:
+                if attempt >= self.SEGMENT_RETRIES - 1:
+                    raise
+                logger.warning(f"分段下载失败: {str(e)}，{attempt + 1}秒后重试")
+                time.sleep(attempt + 1)
+
+    def _download_whole(self):
+        """服务器不支持 Range 时单连接顺序下载（无法续传）"""
+        segment = {"start": 0, "end": -1, "done": 0}
+        self._manifest["segments"] = [segment]
+        with get_http_pool().stream("GET", self.url, source=self.source, headers=self.headers, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise IOError(f"HTTP状态码 {response.status_code}")
+            with open(self.part_path, "wb") as f:
+                for chunk in response.iter_bytes(chunk_size=self.CHUNK_SIZE):
+                    if self.cancel_check():
+                        self._cancelled = True
+                        return
+                    f.write(chunk)
+                    segment["done"] += len(chunk)
+                    self._report_progress()
+        if not self._manifest["total"]:
+            self._manifest["total"] = segment["done"]
+
+    def _verify(self):
+        """校验各分段是否下载完整，服务器提供了MD5（Content-MD5 或 MD5 形式的 ETag）时同时校验内容"""
+        total = self._manifest["total"]
+        segments = self._manifest["segments"]
+        if segments and segments[0]["end"] >= 0:
+            # .part 预先按总大小分配，文件大小不能说明数据完整
+            incomplete = [s for s in segments if s["done"] != s["end"] - s["start"] + 1]
+            if incomplete or sum(s["done"] for s in segments) != total:
+                logger.error(f"下载文件不完整: {len(incomplete)} 个分段未完成")
+                return False
+        else:
+            actual_size = os.path.getsize(self.part_path)
+            if total and actual_size != total:
+                logger.error(f"下载文件大小不符: 期望 {total}，实际 {actual_size}")
+                return False
+        expected_md5 = ""
+        if self._manifest.get("content_md5"):
+            try:
+                expected_md5 = base64.b64decode(self._manifest["content_md5"]).hex()
+            except Exception:
+                expected_md5 = ""
+        else:
+            etag = self._manifest.get("etag", "").strip('"').lower()
+            if re.fullmatch(r"[0-9a-f]{32}", etag):
+                expected_md5 = etag
+        if expected_md5:
+            md5 = hashlib.md5()
+            with open(self.part_path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    md5.update(block)
+            if md5.hexdigest() != expected_md5:
+                logger.error(f"下载文件校验失败: {self.file_path}")
+                return False
+        return True
+
+    def run(self):
+        """执行下载，成功返回 True；取消时保留 .part 以便下次续传"""
+        try:
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            info = self.probe()
+            self._manifest = self._load_manifest(info)
+            if self._manifest is not None:
+                logger.info(f"从断点继续下载: {self.file_path} ({self.downloaded_bytes()}/{info['total']})")
+            else:
+                self._manifest = self._new_manifest(info)
+
+            if self._manifest["segments"]:
+                segments = [s for s in self._manifest["segments"] if s["start"] + s["done"] <= s["end"]]
+                if segments:
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=len(segments)) as executor:
+                        for future in [executor.submit(self._download_segment, s) for s in segments]:
+                            future.result()
+            else:
+                self._download_whole()
+
+            if self._cancelled:
+                if self._manifest["segments"] and info["accept_ranges"]:
+                    self._save_manifest(force=True)
+                else:
+                    self._remove_artifacts()
+                logger.info("下载被中断")
+                return False
+
+            self._report_progress(force=True)
+            if not self._verify():
+                self._remove_artifacts()
+                return False
+            os.replace(self.part_path, self.file_path)
+            if os.path.exists(self.manifest_path):
+                os.remove(self.manifest_path)
+            logger.info(f"下载完成: {self.file_path}")
+            return True
+        except Exception as e:
+            logger.error(f"下载失败: {str(e)}")
+            # 支持分段时保留清单和 .part，下次可从断点继续
+            if self._manifest is not None and self._manifest.get("accept_ranges"):
+                with self._lock:
+                    self._save_manifest(force=True)
+            else:
+                self._remove_artifacts()
+            return False
+
+# =============== 异步运行时 ===============
+class AsyncRuntime(QObject):
+    """与应用同生命周期的后台 asyncio 事件循环线程。
+    submit() 提交协程并返回 concurrent.futures.Future；传入回调时结果在主线程中回调"""
+    _deliver = pyqtSignal(object, object)  # 回调函数, 结果或异常
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._deliver.connect(self._on_deliver)
+        self._thread = threading.Thread(target=self._run_loop, name="async-runtime", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro, on_done=None, on_error=None):
+        """提交协程到事件循环线程"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if on_done is not None or on_error is not None:
+            def deliver(fut):
+                if fut.cancelled():
+                    return
+                error = fut.exception()
+                if error is not None:
+                    if on_error is not None:
+                        self._deliver.emit(on_error, error)
+                    else:
+                        logger.error(f"异步任务失败: {str(error)}")
+                elif on_done is not None:
+                    self._deliver.emit(on_done, fut.result())
+            future.add_done_callback(deliver)
+        return future
+
+    def _on_deliver(self, callback, value):
+        callback(value)
+
+    def call_soon(self, callback, *args):
+        """在事件循环线程中执行普通回调"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def shutdown(self, timeout=3.0):
+        """取消所有任务、关闭连接池客户端并停止事件循环"""
+        if self.loop.is_closed() or not self._thread.is_alive():
+            return
+
+        async def drain():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await get_http_pool().aclose_loop_client()
+
+        try:
+            asyncio.run_coroutine_threadsafe(drain(), self.loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"异步任务未能在 {timeout} 秒内全部结束: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+_async_runtime = None
+_async_runtime_lock = threading.Lock()
+
+def get_async_runtime():
+    """获取进程内唯一的异步运行时"""
+    global _async_runtime
+    if _async_runtime is None:
+        with _async_runtime_lock:
+            if _async_runtime is None:
+                runtime = AsyncRuntime()
+                app = QApplication.instance()
+                if app is not None and runtime.thread() is not app.thread():
+                    runtime.moveToThread(app.thread())
+                atexit.register(runtime.shutdown)
+                _async_runtime = runtime
+    return _async_runtime
+
+class AsyncTaskThread(QThread):
+    """在全局异步运行时中执行协程的线程基类，stop() 通过取消协程结束任务"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._future = None
+
+    def run_coroutine(self, coro):
+        """提交协程并等待结果，被取消时抛出 concurrent.futures.CancelledError"""
+        self._future = get_async_runtime().submit(coro)
+        return self._future.result()
+
+    def requestInterruption(self):
+        """请求停止，同时取消正在运行的协程"""
+        super().requestInterruption()
+        if self._future is not None:
+            self._future.cancel()
+
+    def stop(self):
+        self.requestInterruption()
+        if not self.wait(2000):
+            logger.warning(f"{self.__class__.__name__} 未能在 2 秒内结束")
+
+# =============== 任务管理 ===============
+class TaskCancelled(Exception):
+    """任务已被取消"""
+
+class CancellationToken:
+    """协作式取消标记：任务在安全的位置检查并自行退出，不会被强行杀死"""
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"取消回调出错: {str(e)}")
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    # 可直接作为 cancel_check / stop_check 传入
+    __call__ = is_cancelled
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def wait(self, timeout):
+        """可被取消打断的等待，被取消时返回 True"""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """登记取消时执行的回调，已取消则立即执行"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+class ManagedTask:
+    """任务管理器中的一条任务记录"""
+    def __init__(self, task_id, kind, name, priority):
+        self.task_id = task_id
+        self.kind = kind
+        self.name = name
+        self.priority = priority
+        self.token = CancellationToken()
+        self.state = "pending"
+        self.thread = None
+        self.start = None
+        self.on_done = None
+        self.on_error = None
+        self.done_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+
+    def __lt__(self, other):
+        return (self.priority, self.task_id) < (other.priority, other.task_id)
+
+    def cancel(self):
+        self.token.cancel()
+
+class TaskManager(QObject):
+    """统一调度后台任务：按优先级排队、按类型限制并发、协作式取消，退出时限时收尾"""
+    PRIORITY_PLAYBACK = 0
+    PRIORITY_USER = 1
+    PRIORITY_BACKGROUND = 2
+    DEFAULT_LIMITS = {"playback": 2, "search": 3, "download": 3, "batch": 1, "prefetch": 2, "library": 1,
+                      "playlist_io": 1, "metadata": 1}
+    DEFAULT_LIMIT = 4
+    STATE_NAMES = {"pending": "排队中", "running": "运行中", "cancelling": "取消中",
+                   "done": "已完成", "failed": "失败", "cancelled": "已取消"}
+    tasks_changed = pyqtSignal()
+    _finished = pyqtSignal(object, object, object)  # 任务, 结果, 异常
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.RLock()
+        self._ids = 0
+        self._pending = []
+        self._running = {}
+        self._closing = False
+        self.limits = dict(self.DEFAULT_LIMITS)
+        self.limits.update(get_settings_store().get("tasks.limits", {}) or {})
+        self._finished.connect(self._on_finished)
+
+    def limit_for(self, kind):
+        try:
+            return max(1, int(self.limits.get(kind, self.DEFAULT_LIMIT)))
+        except (TypeError, ValueError):
+            return self.DEFAULT_LIMIT
+
+    def _create(self, kind, name, priority):
+        with self._lock:
+            self._ids += 1
+            return ManagedTask(self._ids, kind, name, priority)
+
+    def start_thread(self, thread, kind, priority=PRIORITY_USER, name=None, start=None):
+        """登记 QThread 任务，有空闲名额时立即启动，否则按优先级排队。
+        取消时调用线程的 requestInterruption()，线程需自行检查并退出"""
+        task = self._create(kind, name or thread.__class__.__name__, priority)
+        task.thread = thread
+        task.start = start or thread.start
+        thread.cancel_token = task.token
+        task.token.on_cancel(thread.requestInterruption)
+        thread.finished.connect(lambda: self._finished.emit(task, None, None))
+        self._enqueue(task)
+        return task
+
+    def submit(self, func, kind, priority=PRIORITY_BACKGROUND, name=None, on_done=None, on_error=None):
+        """提交普通函数任务，func(token) 在后台线程中执行，回调在主线程中执行"""
+        task = self._create(kind, name or getattr(func, "__name__", kind), priority)
+        task.on_done = on_done
+        task.on_error = on_error
+        task.start = lambda: threading.Thread(
+            target=self._run_function, args=(task, func), name=f"task-{task.task_id}", daemon=True
+        ).start()
+        self._enqueue(task)
+        return task
+
+    def _run_function(self, task, func):
+        result = error = None
+        try:
+            task.token.raise_if_cancelled()
+            result = func(task.token)
+        except Exception as e:
+            error = e
+        finally:
+            task.done_event.set()
+        self._finished.emit(task, result, error)
+
+    def _enqueue(self, task):
+        with self._lock:
+            if self._closing:
+                task.state = "cancelled"
+                task.token.cancel()
+                return
+            heapq.heappush(self._pending, task)
+        self._dispatch()
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            waiting = []
+            while self._pending:
+                task = heapq.heappop(self._pending)
+                if task.token.is_cancelled():
+                    task.state = "cancelled"
+                    continue
+                running = sum(1 for item in self._running.values() if item.kind == task.kind)
+                if running < self.limit_for(task.kind):
+                    task.state = "running"
+                    task.started_at = time.time()
+                    self._running[task.task_id] = task
+                    started.append(task)
+                else:
+                    waiting.append(task)
+            for task in waiting:
+                heapq.heappush(self._pending, task)
+        for task in started:
+            try:
+                task.start()
+            except Exception as e:
+                logger.error(f"启动任务失败 {task.name}: {str(e)}")
+                task.done_event.set()
+                self._finished.emit(task, None, e)
+        self.tasks_changed.emit()
+
+    def _on_finished(self, task, result, error):
+        with self._lock:
+            if self._running.pop(task.task_id, None) is None:
+                return
+        task.done_event.set()
+        cancelled = task.token.is_cancelled() or isinstance(error, TaskCancelled)
+        if cancelled:
+            task.state = "cancelled"
+        elif error is not None:
+            task.state = "failed"
+            logger.error(f"任务失败 {task.name}: {str(error)}")
+            if task.on_error:
+                task.on_error(error)
+        else:
+            task.state = "done"
+            if task.on_done:
+                task.on_done(result)
+        self._dispatch()
+
+    def cancel(self, task):
+        """请求取消任务，排队中的任务不会再启动"""
+        if task is None:
+            return
+        if task.state == "running":
+            task.state = "cancelling"
+        task.cancel()
+        self._dispatch()
+
+    def find_thread(self, thread):
+        with self._lock:
+            for task in list(self._running.values()) + self._pending:
+                if task.thread is thread:
+                    return task
+        return None
+
+    def cancel_thread(self, thread):
+        """取消某个 QThread 对应的任务"""
+        task = self.find_thread(thread)
+        if task is not None:
+            self.cancel(task)
+        elif thread is not None and thread.isRunning():
+            thread.requestInterruption()
+
+    def cancel_ids(self, task_ids):
+        """按任务编号取消任务"""
+        with self._lock:
+            tasks = [task for task in list(self._running.values()) + self._pending if task.task_id in task_ids]
+        for task in tasks:
+            self.cancel(task)
+
+    def cancel_kind(self, kind):
+        """取消某一类型的全部任务"""
+        with self._lock:
+            tasks = [task for task in list(self._running.values()) + self._pending if task.kind == kind]
+        for task in tasks:
+            self.cancel(task)
+
+    def cancel_threads(self, threads, deadline=3.0):
+        """取消一组线程并在期限内等待它们退出，返回未能按时结束的线程"""
+        threads = [thread for thread in threads if thread is not None]
+        for thread in threads:
+            self.cancel_thread(thread)
+        end = time.monotonic() + deadline
+        left = []
+        for thread in threads:
+            remaining = max(0.0, end - time.monotonic())
+            if thread.isRunning() and not thread.wait(int(remaining * 1000)):
+                left.append(thread)
+        for thread in left:
+            logger.warning(f"线程未能在 {deadline} 秒内结束: {thread.__class__.__name__}")
+        return left
+
+    def snapshot(self):
+        """当前排队和运行中任务的快照，用于任务监视器"""
+        now = time.time()
+        with self._lock:
+            tasks = sorted(list(self._running.values()) + list(self._pending))
+        return [{
+            "id": task.task_id,
+            "kind": task.kind,
+            "name": task.name,
+            "priority": task.priority,
+            "state": task.state,
+            "elapsed": now - (task.started_at or task.created_at),
+        } for task in tasks]
+
+    def shutdown(self, deadline=5.0):
+        """取消全部任务并在期限内等待运行中的任务收尾，不强行终止线程"""
+        with self._lock:
+            self._closing = True
+            pending, self._pending = self._pending, []
+            running = list(self._running.values())
+        for task in pending:
+            task.state = "cancelled"
+            task.token.cancel()
+        for task in running:
+            task.state = "cancelling"
+            task.token.cancel()
+
+        end = time.monotonic() + deadline
+        left = []
+        for task in running:
+            remaining = max(0.0, end - time.monotonic())
+            if task.thread is not None:
+                finished = not task.thread.isRunning() or task.thread.wait(int(remaining * 1000))
+            else:
+                finished = task.done_event.wait(remaining)
+            if not finished:
+                left.append(task.name)
+        if left:
+            logger.warning(f"{len(left)} 个任务未能在 {deadline} 秒内结束，放弃等待: {', '.join(left)}")
+        else:
+            logger.info("所有后台任务已结束")
+
+_task_manager = None
+
+def get_task_manager():
+    """获取全局任务管理器（需在主线程中首次调用）"""
+    global _task_manager
+    if _task_manager is None:
+        _task_manager = TaskManager()
+    return _task_manager
+
+class TaskMonitorDialog(QDialog):
+    """任务监视器：实时显示排队和运行中的后台任务"""
+    PRIORITY_NAMES = {TaskManager.PRIORITY_PLAYBACK: "播放", TaskManager.PRIORITY_USER: "用户",
+                      TaskManager.PRIORITY_BACKGROUND: "后台"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("任务监视器")
+        self.resize(640, 360)
+        self.manager = get_task_manager()
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["类型", "名称", "优先级", "状态", "耗时"])
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        layout.addWidget(self.table)
+        button_layout = QHBoxLayout()
+        cancel_button = QPushButton("取消选中任务")
+        cancel_button.clicked.connect(self.cancel_selected)
+        button_layout.addStretch()
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        self.rows = []
+        self.manager.tasks_changed.connect(self.refresh)
+        # 耗时需要持续刷新
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        self.rows = self.manager.snapshot()
+        self.table.setRowCount(len(self.rows))
+        for row, info in enumerate(self.rows):
+            values = [
+                info["kind"],
+                info["name"],
+                self.PRIORITY_NAMES.get(info["priority"], str(info["priority"])),
+                TaskManager.STATE_NAMES.get(info["state"], info["state"]),
+                f"{info['elapsed']:.1f} 秒",
+            ]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def cancel_selected(self):
+        selected = {index.row() for index in self.table.selectionModel().selectedRows()}
+        self.manager.cancel_ids({self.rows[row]["id"] for row in selected if row < len(self.rows)})
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        try:
+            self.manager.tasks_changed.disconnect(self.refresh)
+        except TypeError:
+            pass
+        super().closeEvent(event)
+
 # =============== Bilibili视频搜索插件整合 ===============
 class VideoAPI(QObject):
     """视频API类"""
@@ -345,22 +1726,23 @@ class VideoAPI(QObject):
     async def search_video(self, keyword: str, page: int = 1) -> list[dict] | None:
         """搜索视频"""
         params = {"search_type": "video", "keyword": keyword, "page": page}
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    self.BILIBILI_SEARCH_API, 
-                    params=params, 
-                    headers=self.BILIBILI_HEADER
-                )
-                response.raise_for_status()
-                data = response.json()
+        try:
+            response = await get_http_pool().arequest(
+                "GET",
+                self.BILIBILI_SEARCH_API, 
+                source="bilibili",
+                params=params, 
+                headers=self.BILIBILI_HEADER
+            )
+            response.raise_for_status()
+            data = response.json()
 
-                if data["code"] == 0:
-                    video_list = data["data"].get("result", [])
-                    return video_list
-            except Exception as e:
-                logging.error(f"Bilibili搜索发生错误: {e}")
-                return []
+            if data["code"] == 0:
+                video_list = data["data"].get("result", [])
+                return video_list
+        except Exception as e:
+            logging.error(f"Bilibili搜索发生错误: {e}")
+            return []
 
     async def download_video(self, video_id: str, temp_dir: str) -> str | None:
         """下载视频"""
@@ -403,25 +1785,24 @@ class VideoAPI(QObject):
 
     async def _download_b_file(self, url: str, full_file_name: str):
         """下载文件并显示进度"""
-        async with httpx.AsyncClient() as client:
-            async with client.stream("GET", url, headers=self.BILIBILI_HEADER) as resp:
-                current_len = 0
-                total_len = int(resp.headers.get("content-length", 0))
-                last_percent = -1
-
-                async with aiofiles.open(full_file_name, "wb") as f:
-                    async for chunk in resp.aiter_bytes():
-                        if self.thread() and self.thread().isInterruptionRequested():
-                            logging.info("下载被中断")
-                            return
-                        
-                        current_len += len(chunk)
-                        await f.write(chunk)
+        async with get_http_pool().astream("GET", url, source="bilibili", headers=self.BILIBILI_HEADER, timeout=60) as resp:
+            current_len = 0
+            total_len = int(resp.headers.get("content-length", 0))
+            last_percent = -1
+
+            async with aiofiles.open(full_file_name, "wb") as f:
+                async for chunk in resp.aiter_bytes():
+                    if self.thread() and self.thread().isInterruptionRequested():
+                        logging.info("下载被中断")
+                        return
+                    
+                    current_len += len(chunk)
+                    await f.write(chunk)
 
-                        percent = int(current_len / total_len * 100)
-                        if percent != last_percent:
-                            last_percent = percent
-                            self.download_progress.emit(percent)
+                    percent = int(current_len / total_len * 100)
+                    if percent != last_percent:
+                        last_percent = percent
+                        self.download_progress.emit(percent)
     
     async def _merge_file_to_mp4(self, v_full_file_name: str, a_full_file_name: str, output_file_name: str):
         """合并视频文件和音频文件"""
@@ -522,23 +1903,12 @@ class VideoSearchDialog(QDialog):
             self.video_api.download_progress.disconnect(self.update_progress)
         except:
             pass
-        self.terminate_all_threads()
+        self.stop_all_threads()
         event.accept()
         
-    def terminate_all_threads(self):
-        threads = []
-        if self.search_thread:
-            threads.append(self.search_thread)
-        if self.download_thread:
-            threads.append(self.download_thread)
-        
-        for thread in threads:
-            if thread and thread.isRunning():
-                thread.requestInterruption()
-                thread.quit()
-                if not thread.wait(2000):
-                    thread.terminate()
-                    thread.wait()
+    def stop_all_threads(self):
+        """协作式取消搜索和下载线程，并在期限内等待其退出"""
+        get_task_manager().cancel_threads([self.search_thread, self.download_thread], deadline=3.0)
         
     def search_videos(self):
         keyword = self.search_input.text().strip()
@@ -554,7 +1924,7 @@ class VideoSearchDialog(QDialog):
         self.search_thread.results_ready.connect(self.display_results)
         self.search_thread.error_occurred.connect(self.display_error)
         self.search_thread.finished.connect(self.remove_search_thread)
-        self.search_thread.start()
+        get_task_manager().start_thread(self.search_thread, "search", name=f"搜索: {keyword}")
         
     def display_results(self, videos):
         if not videos:
@@ -617,8 +1987,8 @@ class VideoSearchDialog(QDialog):
         self.threads.append(self.download_thread)
         self.download_thread.download_complete.connect(self.download_finished)
         self.download_thread.error_occurred.connect(self.download_error)
-        self.search_thread.finished.connect(self.remove_search_thread)
-        self.download_thread.start()
+        self.download_thread.finished.connect(self.remove_download_thread)
+        get_task_manager().start_thread(self.download_thread, "download", name=f"下载视频: {video_id}")
         
     def update_progress(self, progress):
         self.progress_bar.setValue(progress)
@@ -634,7 +2004,7 @@ class VideoSearchDialog(QDialog):
         QMessageBox.critical(self, "错误", f"下载失败: {error}")
 
 
-class VideoSearchThread(QThread):
+class VideoSearchThread(AsyncTaskThread):
     """视频搜索线程"""
     results_ready = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
@@ -645,32 +2015,20 @@ class VideoSearchThread(QThread):
         self.video_api = video_api
         
     def run(self):
-        loop = None
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
             if self.isInterruptionRequested():
                 return
-            results = loop.run_until_complete(self.video_api.search_video(self.keyword))
+            results = self.run_coroutine(self.video_api.search_video(self.keyword))
             if self.isInterruptionRequested():
                 return
             self.results_ready.emit(results or [])
+        except concurrent.futures.CancelledError:
+            return
         except Exception as e:
             self.error_occurred.emit(str(e))
-        finally:
-            if loop and not loop.is_closed():
-                loop.call_soon_threadsafe(loop.stop)
-                loop.close()
-    
-    def stop(self):
-        self.requestInterruption()
-        self.quit()
-        if not self.wait(2000):
-            self.terminate()
-            self.wait()
 
 
-class VideoDownloadThread(QThread):
+class VideoDownloadThread(AsyncTaskThread):
     """视频下载线程"""
     download_complete = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
@@ -683,41 +2041,26 @@ class VideoDownloadThread(QThread):
         self.video_api = video_api
         
     def run(self):
-        loop = None
-
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
             if self.isInterruptionRequested():
                 return
-            temp_file = loop.run_until_complete(
+            temp_file = self.run_coroutine(
                 self.video_api.download_video(self.video_id, self.temp_dir)
             )
             if self.isInterruptionRequested():
                 return
-            if temp_file:
-                os.replace(temp_file, self.file_path)
-                self.download_complete.emit(self.file_path)
-            else:
-                self.error_occurred.emit("下载失败，未获取到文件")
             if temp_file:
                 # 修复Linux权限问题
                 if sys.platform.startswith('linux'):
                     os.chmod(temp_file, 0o644)
                 os.replace(temp_file, self.file_path)
+                self.download_complete.emit(self.file_path)
+            else:
+                self.error_occurred.emit("下载失败，未获取到文件")
+        except concurrent.futures.CancelledError:
+            return
         except Exception as e:
             self.error_occurred.emit(str(e))
-        finally:
-            if loop and not loop.is_closed():
-                loop.call_soon_threadsafe(loop.stop)
-                loop.close()
-    
-    def stop(self):
-        self.requestInterruption()
-        self.quit()
-        if not self.wait(2000):
-            self.terminate()
-            self.wait()
 
 # =============== Bilibili音频下载插件整合 ===============
 class AudioAPI(QObject):
@@ -739,62 +2082,64 @@ class AudioAPI(QObject):
     async def search_video(self, keyword: str, page: int = 1) -> list[dict] | None:
         """搜索视频"""
         params = {"search_type": "video", "keyword": keyword, "page": page}
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    self.BILIBILI_SEARCH_API, 
-                    params=params, 
-                    headers=self.BILIBILI_HEADER
-                )
-                response.raise_for_status()
-                data = response.json()
+        try:
+            response = await get_http_pool().arequest(
+                "GET",
+                self.BILIBILI_SEARCH_API, 
+                source="bilibili",
+                params=params, 
+                headers=self.BILIBILI_HEADER
+            )
+            response.raise_for_status()
+            data = response.json()
 
-                if data["code"] == 0:
-                    video_list = data["data"].get("result", [])
-                    return video_list
-            except Exception as e:
-                logging.error(f"Bilibili搜索发生错误: {e}")
-                return []
+            if data["code"] == 0:
+                video_list = data["data"].get("result", [])
+                return video_list
+        except Exception as e:
+            logging.error(f"Bilibili搜索发生错误: {e}")
+            return []
 
     async def get_audio_info(self, bvid: str) -> dict | None:
         """获取音频信息（包含真实音频URL）"""
         if bvid in self.audio_info_cache:
             return self.audio_info_cache[bvid]
         try:
+            # 两次请求走同一个连接池，第二次复用已建立的连接
+            pool = get_http_pool()
             video_info_url = f"https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
-            async with httpx.AsyncClient() as client:
-                response = await client.get(video_info_url, headers=self.BILIBILI_HEADER)
-                data = response.json()
-                if data["code"] != 0:
-                    return None
-                cid = data["data"]["cid"]
-                title = data["data"]["title"]
-                author = data["data"]["owner"]["name"]
-                duration = data["data"]["duration"]
-                cover_url = data["data"]["pic"]
+            response = await pool.arequest("GET", video_info_url, source="bilibili", headers=self.BILIBILI_HEADER)
+            data = response.json()
+            if data["code"] != 0:
+                return None
+            cid = data["data"]["cid"]
+            title = data["data"]["title"]
+            author = data["data"]["owner"]["name"]
+            duration = data["data"]["duration"]
+            cover_url = data["data"]["pic"]
+            
+            audio_url = f"https://api.bilibili.com/x/player/playurl?bvid={bvid}&cid={cid}&qn=0&fnval=16"
+            response = await pool.arequest("GET", audio_url, source="bilibili", headers=self.BILIBILI_HEADER)
+            data = response.json()
+            if data["code"] != 0:
+                return None
                 
-                audio_url = f"https://api.bilibili.com/x/player/playurl?bvid={bvid}&cid={cid}&qn=0&fnval=16"
-                response = await client.get(audio_url, headers=self.BILIBILI_HEADER)
-                data = response.json()
-                if data["code"] != 0:
-                    return None
-                    
-                audio_url = data["data"]["dash"]["audio"][0]["baseUrl"]
-                audio_info = {
-                    "title": title,
-                    "author": author,
-                    "duration": duration,
-                    "cover_url": cover_url,
-                    "audio_url": audio_url
-                }
-                self.audio_info_cache[bvid] = audio_info
-                return audio_info
+            audio_url = data["data"]["dash"]["audio"][0]["baseUrl"]
+            audio_info = {
+                "title": title,
+                "author": author,
+                "duration": duration,
+                "cover_url": cover_url,
+                "audio_url": audio_url
+            }
+            self.audio_info_cache[bvid] = audio_info
+            return audio_info
         except Exception as e:
             logging.error(f"获取音频信息失败: {e}")
             return None
 
-    async def download_audio(self, bvid: str, file_path: str) -> bool:
-        """下载B站音频并保存到指定路径"""
+    async def download_audio(self, bvid: str, file_path: str, cancel_check=None) -> bool:
+        """下载B站音频并保存到指定路径，cancel_check 返回 True 时中止下载"""
         try:
             # 获取音频信息
             audio_info = await self.get_audio_info(bvid)
@@ -813,7 +2158,7 @@ class AudioAPI(QObject):
             temp_file = os.path.join(directory, f"temp_{safe_name}")
             
             # 下载文件
-            success = await self._download_audio_file(audio_url, temp_file)
+            success = await self._download_audio_file(audio_url, temp_file, cancel_check)
             if not success:
                 return False
                 
@@ -842,28 +2187,21 @@ class AudioAPI(QObject):
             logging.error(f"下载音频失败: {e}")
             return False
         
-    async def _download_audio_file(self, url: str, file_path: str) -> bool:
-        """下载音频文件到指定路径"""
+    async def _download_audio_file(self, url: str, file_path: str, cancel_check=None) -> bool:
+        """下载音频文件到指定路径（分段、可断点续传，在线程池中执行）。
+        取消协程不会停止线程池中的下载，需要通过 cancel_check 让下载自行退出"""
         try:
-            async with httpx.AsyncClient() as client:
-                async with client.stream("GET", url, headers=self.BILIBILI_HEADER) as response:
-                    if response.status_code != 200:
-                        return False
-                        
-                    total_size = int(response.headers.get("content-length", 0))
-                    downloaded = 0
-                    
-                    async with aiofiles.open(file_path, "wb") as f:
-                        async for chunk in response.aiter_bytes():
-                            downloaded += len(chunk)
-                            await f.write(chunk)
-                            
-                            # 发射下载进度
-                            if total_size > 0:
-                                progress = int(downloaded / total_size * 100)
-                                self.download_progress.emit(progress)
-                                
-                    return True
+            def report(downloaded, total):
+                # 发射下载进度
+                if total > 0:
+                    self.download_progress.emit(int(downloaded / total * 100))
+
+            downloader = SegmentedDownloader(
+                url, file_path, source="bilibili", headers=self.BILIBILI_HEADER,
+                progress_callback=report, cancel_check=cancel_check, timeout=60
+            )
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, downloader.run)
         except Exception as e:
             logging.error(f"下载文件失败: {e}")
             return False
@@ -871,9 +2209,8 @@ class AudioAPI(QObject):
     async def get_content_type(self, url: str) -> str:
         """获取URL的内容类型"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.head(url, headers=self.BILIBILI_HEADER)
-                return response.headers.get("content-type", "")
+            response = await get_http_pool().arequest("HEAD", url, source="bilibili", headers=self.BILIBILI_HEADER, retries=0)
+            return response.headers.get("content-type", "")
         except:
             return ""
 
@@ -970,23 +2307,12 @@ class AudioSearchDialog(QDialog):
             self.audio_api.download_progress.disconnect(self.update_progress)
         except:
             pass
-        self.terminate_all_threads()
+        self.stop_all_threads()
         event.accept()
         
-    def terminate_all_threads(self):
-        threads = []
-        if self.search_thread:
-            threads.append(self.search_thread)
-        if self.download_thread:
-            threads.append(self.download_thread)
-        
-        for thread in threads:
-            if thread and thread.isRunning():
-                thread.requestInterruption()
-                thread.quit()
-                if not thread.wait(2000):
-                    thread.terminate()
-                    thread.wait()
+    def stop_all_threads(self):
+        """协作式取消搜索和下载线程，并在期限内等待其退出"""
+        get_task_manager().cancel_threads([self.search_thread, self.download_thread], deadline=3.0)
         
     def search_videos(self):
         keyword = self.search_input.text().strip()
@@ -1002,7 +2328,7 @@ class AudioSearchDialog(QDialog):
         self.search_thread.results_ready.connect(self.display_results)
         self.search_thread.error_occurred.connect(self.display_error)
         self.search_thread.finished.connect(self.remove_search_thread)
-        self.search_thread.start()
+        get_task_manager().start_thread(self.search_thread, "search", name=f"搜索: {keyword}")
         
     def display_results(self, videos):
         if not videos:
@@ -1065,7 +2391,7 @@ class AudioSearchDialog(QDialog):
         self.download_thread.download_complete.connect(self.download_finished)
         self.download_thread.error_occurred.connect(self.download_error)
         self.download_thread.finished.connect(self.remove_download_thread)
-        self.download_thread.start()
+        get_task_manager().start_thread(self.download_thread, "download", name=f"下载音频: {bvid}")
         
     def update_progress(self, progress):
         self.progress_bar.setValue(progress)
@@ -1081,7 +2407,7 @@ class AudioSearchDialog(QDialog):
         QMessageBox.critical(self, "错误", f"下载失败: {error}")
 
 
-class AudioSearchThread(QThread):
+class AudioSearchThread(AsyncTaskThread):
     """音频搜索线程"""
     results_ready = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
@@ -1092,32 +2418,20 @@ class AudioSearchThread(QThread):
         self.audio_api = audio_api
         
     def run(self):
-        loop = None
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
             if self.isInterruptionRequested():
                 return
-            results = loop.run_until_complete(self.audio_api.search_video(self.keyword))
+            results = self.run_coroutine(self.audio_api.search_video(self.keyword))
             if self.isInterruptionRequested():
                 return
             self.results_ready.emit(results or [])
+        except concurrent.futures.CancelledError:
+            return
         except Exception as e:
             self.error_occurred.emit(str(e))
-        finally:
-            if loop and not loop.is_closed():
-                loop.call_soon_threadsafe(loop.stop)
-                loop.close()
-    
-    def stop(self):
-        self.requestInterruption()
-        self.quit()
-        if not self.wait(2000):
-            self.terminate()
-            self.wait()
 
 
-class AudioDownloadThread(QThread):
+class AudioDownloadThread(AsyncTaskThread):
     """音频下载线程"""
     download_complete = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
@@ -1129,14 +2443,11 @@ class AudioDownloadThread(QThread):
         self.audio_api = audio_api
         
     def run(self):
-        loop = None
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
             if self.isInterruptionRequested():
                 return
-            success = loop.run_until_complete(
-                self.audio_api.download_audio(self.bvid, self.file_path)
+            success = self.run_coroutine(
+                self.audio_api.download_audio(self.bvid, self.file_path, cancel_check=self.isInterruptionRequested)
             )
             if self.isInterruptionRequested():
                 return
@@ -1163,21 +2474,453 @@ class AudioDownloadThread(QThread):
             else:
                 self.error_occurred.emit("音频下载失败")
                 
+        except concurrent.futures.CancelledError:
+            return
         except Exception as e:
             self.error_occurred.emit(str(e))
-        finally:
-            if loop and not loop.is_closed():
-                loop.call_soon_threadsafe(loop.stop)
-                loop.close()
-    
-    def stop(self):
-        self.requestInterruption()
-        self.quit()
-        if not self.wait(2000):
-            self.terminate()
-            self.wait()
+
+# =============== 播放列表存储 ===============
+class PlaylistStore:
+    """播放列表持久化：playlists.json 是快照，每次修改只向 <快照>.journal 追加一行 JSON 记录，
+    启动时读取快照后重放日志。日志积累到一定大小后在后台线程写新快照（原子替换）并清空日志。
+    所有记录都是幂等的（按路径去重添加、按路径删除、整体替换），压缩中途崩溃后重放也不会重复"""
+    COMPACT_RECORDS = 500
+    COMPACT_BYTES = 1024 * 1024
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.journal_path = self.path + ".journal"
+        self.pending_path = self.journal_path + ".old"  # 正在压缩的旧日志
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._journal = None
+        self._records = 0
+        self._bytes = 0
+        self._compacting = False
+        self._keys = {}  # 播放列表名 -> 条目路径集合，按需建立
+        self.playlists = self._load()
+
+    @staticmethod
+    def item_key(item):
+        """条目的身份：字典条目取 path，旧格式的字符串条目就是路径本身"""
+        return item.get("path", "") if isinstance(item, dict) else item
+
+    # ---------- 启动加载 ----------
+    def _load(self):
+        playlists = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    playlists = data
+            except Exception as e:
+                logger.error(f"读取播放列表快照失败 {self.path}: {str(e)}")
+        replayed = 0
+        keys = {}
+        for journal_path in (self.pending_path, self.journal_path):
+            replayed += self._replay(playlists, journal_path, keys)
+        if replayed:
+            logger.info(f"播放列表日志重放 {replayed} 条记录: {self.path}")
+        playlists.setdefault("default", [])
+        return playlists
+
+    def _replay(self, playlists, journal_path, keys):
+        if not os.path.exists(journal_path):
+            return 0
+        count = 0
+        size = 0
+        with open(journal_path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半，之后的内容丢弃
+                    logger.warning(f"播放列表日志末尾记录不完整，已忽略: {journal_path}")
+                    break
+                self._apply(playlists, record, keys)
+                count += 1
+                size += len(line)
+        if journal_path == self.journal_path:
+            self._records, self._bytes = count, size
+            if size != os.path.getsize(journal_path):
+                # 截掉不完整的尾部，避免之后追加的记录接在半行后面
+                with open(journal_path, "r+b") as f:
+                    f.truncate(size)
+        return count
+
+    def _apply(self, playlists, record, keys):
+        """把一条记录应用到 playlists，keys 为各列表的路径集合缓存"""
+        op = record.get("op")
+        name = record.get("list")
+        if op == "create":
+            playlists.setdefault(name, [])
+        elif op == "delete":
+            playlists.pop(name, None)
+            keys.pop(name, None)
+        elif op == "rename":
+            target = record.get("to")
+            if name in playlists and target not in playlists:
+                playlists[target] = playlists.pop(name)
+            keys.pop(name, None)
+            keys.pop(target, None)
+        elif op == "set":
+            playlists[name] = list(record.get("items", []))
+            keys.pop(name, None)
+        elif op == "add":
+            items = playlists.setdefault(name, [])
+            if name not in keys:
+                keys[name] = {self.item_key(item) for item in items}
+            existing = keys[name]
+            for item in record.get("items", []):
+                key = self.item_key(item)
+                if key not in existing:
+                    items.append(item)
+                    existing.add(key)
+        elif op == "remove":
+            removed = set(record.get("keys", []))
+            if name in playlists:
+                playlists[name] = [item for item in playlists[name] if self.item_key(item) not in removed]
+            keys.pop(name, None)
+        elif op == "update":
+            key = record.get("key")
+            items = playlists.get(name, [])
+            for index, item in enumerate(items):
+                if self.item_key(item) == key:
+                    items[index] = record.get("item")
+                    break
+            keys.pop(name, None)
+
+    # ---------- 修改 ----------
+    def _log(self, record):
+        """应用修改并把记录追加到日志（写入并 fsync 后才返回）"""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._apply(self.playlists, record, self._keys)
+            try:
+                if self._journal is None:
+                    self._journal = open(self.journal_path, "ab")
+                self._journal.write(line)
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            except OSError as e:
+                logger.error(f"写入播放列表日志失败: {str(e)}")
+                return False
+            self._records += 1
+            self._bytes += len(line)
+            if not self._compacting and (self._records >= self.COMPACT_RECORDS or self._bytes >= self.COMPACT_BYTES):
+                self._compacting = True
+                threading.Thread(target=self._compact, name="playlist-compact", daemon=True).start()
+        return True
+
+    def get(self, name):
+        """播放列表条目（只读，修改请用存储方法）"""
+        return self.playlists.get(name, [])
+
+    def create(self, name):
+        if name in self.playlists:
+            return False
+        return self._log({"op": "create", "list": name})
+
+    def delete(self, name):
+        if name not in self.playlists:
+            return False
+        return self._log({"op": "delete", "list": name})
+
+    def rename(self, name, new_name):
+        if name not in self.playlists or new_name in self.playlists:
+            return False
+        return self._log({"op": "rename", "list": name, "to": new_name})
+
+    def add(self, name, items):
+        """添加不在列表中的条目，返回实际添加的条数"""
+        with self._lock:
+            existing = self._keys.get(name)
+            if existing is None:
+                existing = self._keys[name] = {self.item_key(item) for item in self.playlists.get(name, [])}
+            new_items, new_keys = [], set()
+            for item in items:
+                key = self.item_key(item)
+                if key and key not in existing and key not in new_keys:
+                    new_items.append(item)
+                    new_keys.add(key)
+            if new_items and not self._log({"op": "add", "list": name, "items": new_items}):
+                return 0
+        return len(new_items)
+
+    def remove(self, name, keys):
+        """按路径删除条目"""
+        keys = list(keys)
+        if not keys or name not in self.playlists:
+            return False
+        return self._log({"op": "remove", "list": name, "keys": keys})
+
+    def update(self, name, key, item):
+        """替换路径为 key 的条目（改名或文件移动）"""
+        return self._log({"op": "update", "list": name, "key": key, "item": item})
+
+    def set(self, name, items):
+        """整体替换一个播放列表"""
+        return self._log({"op": "set", "list": name, "items": list(items)})
+
+    # ---------- 快照 ----------
+    def _compact(self):
+        """写新快照并丢弃已包含在快照中的日志"""
+        with self._compact_lock:
+            with self._lock:
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                try:
+                    if os.path.exists(self.journal_path):
+                        if os.path.exists(self.pending_path):
+                            # 上次压缩没有完成，旧日志接上当前日志一起等待本次快照
+                            with open(self.pending_path, "ab") as pending, open(self.journal_path, "rb") as journal:
+                                shutil.copyfileobj(journal, pending)
+                            os.remove(self.journal_path)
+                        else:
+                            os.replace(self.journal_path, self.pending_path)
+                except OSError as e:
+                    logger.error(f"轮换播放列表日志失败: {str(e)}")
+                    self._compacting = False
+                    return False
+                snapshot = {name: list(items) for name, items in self.playlists.items()}
+                self._records = self._bytes = 0
+                self._compacting = False
+            try:
+                atomic_write_json(self.path, snapshot)
+                if os.path.exists(self.pending_path):
+                    os.remove(self.pending_path)
+                logger.info(f"播放列表快照已更新: {self.path}")
+                return True
+            except Exception as e:
+                logger.error(f"写入播放列表快照失败: {str(e)}")
+                return False
+
+    def rewrite(self):
+        """立即写入完整快照（用于直接修改了 playlists 字典的调用方）"""
+        with self._lock:
+            self._keys.clear()
+            self._compacting = True
+        return self._compact()
+
+    def close(self):
+        """退出前把日志合并进快照"""
+        with self._lock:
+            dirty = self._records > 0 or os.path.exists(self.pending_path)
+            if dirty:
+                self._compacting = True
+        if dirty:
+            self._compact()
+
+_playlist_stores = {}
+_playlist_stores_lock = threading.Lock()
+
+def get_playlist_store(path="playlists.json"):
+    """按文件获取播放列表存储，同一文件只有一个实例"""
+    key = os.path.abspath(path)
+    with _playlist_stores_lock:
+        if key not in _playlist_stores:
+            _playlist_stores[key] = PlaylistStore(key)
+        return _playlist_stores[key]
 
 # =============== 播放列表管理 ===============
+class PlaylistModel(QAbstractListModel):
+    """主界面播放列表的数据模型。条目按顺序存放在数组中，另维护 路径 -> 行号 哈希表，
+    查重和定位都是 O(1)；封面图标只在视图绘制到该行时才加载"""
+    ICON_SIZE = 40
+
+    def __init__(self, cover_service=None, library=None, parent=None):
+        super().__init__(parent)
+        self.cover_service = cover_service
+        self.library = library
+        self._songs = []  # [{"path", "name", "pic"}]
+        self._rows = {}  # 路径 -> 行号
+        self._icons = {}  # 路径 -> QIcon，None 表示没有封面或正在下载
+        self._cover_waiters = {}  # (封面URL, 尺寸) -> 等待该封面的路径集合
+        if cover_service is not None:
+            cover_service.cover_ready.connect(self._on_cover_ready)
+
+    # ---------- Qt 模型接口 ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._songs)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._songs):
+            return None
+        song = self._songs[index.row()]
+        if role == Qt.DisplayRole:
+            return song["name"]
+        if role in (Qt.UserRole, Qt.ToolTipRole):
+            return song["path"]
+        if role == Qt.DecorationRole:
+            return self._icon(song)
+        return None
+
+    def _icon(self, song):
+        path = song["path"]
+        if path in self._icons:
+            return self._icons[path]
+        icon = None
+        if song.get("pic") and self.cover_service is not None:
+            thumbnail = self.cover_service.request(song["pic"], self.ICON_SIZE)
+            if thumbnail:
+                icon = QIcon(thumbnail)
+            else:
+                self._cover_waiters.setdefault((song["pic"], self.ICON_SIZE), set()).add(path)
+        elif self.library is not None:
+            track = self.library.get_track(path)
+            if track and track.get("cover_path"):
+                icon = QIcon(track["cover_path"])
+        self._icons[path] = icon
+        return icon
+
+    def _on_cover_ready(self, pic_url, size, thumbnail):
+        paths = self._cover_waiters.pop((pic_url, size), ())
+        if not paths:
+            return
+        icon = QIcon(thumbnail)
+        for path in paths:
+            row = self._rows.get(path)
+            if row is not None:
+                self._icons[path] = icon
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    # ---------- 查询 ----------
+    @property
+    def songs(self):
+        """按顺序排列的条目（只读，修改请用模型方法）"""
+        return self._songs
+
+    def contains(self, path):
+        return path in self._rows
+
+    def row_of(self, path):
+        return self._rows.get(path, -1)
+
+    def path_at(self, row):
+        return self._songs[row]["path"] if 0 <= row < len(self._songs) else None
+
+    def name_at(self, row):
+        return self._songs[row]["name"] if 0 <= row < len(self._songs) else None
+
+    def paths(self):
+        return [song["path"] for song in self._songs]
+
+    # ---------- 修改 ----------
+    def append(self, path, name, pic=None):
+        """添加到末尾，已在列表中时返回 False"""
+        return self.extend([{"path": path, "name": name, "pic": pic}]) == 1
+
+    def extend(self, songs):
+        """批量添加到末尾（一次插入通知），跳过重复路径，返回实际添加的条数"""
+        new_songs = []
+        for song in songs:
+            path = song["path"]
+            if path in self._rows:
+                continue
+            self._rows[path] = len(self._songs) + len(new_songs)
+            new_songs.append({"path": path, "name": song.get("name") or os.path.basename(path), "pic": song.get("pic")})
+        if new_songs:
+            start = len(self._songs)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_songs) - 1)
+            self._songs.extend(new_songs)
+            self.endInsertRows()
+        return len(new_songs)
+
+    def reset(self, songs=()):
+        """整体替换列表内容"""
+        self.beginResetModel()
+        self._songs, self._rows, self._icons = [], {}, {}
+        self._cover_waiters.clear()
+        for song in songs:
+            path = song["path"]
+            if path in self._rows:
+                continue
+            self._rows[path] = len(self._songs)
+            self._songs.append({"path": path, "name": song.get("name") or os.path.basename(path), "pic": song.get("pic")})
+        self.endResetModel()
+
+    def clear(self):
+        self.reset()
+
+    def remove_row(self, row):
+        """删除一行，返回被删除的条目"""
+        if not 0 <= row < len(self._songs):
+            return None
+        self.beginRemoveRows(QModelIndex(), row, row)
+        song = self._songs.pop(row)
+        del self._rows[song["path"]]
+        self._icons.pop(song["path"], None)
+        for index in range(row, len(self._songs)):
+            self._rows[self._songs[index]["path"]] = index
+        self.endRemoveRows()
+        return song
+
+    def set_name(self, row, name):
+        if 0 <= row < len(self._songs) and self._songs[row]["name"] != name:
+            self._songs[row]["name"] = name
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def set_path(self, row, path):
+        """文件被移动后改写路径，新路径已在列表中时返回 False"""
+        if not 0 <= row < len(self._songs) or path in self._rows:
+            return False
+        song = self._songs[row]
+        del self._rows[song["path"]]
+        self._icons.pop(song["path"], None)
+        song["path"] = path
+        self._rows[path] = row
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.UserRole, Qt.ToolTipRole, Qt.DecorationRole])
+        return True
+
+class PlaylistView(QListView):
+    """播放列表视图，接受从文件管理器拖入的文件和文件夹"""
+    files_dropped = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(False)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super().dragEnterEvent(event)
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super().dragMoveEvent(event)
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            event.acceptProposedAction()
+            self.files_dropped.emit(paths)
+        else:
+            super().dropEvent(event)
+
+def expand_audio_paths(paths):
+    """把文件和文件夹展开为音频文件列表，文件夹按路径顺序递归收集"""
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                result.extend(
+                    os.path.join(dir_path, name) for name in sorted(file_names)
+                    if name.lower().endswith(LIBRARY_EXTENSIONS)
+                )
+        elif path.lower().endswith(LIBRARY_EXTENSIONS):
+            result.append(path)
+    return result
+
 class PlaylistManager:
     def __init__(self):
         self.playlists = {}
@@ -1186,35 +2929,17 @@ class PlaylistManager:
         self.load_playlists()
         
     def load_playlists(self):
-        if os.path.exists(self.playlist_file):
-            try:
-                with open(self.playlist_file, 'r', encoding='utf-8') as f:
-                    self.playlists = json.load(f)
-                    logger.info(f"加载播放列表: {self.playlist_file}")
-            except Exception as e:
-                logger.error(f"加载播放列表失败: {str(e)}")
-                self.playlists = {}
-        else:
-            self.playlists = {"default": []}
-            self.save_playlists()
-            logger.info(f"创建新的播放列表文件: {self.playlist_file}")
+        # 与主界面共用同一个存储实例，playlists 就是存储中的字典
+        self.store = get_playlist_store(self.playlist_file)
+        self.playlists = self.store.playlists
+        logger.info(f"加载播放列表: {self.playlist_file}")
     
     def save_playlists(self):
-        try:
-            with open(self.playlist_file, 'w', encoding='utf-8') as f:
-                json.dump(self.playlists, f, ensure_ascii=False, indent=4)
-            logger.info(f"播放列表已保存到: {self.playlist_file}")
-            return True
-        except Exception as e:
-            logger.error(f"保存播放列表失败: {str(e)}")
-            return False
+        """直接修改 playlists 后调用，立即写入完整快照"""
+        return self.store.rewrite()
         
     def create_playlist(self, name):
-        if name not in self.playlists:
-            self.playlists[name] = []
-            self.save_playlists()
-            return True
-        return False
+        return self.store.create(name)
         
     def add_to_playlist(self, playlist_name, song_path):
         """添加歌曲到播放列表"""
@@ -1223,17 +2948,13 @@ class PlaylistManager:
             if isinstance(song_path, dict):
                 song_path = song_path.get("path", "")
             
-            if song_path and song_path not in self.playlists[playlist_name]:
-                self.playlists[playlist_name].append(song_path)
-                self.save_playlists()
-                return True
+            if song_path:
+                return self.store.add(playlist_name, [song_path]) > 0
         return False
         
     def remove_from_playlist(self, playlist_name, song_path):
         if playlist_name in self.playlists and song_path in self.playlists[playlist_name]:
-            self.playlists[playlist_name].remove(song_path)
-            self.save_playlists()
-            return True
+            return self.store.remove(playlist_name, [song_path])
         return False
         
     def play_playlist(self, playlist_name):
@@ -1471,7 +3192,7 @@ class SettingsDialog(QDialog):
         if config["name"] == "公共音乐API":
             test_url = "https://api.railgun.live/music/search?keyword=test&source=kugou&page=1&limit=1"
             try:
-                response = requests.get(test_url, timeout=5)
+                response = get_http_pool().get(test_url, timeout=5, retries=0)
                 if response.status_code == 200:
                     data = response.json()
                     if data.get("code") == 200 and data.get("data"):
@@ -1485,7 +3206,7 @@ class SettingsDialog(QDialog):
         else:
             # 其他音源的测试逻辑
             try:
-                response = requests.get(url, timeout=5)
+                response = get_http_pool().get(url, source=config, timeout=5, retries=0)
                 if response.status_code == 200:
                     QMessageBox.information(self, "测试成功", f"API连接正常: {url}")
                 else:
@@ -2124,29 +3845,44 @@ class ToolsDialog(QDialog):
             QMessageBox.critical(self, "错误", f"清理失败: {str(e)}")
             
     def batch_download(self):
-        """批量下载歌曲"""
-        song_names = self.song_list.toPlainText().strip().splitlines()
-        if not song_names:
-            QMessageBox.warning(self, "提示", "请输入歌曲名称")
+        """批量下载歌曲（未输入歌名时继续上次未完成的队列）"""
+        song_names = [name for name in self.song_list.toPlainText().strip().splitlines() if name.strip()]
+        if hasattr(self, 'batch_worker') and self.batch_worker.isRunning():
+            QMessageBox.warning(self, "提示", "批量下载正在进行中")
             return
             
+        # 创建工作线程（队列持久化，上次未完成的条目会一并继续）
+        self.batch_worker = BatchDownloadWorker(song_names)
+        if not self.batch_worker.queue.has_pending():
+            QMessageBox.warning(self, "提示", "请输入歌曲名称")
+            return
+        finished, total = self.batch_worker.queue.counts()
+
         # 创建进度对话框
-        self.progress_dialog = QProgressDialog("批量下载歌曲...", "取消", 0, len(song_names), self)
+        self.progress_dialog = QProgressDialog("批量下载歌曲...", "取消", 0, total, self)
         self.progress_dialog.setWindowTitle("批量下载")
         self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setValue(finished)
         self.progress_dialog.canceled.connect(self.cancel_batch_download)
         self.progress_dialog.show()
         
-        # 创建工作线程
-        self.batch_worker = BatchDownloadWorker(song_names)
         self.batch_worker.progress_updated.connect(self.update_batch_progress)
+        self.batch_worker.item_progress.connect(self.update_batch_item_progress)
         self.batch_worker.finished.connect(self.batch_download_completed)
-        self.batch_worker.start()
+        get_task_manager().start_thread(
+            self.batch_worker, "batch", TaskManager.PRIORITY_BACKGROUND, name=f"批量下载 ({total} 首)"
+        )
         
     def update_batch_progress(self, current, total, song_name):
-        """更新批量下载进度"""
+        """更新批量下载总进度"""
+        self.progress_dialog.setMaximum(total)
         self.progress_dialog.setValue(current)
-        self.progress_dialog.setLabelText(f"正在下载: {song_name}\n进度: {current}/{total}")
+        self.progress_dialog.setLabelText(f"已完成: {song_name}\n进度: {current}/{total}")
+
+    def update_batch_item_progress(self, item_id, song_name, percent):
+        """更新单首歌曲的下载进度"""
+        finished, total = self.batch_worker.queue.counts()
+        self.progress_dialog.setLabelText(f"正在下载: {song_name} ({percent}%)\n进度: {finished}/{total}")
         
     def batch_download_completed(self):
         """批量下载完成"""
@@ -2156,8 +3892,9 @@ class ToolsDialog(QDialog):
         
     def cancel_batch_download(self):
         """取消批量下载"""
-        if hasattr(self, 'batch_worker') and self.batch_worker.isRunning():
-            self.batch_worker.requestInterruption()
+        if hasattr(self, 'batch_worker'):
+            # 排队中的批量任务同样会被取消
+            get_task_manager().cancel_thread(self.batch_worker)
             self.download_status.setText("批量下载已取消")
 
 class PlaylistDialog(QDialog):
@@ -2269,247 +4006,2271 @@ class PlaylistDialog(QDialog):
                 if self.playlist_manager.remove_from_playlist(playlist_name, song_path):
                     self.update_song_list(playlist_name)
 
+# =============== 音频缓存与预取 ===============
+AUDIO_EXTENSIONS = (".mp3", ".flac", ".m4a", ".aac", ".ogg", ".wav", ".ape", ".wma")
+
+def resolve_download_url(url):
+    """把搜索结果中的歌曲地址转换为实际下载地址"""
+    # 公共音乐API有特殊的下载URL结构
+    if "api.railgun.live" in url:
+        download_url = url.replace("/info/", "/download/")
+        if not download_url.endswith(".mp3"):
+            download_url += ".mp3"
+        return download_url
+    return url
+
+class AudioCache:
+    """远程歌曲的磁盘缓存，总大小超过上限时按最近使用时间（文件 mtime）淘汰。
+    缓存文件只用于播放，用户确定保存时才通过 promote() 复制进音乐库"""
+    DEFAULT_MAX_MB = 512
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(get_data_dir(), "audio_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.protected = set()  # 正在播放或下载、不能淘汰的文件
+
+    def max_bytes(self):
+        return max(16, get_settings_store().get_int("audio_cache.max_mb", self.DEFAULT_MAX_MB)) * 1024 * 1024
+
+    def path_for(self, url):
+        ext = os.path.splitext(urllib.parse.urlparse(url).path)[1].lower()
+        if ext not in AUDIO_EXTENSIONS:
+            ext = ".mp3"
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+    def get(self, url, touch=True):
+        """返回已缓存的文件路径，命中时刷新其最近使用时间"""
+        if not url:
+            return None
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            return None
+        if touch:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+        return path
+
+    def fetch(self, url, cancel_check=None, progress_callback=None, source="netease"):
+        """下载到缓存并返回路径；被取消或失败时返回 None，已下载部分留待续传"""
+        cached = self.get(url)
+        if cached:
+            return cached
+        path = self.path_for(url)
+        self.protected.add(path)
+        try:
+            downloader = SegmentedDownloader(
+                resolve_download_url(url), path, source=source,
+                progress_callback=progress_callback, cancel_check=cancel_check
+            )
+            if not downloader.run():
+                return None
+        finally:
+            self.protected.discard(path)
+        self.evict()
+        return path
+
+    def promote(self, url, dest_path):
+        """把缓存中的歌曲复制到音乐库，缓存未命中时返回 False"""
+        cached = self.get(url)
+        if not cached:
+            return False
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        tmp_path = dest_path + ".tmp"
+        shutil.copyfile(cached, tmp_path)
+        os.replace(tmp_path, dest_path)
+        logger.info(f"缓存歌曲已保存到音乐库: {dest_path}")
+        return True
+
+    def evict(self):
+        """淘汰最久未使用的缓存文件直到总大小低于上限"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                total += stat.st_size
+                # 未完成的 .part/.part.json 也计入大小，但只淘汰完整文件
+                if entry.name.endswith(AUDIO_EXTENSIONS) and entry.path not in self.protected:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            limit = self.max_bytes()
+            for _, size, path in sorted(entries):
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.debug(f"淘汰音频缓存: {path}")
+                except OSError as e:
+                    logger.warning(f"删除音频缓存失败: {str(e)}")
+
+class TrackPrefetcher(QObject):
+    """按播放顺序把接下来的几首远程歌曲提前下载到音频缓存"""
+    prefetched = pyqtSignal(str, str)  # 歌曲URL, 缓存路径
+    failed = pyqtSignal(str)           # 歌曲URL
+    LOOKAHEAD = 2
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.tasks = {}
+
+    def lookahead(self):
+        return max(0, get_settings_store().get_int("prefetch.lookahead", self.LOOKAHEAD))
+
+    def is_fetching(self, url):
+        task = self.tasks.get(url)
+        return task is not None and task.state in ("pending", "running")
+
+    def is_running(self, url):
+        task = self.tasks.get(url)
+        return task is not None and task.state == "running"
+
+    def schedule(self, urls, sources=None):
+        """只保留 urls 的预取任务：新增未缓存的，取消不再需要的；sources 为 URL -> 请求头来源"""
+        sources = sources or {}
+        wanted = [url for url in urls if url]
+        manager = get_task_manager()
+        for url, task in list(self.tasks.items()):
+            if url not in wanted or task.state not in ("pending", "running"):
+                manager.cancel(task)
+                del self.tasks[url]
+        for url in wanted:
+            if url in self.tasks or self.cache.get(url, touch=False):
+                continue
+            self.tasks[url] = manager.submit(
+                lambda token, url=url, source=sources.get(url, "netease"): self.cache.fetch(
+                    url, cancel_check=token, source=source),
+                "prefetch", TaskManager.PRIORITY_BACKGROUND,
+                name=f"预取: {os.path.basename(urllib.parse.urlparse(url).path) or url}",
+                on_done=lambda path, url=url: self._on_done(url, path),
+                on_error=lambda error, url=url: self._on_error(url, error),
+            )
+
+    def cancel(self, url):
+        task = self.tasks.pop(url, None)
+        if task is not None:
+            get_task_manager().cancel(task)
+
+    def _on_done(self, url, path):
+        self.tasks.pop(url, None)
+        if path:
+            logger.info(f"预取完成: {url}")
+            self.prefetched.emit(url, path)
+        else:
+            self.failed.emit(url)
+
+    def _on_error(self, url, error):
+        self.tasks.pop(url, None)
+        logger.warning(f"预取失败 {url}: {str(error)}")
+        self.failed.emit(url)
+
+# =============== 边下边播 ===============
+AUDIO_CONTENT_TYPES = {
+    ".mp3": "audio/mpeg", ".flac": "audio/flac", ".m4a": "audio/mp4", ".aac": "audio/aac",
+    ".ogg": "audio/ogg", ".wav": "audio/wav", ".ape": "audio/x-ape", ".wma": "audio/x-ms-wma",
+}
+
+class StreamSession:
+    """一首远程歌曲的边下边播会话：后台线程从源站顺序拉取数据写入本地稀疏文件，
+    播放器请求尚未下载的位置时改从该位置发起 Range 请求，全部下载完成后存入音频缓存"""
+    CHUNK_SIZE = 64 * 1024
+    SEEK_THRESHOLD = 512 * 1024   # 请求位置领先下载进度超过此值时跳过去拉取
+    FETCH_RETRIES = 3
+
+    def __init__(self, url, cache, source="netease"):
+        self.url = url
+        self.download_url = resolve_download_url(url)
+        self.cache = cache
+        self.source = source
+        self.final_path = cache.path_for(url)
+        self.data_path = self.final_path + ".stream"
+        self.content_type = AUDIO_CONTENT_TYPES.get(os.path.splitext(self.final_path)[1], "application/octet-stream")
+        self.total = 0
+        self.accept_ranges = False
+        self.ranges = []          # 已下载区间 [start, end)，有序且互不重叠
+        self.fetch_from = 0       # 下载线程下一次开始拉取的位置
+        self.fetch_pos = 0        # 下载线程当前写到的位置
+        self.cond = threading.Condition()
+        self.closed = False
+        self.complete = False
+        self.error = None
+        self._restart = False
+        self._thread = None
+
+    def open(self):
+        """探测文件大小并启动下载线程（阻塞的网络请求，不要在主线程调用）"""
+        info = SegmentedDownloader(self.download_url, self.data_path, source=self.source).probe()
+        if info["total"] <= 0:
+            raise IOError("无法获取文件大小，不能边下边播")
+        self.download_url = info["url"]
+        self.total = info["total"]
+        self.accept_ranges = info["accept_ranges"]
+        with open(self.data_path, "wb") as f:
+            f.truncate(self.total)
+        self._thread = threading.Thread(target=self._fetch_loop, name="stream-fetch", daemon=True)
+        self._thread.start()
+
+    def _covered_end(self, pos):
+        """pos 所在已下载区间的结束位置，pos 尚未下载时返回 pos"""
+        for start, end in self.ranges:
+            if start <= pos < end:
+                return end
+            if start > pos:
+                break
+        return pos
+
+    def _add_range(self, start, end):
+        merged = []
+        for range_start, range_end in sorted(self.ranges + [(start, end)]):
+            if merged and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+            else:
+                merged.append((range_start, range_end))
+        self.ranges = merged
+
+    def _gap_end(self, pos):
+        """pos 所在缺口的结束位置：其后第一个已下载区间的开始，没有时为文件末尾"""
+        for start, end in self.ranges:
+            if start > pos:
+                return start
+        return self.total
+
+    def _next_gap(self, pos):
+        """pos 之后第一个未下载的位置，后面都已下载时从头找，全部完成返回 None"""
+        for candidate in (pos, 0):
+            candidate = self._covered_end(candidate)
+            while candidate < self.total:
+                end = self._covered_end(candidate)
+                if end == candidate:
+                    return candidate
+                candidate = end
+        return None
+
+    def buffered(self, pos):
+        """pos 开始连续可读的字节数"""
+        with self.cond:
+            return self._covered_end(pos) - pos
+
+    def _fetch_loop(self):
+        failures = 0
+        while True:
+            with self.cond:
+                if self.closed:
+                    return
+                start = self._next_gap(self.fetch_from)
+                self._restart = False
+            if start is None:
+                break
+            try:
+                if self._fetch_from(start) or self._restart:
+                    failures = 0
+                    continue
+                error = IOError("服务器未返回数据")
+            except Exception as e:
+                error = e
+            failures += 1
+            if failures > self.FETCH_RETRIES:
+                logger.error(f"边下边播下载失败: {str(error)}")
+                with self.cond:
+                    self.error = error
+                    self.cond.notify_all()
+                return
+            logger.warning(f"边下边播下载中断，重试 ({failures}/{self.FETCH_RETRIES}): {str(error)}")
+            time.sleep(0.5 * 2 ** failures)
+        self._finish()
+
+    def _fetch_from(self, start):
+        """从 start 开始拉取到所在缺口结束（跳转后只请求缺少的字节），返回本次写入的字节数"""
+        if self.accept_ranges:
+            with self.cond:
+                gap_end = self._gap_end(start)
+            headers = {"Range": f"bytes={start}-{gap_end - 1}"}
+        else:
+            start, gap_end, headers = 0, self.total, None
+        with get_http_pool().stream("GET", self.download_url, source=self.source, headers=headers) as response:
+            if response.status_code not in (200, 206):
+                raise IOError(f"HTTP状态码 {response.status_code}")
+            if response.status_code != 206:
+                start, gap_end = 0, self.total
+            pos = begin = start
+            with open(self.data_path, "r+b") as f:
+                f.seek(pos)
+                for chunk in response.iter_bytes(self.CHUNK_SIZE):
+                    chunk = chunk[:gap_end - pos]
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    # 读取方用独立的文件句柄，写入后立即刷新
+                    f.flush()
+                    with self.cond:
+                        self._add_range(pos, pos + len(chunk))
+                        pos += len(chunk)
+                        self.fetch_pos = pos
+                        self.cond.notify_all()
+                        if self.closed or self._restart:
+                            break
+                        self.fetch_from = pos
+                        # 追上已下载的区间后断开，重新从下一个缺口开始
+                        if self.accept_ranges and self._covered_end(pos) > pos:
+                            break
+            return pos - begin
+
+    def _finish(self):
+        """下载完整后复制进音频缓存（数据文件可能正被播放器读取，不能直接重命名）"""
+        try:
+            tmp_path = self.final_path + ".tmp"
+            shutil.copyfile(self.data_path, tmp_path)
+            os.replace(tmp_path, self.final_path)
+            self.complete = True
+            self.cache.evict()
+            logger.info(f"边下边播完成，已存入音频缓存: {self.url}")
+        except OSError as e:
+            logger.warning(f"保存边下边播文件失败: {str(e)}")
+        with self.cond:
+            self.cond.notify_all()
+
+    def request_range(self, pos):
+        """播放器要读取 pos 处的数据：若远离当前下载进度则让下载线程改从 pos 拉取"""
+        with self.cond:
+            if not self.accept_ranges or self._covered_end(pos) > pos:
+                return
+            if pos < self.fetch_pos or pos > self.fetch_pos + self.SEEK_THRESHOLD:
+                logger.debug(f"边下边播跳转拉取: {pos}")
+                self.fetch_from = pos
+                self._restart = True
+
+    def read(self, f, pos, size, timeout):
+        """从 f 读取 pos 开始的最多 size 字节，数据尚未到达时最多等待 timeout 秒"""
+        with self.cond:
+            self.cond.wait_for(
+                lambda: self._covered_end(pos) > pos or self.closed or self.error is not None, timeout
+            )
+            available = self._covered_end(pos) - pos
+        if available <= 0:
+            return b""
+        f.seek(pos)
+        return f.read(min(size, available))
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        try:
+            os.remove(self.data_path)
+        except OSError:
+            pass
+
+class StreamingProxy:
+    """本机回环 HTTP 服务，把边下边播会话以支持 Range 的地址提供给 QMediaPlayer"""
+    STALL_TIMEOUT = 30
+
+    def __init__(self):
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self.server = None
+        self.port = 0
+
+    def start(self):
+        if self.server is not None:
+            return
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                proxy._serve(self, send_body=True)
+
+            def do_HEAD(self):
+                proxy._serve(self, send_body=False)
+
+            def log_message(self, format, *args):
+                logger.debug("边下边播代理: " + format % args)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="stream-proxy", daemon=True).start()
+        logger.info(f"边下边播代理已启动，端口: {self.port}")
+
+    def open(self, url, cache, source="netease"):
+        """为歌曲URL创建会话并返回给播放器使用的本地地址（阻塞，不要在主线程调用）"""
+        self.start()
+        session = StreamSession(url, cache, source=source)
+        session.open()
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self.sessions[session_id] = session
+        ext = os.path.splitext(session.final_path)[1]
+        return f"http://127.0.0.1:{self.port}/stream/{session_id}{ext}"
+
+    def close(self, local_url):
+        """关闭本地地址对应的会话"""
+        session_id = os.path.splitext(local_url.rsplit("/", 1)[-1])[0]
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def shutdown(self):
+        with self._lock:
+            sessions, self.sessions = list(self.sessions.values()), {}
+        for session in sessions:
+            session.close()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _serve(self, handler, send_body):
+        session_id = os.path.splitext(handler.path.rsplit("/", 1)[-1])[0]
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            handler.send_error(404)
+            return
+        total = session.total
+        start, end = 0, total - 1
+        match = re.match(r"bytes=(\d*)-(\d*)", handler.headers.get("Range", ""))
+        partial = bool(match and (match.group(1) or match.group(2)))
+        if partial:
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), total - 1)
+            else:
+                start = max(0, total - int(match.group(2)))
+            if start > end:
+                handler.send_response(416)
+                handler.send_header("Content-Range", f"bytes */{total}")
+                handler.end_headers()
+                return
+        try:
+            handler.send_response(206 if partial else 200)
+            if partial:
+                handler.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+            handler.send_header("Content-Type", session.content_type)
+            handler.send_header("Content-Length", str(end - start + 1))
+            handler.send_header("Accept-Ranges", "bytes")
+            handler.end_headers()
+            if not send_body:
+                return
+            session.request_range(start)
+            pos = start
+            with open(session.data_path, "rb") as f:
+                while pos <= end:
+                    chunk = session.read(f, pos, min(StreamSession.CHUNK_SIZE, end - pos + 1), self.STALL_TIMEOUT)
+                    if not chunk:
+                        break
+                    handler.wfile.write(chunk)
+                    pos += len(chunk)
+        except (ConnectionError, OSError):
+            # 播放器跳转或切歌时会主动断开连接
+            pass
+
+_streaming_proxy = None
+
+def get_streaming_proxy():
+    """获取全局边下边播代理"""
+    global _streaming_proxy
+    if _streaming_proxy is None:
+        _streaming_proxy = StreamingProxy()
+        atexit.register(_streaming_proxy.shutdown)
+    return _streaming_proxy
+
+# =============== 媒体库索引 ===============
+LIBRARY_EXTENSIONS = (".mp3", ".wav", ".flac", ".m4a")
+
+def get_lyrics_dir():
+    """下载歌词的默认保存目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "lrc")
+
+def find_lyrics_file(song_path):
+    """查找歌曲对应的歌词文件：先找同目录同名 .lrc，再找歌词目录"""
+    base_name = os.path.splitext(os.path.basename(song_path))[0]
+    for candidate in (os.path.splitext(song_path)[0] + ".lrc",
+                      os.path.join(get_lyrics_dir(), base_name + ".lrc")):
+        if os.path.exists(candidate):
+            return candidate
+    return ""
+
+def quick_file_hash(path, size=None, block=64 * 1024):
+    """内容指纹：文件大小 + 首尾各 64KB 的 SHA1，大曲库中比全文件哈希快得多"""
+    size = os.path.getsize(path) if size is None else size
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(block))
+        if size > block * 2:
+            f.seek(size - block)
+            digest.update(f.read(block))
+    return digest.hexdigest()
+
+def read_audio_tags(path):
+    """用 mutagen 读取标题、艺术家、专辑和时长（毫秒），读取失败的字段为空"""
+    tags = {"title": "", "artist": "", "album": "", "duration": 0}
+    if not MUTAGEN_AVAILABLE:
+        return tags
+    try:
+        audio = mutagen.File(path, easy=True)
+    except Exception as e:
+        logger.debug(f"读取标签失败 {path}: {str(e)}")
+        return tags
+    if audio is None:
+        return tags
+    if audio.tags:
+        for key in ("title", "artist", "album"):
+            values = audio.tags.get(key)
+            if values:
+                tags[key] = " / ".join(str(value) for value in values)
+    if getattr(audio, "info", None) is not None and getattr(audio.info, "length", None):
+        tags["duration"] = int(audio.info.length * 1000)
+    return tags
+
+def _parse_replaygain(value):
+    """解析 "-6.52 dB" / "0.988" 形式的 ReplayGain 值"""
+    match = re.match(r"\s*([-+]?\d+(?:\.\d+)?)", str(value or ""))
+    return float(match.group(1)) if match else None
+
+def _replaygain_tags(audio):
+    """取出各格式标签中的 replaygain_* 字段：ID3 的 TXXX 帧、Vorbis 注释、MP4 的 iTunes 自由字段"""
+    tags = audio.tags
+    values = {}
+    if tags is None:
+        return values
+    if hasattr(tags, "getall"):
+        for frame in tags.getall("TXXX"):
+            if frame.desc.lower().startswith("replaygain_") and frame.text:
+                values[frame.desc.lower()] = str(frame.text[0])
+        return values
+    for key, value in tags.items():
+        name = key.lower().rsplit(":", 1)[-1]
+        if not name.startswith("replaygain_"):
+            continue
+        if isinstance(value, list):
+            value = value[0] if value else ""
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", "ignore")
+        values[name] = str(value)
+    return values
+
+def _embedded_cover(audio):
+    """取内嵌封面图片数据，优先封面类型（3）的图片"""
+    tags = audio.tags
+    if tags is not None and hasattr(tags, "getall"):
+        frames = sorted(tags.getall("APIC"), key=lambda frame: frame.type != 3)
+        if frames:
+            return frames[0].data
+    pictures = getattr(audio, "pictures", None)
+    if pictures:
+        return sorted(pictures, key=lambda picture: picture.type != 3)[0].data
+    if tags is not None and hasattr(tags, "get"):
+        covers = tags.get("covr")
+        if covers:
+            return bytes(covers[0])
+    return None
+
+def _save_cover(data, cover_dir):
+    """按内容哈希保存封面，同一专辑的多首歌共用一个文件"""
+    ext = ".png" if data[:8] == b"\x89PNG\r\n\x1a\n" else ".jpg"
+    path = os.path.join(cover_dir, hashlib.sha1(data).hexdigest() + ext)
+    if not os.path.exists(path):
+        # 多个工作进程可能同时写同一张封面，先写临时文件再原子替换
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return path
+
+def read_audio_extras(path, cover_dir=None):
+    """读取 ReplayGain（音轨增益 dB、峰值）和内嵌封面，cover_dir 为空时不保存封面"""
+    extras = {"replay_gain": None, "replay_peak": None, "cover_path": ""}
+    if not MUTAGEN_AVAILABLE:
+        return extras
+    try:
+        audio = mutagen.File(path)
+    except Exception as e:
+        logger.debug(f"读取扩展标签失败 {path}: {str(e)}")
+        return extras
+    if audio is None:
+        return extras
+    replaygain = _replaygain_tags(audio)
+    extras["replay_gain"] = _parse_replaygain(replaygain.get("replaygain_track_gain"))
+    extras["replay_peak"] = _parse_replaygain(replaygain.get("replaygain_track_peak"))
+    if cover_dir:
+        try:
+            data = _embedded_cover(audio)
+            if data:
+                extras["cover_path"] = _save_cover(data, cover_dir)
+        except Exception as e:
+            logger.debug(f"提取内嵌封面失败 {path}: {str(e)}")
+    return extras
+
+def extract_track_metadata(path, cover_dir=None):
+    """读取单个文件的大小、修改时间、内容指纹、标签、时长、ReplayGain 和内嵌封面。
+    只依赖可序列化参数，可在子进程中运行；文件不可读时返回 None"""
+    try:
+        stat = os.stat(path)
+        content_hash = quick_file_hash(path, stat.st_size)
+    except OSError as e:
+        logger.warning(f"读取文件失败 {path}: {str(e)}")
+        return None
+    metadata = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime, "content_hash": content_hash}
+    metadata.update(read_audio_tags(path))
+    metadata.update(read_audio_extras(path, cover_dir))
+    return metadata
+
+def extract_metadata_batch(paths, cover_dir=None):
+    """进程池任务：一次处理一批文件，减少进程间往返"""
+    return [metadata for metadata in (extract_track_metadata(path, cover_dir) for path in paths) if metadata]
+
+class MetadataExtractor:
+    """批量提取音频元数据。mutagen 解析是纯 Python 的 CPU 密集操作，线程受 GIL 限制，
+    文件多时改用进程池并行，结果按完成顺序逐批产出，由调用方写入索引"""
+    INLINE_THRESHOLD = 16
+    CHUNK_SIZE = 16
+
+    def __init__(self, cover_dir=None, workers=None):
+        self.cover_dir = cover_dir
+        self.workers = workers or get_settings_store().get_int("library.extract_workers", 0) or os.cpu_count() or 1
+
+    def extract(self, paths, cancel_check=None):
+        """逐个产出元数据字典，读取失败的文件跳过"""
+        paths = list(paths)
+        if self.cover_dir:
+            os.makedirs(self.cover_dir, exist_ok=True)
+        pool = None
+        if len(paths) > self.INLINE_THRESHOLD and self.workers > 1:
+            try:
+                # 主进程里有 Qt 和事件循环线程，fork 出的子进程可能继承被占用的锁，统一用 spawn
+                pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=min(self.workers, (len(paths) + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"无法创建元数据进程池，改为单进程读取: {str(e)}")
+        if pool is None:
+            for path in paths:
+                if cancel_check and cancel_check():
+                    return
+                metadata = extract_track_metadata(path, self.cover_dir)
+                if metadata:
+                    yield metadata
+            return
+
+        futures = [
+            pool.submit(extract_metadata_batch, paths[start:start + self.CHUNK_SIZE], self.cover_dir)
+            for start in range(0, len(paths), self.CHUNK_SIZE)
+        ]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                if cancel_check and cancel_check():
+                    return
+                try:
+                    batch = future.result()
+                except Exception as e:
+                    # 子进程崩溃（BrokenProcessPool）时其余批次也会失败，逐条记录后跳过
+                    logger.warning(f"元数据提取批次失败: {str(e)}")
+                    continue
+                yield from batch
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+def track_display_name(track):
+    """索引记录在播放列表中的显示名称，没有标题标签时返回空字符串"""
+    if not track or not track.get("title"):
+        return ""
+    return f"{track['title']} - {track['artist']}" if track.get("artist") else track["title"]
+
+class MediaLibrary:
+    """音乐库索引（SQLite）：记录音乐目录下每个文件的大小、修改时间、标签、时长、
+    ReplayGain、内嵌封面、内容指纹和歌词位置。按 (大小, 修改时间) 增量更新，
+    FTS5 全文检索标题/艺术家/专辑"""
+    COMMIT_INTERVAL = 500
+    TRACK_COLUMNS = ("path", "dir", "name", "size", "mtime", "title", "artist", "album",
+                     "duration", "replay_gain", "replay_peak", "cover_path",
+                     "content_hash", "lyrics_path", "scanned_at")
+    # 旧版本数据库缺少的列
+    ADDED_COLUMNS = {
+        "replay_gain": "REAL",
+        "replay_peak": "REAL",
+        "cover_path": "TEXT NOT NULL DEFAULT ''",
+    }
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir(), "library.db")
+        self.cover_dir = os.path.join(os.path.dirname(self.db_path), "library_covers")
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                artist TEXT NOT NULL DEFAULT '',
+                album TEXT NOT NULL DEFAULT '',
+                duration INTEGER NOT NULL DEFAULT 0,
+                replay_gain REAL,
+                replay_peak REAL,
+                cover_path TEXT NOT NULL DEFAULT '',
+                content_hash TEXT NOT NULL DEFAULT '',
+                lyrics_path TEXT NOT NULL DEFAULT '',
+                scanned_at REAL NOT NULL
+            )
+        """)
+        self._migrate_columns()
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tracks_dir ON tracks(dir)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tracks_hash ON tracks(content_hash)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tracks_name ON tracks(name)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                mtime REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent)")
+        self.fts_enabled = self._create_fts()
+        self.conn.commit()
+
+    def _migrate_columns(self):
+        """给旧数据库补上新增的列，并让已有记录在下次扫描时重新提取元数据"""
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(tracks)")}
+        missing = [column for column in self.ADDED_COLUMNS if column not in existing]
+        for column in missing:
+            self.conn.execute(f"ALTER TABLE tracks ADD COLUMN {column} {self.ADDED_COLUMNS[column]}")
+        if missing:
+            self.conn.execute("UPDATE tracks SET mtime = 0")
+            logger.info(f"媒体库索引已升级，新增列: {', '.join(missing)}")
+
+    def _create_fts(self):
+        """创建 FTS5 外部内容表及同步触发器，SQLite 未编译 FTS5 时退回 LIKE 查询"""
+        try:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+                    title, artist, album, name, content='tracks', content_rowid='rowid'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite 不支持 FTS5，媒体库搜索改用 LIKE: {str(e)}")
+            return False
+        self.conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+                INSERT INTO tracks_fts(rowid, title, artist, album, name)
+                VALUES (new.rowid, new.title, new.artist, new.album, new.name);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+                INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album, name)
+                VALUES ('delete', old.rowid, old.title, old.artist, old.album, old.name);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+                INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album, name)
+                VALUES ('delete', old.rowid, old.title, old.artist, old.album, old.name);
+                INSERT INTO tracks_fts(rowid, title, artist, album, name)
+                VALUES (new.rowid, new.title, new.artist, new.album, new.name);
+            END;
+        """)
+        return True
+
+    @staticmethod
+    def default_root():
+        return get_settings_store().get_str("save_paths.music", "")
+
+    @staticmethod
+    def is_audio_file(name):
+        return name.lower().endswith(LIBRARY_EXTENSIONS)
+
+    def _row_to_track(self, row):
+        return dict(zip(self.TRACK_COLUMNS, row))
+
+    # ---------- 扫描与更新 ----------
+    def scan(self, root=None, cancel_check=None, progress_callback=None):
+        """增量扫描 root：只重新读取大小或修改时间变化的文件，删除已不存在的记录。
+        返回 (新增或更新数, 删除数)"""
+        root = os.path.abspath(root or self.default_root())
+        if not root or not os.path.isdir(root):
+            return 0, 0
+        with self._lock:
+            known = {
+                path: (size, mtime) for path, size, mtime in self.conn.execute(
+                    "SELECT path, size, mtime FROM tracks WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                    (root, self._like_prefix(root))
+                )
+            }
+        seen = set()
+        seen_dirs = []
+        stale = []
+        for dir_path, dir_names, file_names in os.walk(root):
+            if cancel_check and cancel_check():
+                logger.info("媒体库扫描已取消")
+                return 0, 0
+            try:
+                seen_dirs.append((dir_path, os.path.dirname(dir_path), os.stat(dir_path).st_mtime))
+            except OSError:
+                continue
+            for name in file_names:
+                if not self.is_audio_file(name):
+                    continue
+                path = os.path.join(dir_path, name)
+                seen.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if known.get(path) == (stat.st_size, stat.st_mtime):
+                    continue
+                stale.append(path)
+        updated = len(self.index_files(stale, cancel_check, progress_callback, skip_unchanged=False))
+        if cancel_check and cancel_check():
+            logger.info("媒体库扫描已取消")
+            return updated, 0
+        removed = [path for path in known if path not in seen]
+        with self._lock:
+            self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+            self.conn.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (root, self._like_prefix(root)))
+            self.conn.executemany("INSERT OR REPLACE INTO dirs(path, parent, mtime) VALUES (?, ?, ?)", seen_dirs)
+            self.conn.commit()
+        logger.info(f"媒体库扫描完成: {root}，更新 {updated} 首，移除 {len(removed)} 首，共 {len(seen)} 首")
+        return updated, len(removed)
+
+    def index_files(self, paths, cancel_check=None, progress_callback=None, skip_unchanged=True):
+        """并行提取一批文件的元数据并逐条写入索引，返回写入的歌曲记录。
+        skip_unchanged 时跳过 (大小, 修改时间) 与索引一致的文件"""
+        paths = list(dict.fromkeys(paths))
+        if skip_unchanged:
+            paths = self.stale_paths(paths)
+        tracks = []
+        for metadata in MetadataExtractor(self.cover_dir).extract(paths, cancel_check):
+            track = self.update_file(metadata["path"], metadata=metadata, commit=False)
+            if not track:
+                continue
+            tracks.append(track)
+            if len(tracks) % self.COMMIT_INTERVAL == 0:
+                with self._lock:
+                    self.conn.commit()
+                if progress_callback:
+                    progress_callback(len(tracks))
+        with self._lock:
+            self.conn.commit()
+        return tracks
+
+    def stale_paths(self, paths):
+        """返回 paths 中未索引或 (大小, 修改时间) 已变化的文件"""
+        paths = list(paths)
+        known = {}
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                batch = paths[start:start + 500]
+                known.update(
+                    (path, (size, mtime)) for path, size, mtime in self.conn.execute(
+                        f"SELECT path, size, mtime FROM tracks WHERE path IN ({', '.join('?' * len(batch))})", batch
+                    )
+                )
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) != (stat.st_size, stat.st_mtime):
+                stale.append(path)
+        return stale
+
+    def update_file(self, path, metadata=None, commit=True):
+        """把单个文件的元数据写入索引，metadata 为空时在当前线程读取文件"""
+        if metadata is None:
+            metadata = extract_track_metadata(path, self.cover_dir)
+            if metadata is None:
+                return None
+        track = {
+            "path": path,
+            "dir": os.path.dirname(path),
+            "name": os.path.basename(path),
+            "size": metadata["size"],
+            "mtime": metadata["mtime"],
+            "title": metadata.get("title", ""),
+            "artist": metadata.get("artist", ""),
+            "album": metadata.get("album", ""),
+            "duration": int(metadata.get("duration", 0) or 0),
+            "replay_gain": metadata.get("replay_gain"),
+            "replay_peak": metadata.get("replay_peak"),
+            "cover_path": metadata.get("cover_path", ""),
+            "content_hash": metadata["content_hash"],
+            "lyrics_path": find_lyrics_file(path),
+            "scanned_at": time.time(),
+        }
+        with self._lock:
+            # UPSERT 而不是 REPLACE，保持 rowid 不变以便 FTS 触发器正确同步
+            self.conn.execute(f"""
+                INSERT INTO tracks({", ".join(self.TRACK_COLUMNS)})
+                VALUES ({", ".join("?" * len(self.TRACK_COLUMNS))})
+                ON CONFLICT(path) DO UPDATE SET
+                    {", ".join(f"{column}=excluded.{column}" for column in self.TRACK_COLUMNS[1:])}
+            """, [track[column] for column in self.TRACK_COLUMNS])
+            if commit:
+                self.conn.commit()
+        return track
+
+    def scan_directory(self, dir_path):
+        """只重新检查一个目录（已知子目录不递归），新出现的子目录整体索引。
+        返回 (新增或变化的歌曲, 删除的歌曲, 新出现的目录)"""
+        dir_path = os.path.abspath(dir_path)
+        with self._lock:
+            known = {
+                row[0]: self._row_to_track(row) for row in self.conn.execute(
+                    f"SELECT {', '.join(self.TRACK_COLUMNS)} FROM tracks WHERE dir = ?", (dir_path,)
+                )
+            }
+            known_dirs = {row[0] for row in self.conn.execute(
+                "SELECT path FROM dirs WHERE parent = ? AND path != ?", (dir_path, dir_path)
+            )}
+        if not os.path.isdir(dir_path):
+            removed = self.tracks_under(dir_path)
+            self.remove_path(dir_path)
+            return [], removed, []
+
+        removed, new_dirs = [], []
+        seen, subdirs, stale = set(), set(), []
+        for entry in os.scandir(dir_path):
+            if entry.is_dir():
+                subdirs.add(entry.path)
+            elif self.is_audio_file(entry.name):
+                seen.add(entry.path)
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                track = known.get(entry.path)
+                if track and (track["size"], track["mtime"]) == (stat.st_size, stat.st_mtime):
+                    continue
+                stale.append(entry.path)
+        changed = self.index_files(stale, skip_unchanged=False)
+
+        with self._lock:
+            # 同目录 .lrc 增删时刷新未变化歌曲的歌词位置
+            changed_paths = {track["path"] for track in changed}
+            for path, track in known.items():
+                if path in seen and path not in changed_paths:
+                    lyrics_path = find_lyrics_file(path)
+                    if lyrics_path != track["lyrics_path"]:
+                        self.conn.execute("UPDATE tracks SET lyrics_path = ? WHERE path = ?", (lyrics_path, path))
+            gone = [track for path, track in known.items() if path not in seen]
+            self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(track["path"],) for track in gone])
+            removed.extend(gone)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO dirs(path, parent, mtime) VALUES (?, ?, ?)",
+                (dir_path, os.path.dirname(dir_path), os.stat(dir_path).st_mtime)
+            )
+            self.conn.commit()
+        for path in known_dirs - subdirs:
+            removed.extend(self.tracks_under(path))
+            self.remove_path(path)
+        for path in sorted(subdirs - known_dirs):
+            tracks, dirs = self._index_tree(path)
+            changed.extend(tracks)
+            new_dirs.extend(dirs)
+        return changed, removed, new_dirs
+
+    def _index_tree(self, root):
+        """索引一个新出现的目录树，返回 (歌曲记录, 目录列表)"""
+        paths, dirs = [], []
+        for dir_path, _, file_names in os.walk(root):
+            try:
+                dirs.append((dir_path, os.path.dirname(dir_path), os.stat(dir_path).st_mtime))
+            except OSError:
+                continue
+            paths.extend(os.path.join(dir_path, name) for name in file_names if self.is_audio_file(name))
+        tracks = self.index_files(paths, skip_unchanged=False)
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO dirs(path, parent, mtime) VALUES (?, ?, ?)", dirs)
+            self.conn.commit()
+        return tracks, [path for path, _, _ in dirs]
+
+    def refresh_lyrics_dir(self, lyrics_dir):
+        """歌词目录变化后更新引用它的歌曲，只比较文件名，不逐个访问磁盘"""
+        lyrics_dir = os.path.abspath(lyrics_dir)
+        try:
+            names = {os.path.splitext(name)[0] for name in os.listdir(lyrics_dir) if name.lower().endswith(".lrc")}
+        except OSError:
+            names = set()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, lyrics_path FROM tracks WHERE lyrics_path = '' OR lyrics_path LIKE ? ESCAPE '\\'",
+                (self._like_prefix(lyrics_dir),)
+            ).fetchall()
+            updates = []
+            for path, lyrics_path in rows:
+                base_name = os.path.splitext(os.path.basename(path))[0]
+                new_path = os.path.join(lyrics_dir, base_name + ".lrc") if base_name in names else ""
+                if new_path != lyrics_path:
+                    updates.append((new_path, path))
+            self.conn.executemany("UPDATE tracks SET lyrics_path = ? WHERE path = ?", updates)
+            self.conn.commit()
+        return len(updates)
+
+    def tracks_under(self, path):
+        """目录下（递归）的全部歌曲记录"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(self.TRACK_COLUMNS)} FROM tracks WHERE path LIKE ? ESCAPE '\\'",
+                (self._like_prefix(path),)
+            ).fetchall()
+        return [self._row_to_track(row) for row in rows]
+
+    def indexed_dirs(self, root=None):
+        """索引中 root 及其下的全部目录"""
+        root = os.path.abspath(root or self.default_root())
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT path FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (root, self._like_prefix(root))
+            )]
+
+    def remove_path(self, path):
+        """删除文件或目录（含其下全部内容）的索引记录"""
+        with self._lock:
+            prefix = self._like_prefix(path)
+            self.conn.execute("DELETE FROM tracks WHERE path = ? OR path LIKE ? ESCAPE '\\'", (path, prefix))
+            self.conn.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (path, prefix))
+            self.conn.commit()
+
+    @staticmethod
+    def _like_prefix(path):
+        # 目录前缀匹配，转义 LIKE 通配符
+        escaped = path.rstrip("/\\").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escaped + os.sep.replace("\\", "\\\\") + "%"
+
+    # ---------- 查询 ----------
+    def get_track(self, path):
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(self.TRACK_COLUMNS)} FROM tracks WHERE path = ?", (path,)
+            ).fetchone()
+        return self._row_to_track(row) if row else None
+
+    def get_tracks(self, paths):
+        """批量查询索引记录，返回 {路径: 记录}，未索引的路径不在结果中"""
+        paths = list(paths)
+        tracks = {}
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                batch = paths[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT {', '.join(self.TRACK_COLUMNS)} FROM tracks WHERE path IN ({', '.join('?' * len(batch))})",
+                    batch
+                )
+                tracks.update((row[0], self._row_to_track(row)) for row in rows)
+        return tracks
+
+    def find_by_names(self, names):
+        """按文件名批量查找，返回 {文件名: [记录, ...]}"""
+        names = list(names)
+        found = {}
+        with self._lock:
+            for start in range(0, len(names), 500):
+                batch = names[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT {', '.join(self.TRACK_COLUMNS)} FROM tracks WHERE name IN ({', '.join('?' * len(batch))})",
+                    batch
+                )
+                for row in rows:
+                    track = self._row_to_track(row)
+                    found.setdefault(track["name"], []).append(track)
+        return found
+
+    def known_paths(self, paths):
+        """返回 paths 中已在索引里的路径集合"""
+        paths = list(paths)
+        found = set()
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                batch = paths[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT path FROM tracks WHERE path IN ({', '.join('?' * len(batch))})", batch
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def is_indexed_dir(self, path):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM dirs WHERE path = ?", (os.path.abspath(path),)).fetchone() is not None
+
+    def list_directory(self, path):
+        """从索引列出目录内容 (子目录列表, 歌曲列表)，目录未被索引时返回 None"""
+        path = os.path.abspath(path)
+        if not self.is_indexed_dir(path):
+            return None
+        with self._lock:
+            dirs = [row[0] for row in self.conn.execute(
+                "SELECT path FROM dirs WHERE parent = ? AND path != ? ORDER BY path", (path, path)
+            )]
+            tracks = [self._row_to_track(row) for row in self.conn.execute(
+                f"SELECT {', '.join(self.TRACK_COLUMNS)} FROM tracks WHERE dir = ? ORDER BY name", (path,)
+            )]
+        return dirs, tracks
+
+    def search(self, query, limit=50):
+        """按标题、艺术家、专辑和文件名检索"""
+        terms = [term for term in re.split(r"\s+", str(query or "").strip()) if term]
+        if not terms:
+            return []
+        columns = ", ".join(f"tracks.{column}" for column in self.TRACK_COLUMNS)
+        rows = []
+        with self._lock:
+            if self.fts_enabled:
+                # 每个词按前缀匹配，双引号转义后作为 FTS 字符串
+                match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+                rows = self.conn.execute(f"""
+                    SELECT {columns} FROM tracks_fts JOIN tracks ON tracks.rowid = tracks_fts.rowid
+                    WHERE tracks_fts MATCH ? ORDER BY rank LIMIT ?
+                """, (match, limit)).fetchall()
+            # 中文没有空格分词，FTS 只能匹配词首，查不到时再做子串匹配
+            if not rows:
+                conditions = " AND ".join(
+                    "(title LIKE ? OR artist LIKE ? OR album LIKE ? OR name LIKE ?)" for _ in terms
+                )
+                params = [value for term in terms for value in [f"%{term}%"] * 4]
+                rows = self.conn.execute(
+                    f"SELECT {columns} FROM tracks WHERE {conditions} ORDER BY name LIMIT ?", params + [limit]
+                ).fetchall()
+        return [self._row_to_track(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+_media_library = None
+_media_library_lock = threading.Lock()
+
+def get_media_library():
+    """获取全局媒体库索引"""
+    global _media_library
+    if _media_library is None:
+        with _media_library_lock:
+            if _media_library is None:
+                _media_library = MediaLibrary()
+    return _media_library
+
+class LibraryWatcher(QObject):
+    """监视音乐目录和歌词目录，把增删改和移动增量写入媒体库索引。
+    使用 QFileSystemWatcher（Linux 下基于 inotify），超出系统监视数量上限的目录改为定时轮询修改时间"""
+    library_changed = pyqtSignal(list, list)  # 新增或变化的歌曲, 删除的歌曲
+    DEBOUNCE_MS = 1000      # 最后一个事件后静默多久才处理
+    MAX_DELAY_MS = 5000     # 事件持续不断时最多推迟多久
+    POLL_INTERVAL_MS = 30000
+
+    def __init__(self, library, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.pending = set()
+        self.first_event_at = None
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self.flush)
+        self.polled = {}  # 轮询的目录 -> 上次看到的修改时间
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self.poll)
+        self.lyrics_dir = os.path.abspath(get_lyrics_dir())
+
+    def start(self, root=None):
+        """开始监视（应在首次扫描完成后调用，目录列表取自索引）"""
+        dirs = self.library.indexed_dirs(root)
+        if os.path.isdir(self.lyrics_dir):
+            dirs.append(self.lyrics_dir)
+        self.watch(dirs)
+        logger.info(f"媒体库监视已启动: {len(dirs)} 个目录")
+
+    def watch(self, dirs):
+        dirs = [path for path in dirs if path not in self.polled]
+        if not dirs:
+            return
+        failed = self.watcher.addPaths(dirs)
+        if failed:
+            logger.warning(f"{len(failed)} 个目录无法监视（可能超出系统上限），改为每 {self.POLL_INTERVAL_MS // 1000} 秒轮询")
+            for path in failed:
+                try:
+                    self.polled[path] = os.stat(path).st_mtime
+                except OSError:
+                    pass
+            if not self.poll_timer.isActive():
+                self.poll_timer.start()
+
+    def on_directory_changed(self, path):
+        self.pending.add(path)
+        now = time.monotonic()
+        if self.first_event_at is None:
+            self.first_event_at = now
+        # 大批复制会持续产生事件：静默后再处理，但不无限推迟
+        if (now - self.first_event_at) * 1000 >= self.MAX_DELAY_MS:
+            self.flush()
+        else:
+            self.debounce_timer.start(self.DEBOUNCE_MS)
+
+    def poll(self):
+        for path, mtime in list(self.polled.items()):
+            try:
+                current = os.stat(path).st_mtime
+            except OSError:
+                del self.polled[path]
+                self.pending.add(path)
+                continue
+            if current != mtime:
+                self.polled[path] = current
+                self.pending.add(path)
+        if self.pending:
+            self.flush()
+
+    def flush(self):
+        self.debounce_timer.stop()
+        self.first_event_at = None
+        dirs, self.pending = self.pending, set()
+        if not dirs:
+            return
+        get_task_manager().submit(
+            lambda token: self.apply_changes(dirs, token),
+            "library", TaskManager.PRIORITY_BACKGROUND,
+            name=f"更新媒体库 ({len(dirs)} 个目录)",
+            on_done=self.on_changes_applied,
+        )
+
+    def apply_changes(self, dirs, token):
+        """在后台线程中逐个目录增量更新索引"""
+        changed, removed, new_dirs = [], [], []
+        for path in sorted(dirs):
+            if token.is_cancelled():
+                break
+            if os.path.abspath(path) == self.lyrics_dir:
+                self.library.refresh_lyrics_dir(path)
+                continue
+            try:
+                dir_changed, dir_removed, dir_new = self.library.scan_directory(path)
+            except OSError as e:
+                logger.warning(f"更新目录索引失败 {path}: {str(e)}")
+                continue
+            changed.extend(dir_changed)
+            removed.extend(dir_removed)
+            new_dirs.extend(dir_new)
+        return changed, removed, new_dirs
+
+    def on_changes_applied(self, result):
+        changed, removed, new_dirs = result
+        # 被删除的目录会自动从 QFileSystemWatcher 中移除，新目录需要加入
+        self.watch(new_dirs)
+        if changed or removed:
+            logger.info(f"媒体库增量更新: 变化 {len(changed)} 首，删除 {len(removed)} 首")
+            self.library_changed.emit(changed, removed)
+
+# =============== 播放列表导入导出 ===============
+PLAYLIST_FORMATS = {".m3u": "m3u", ".m3u8": "m3u", ".pls": "pls", ".xspf": "xspf", ".json": "json"}
+PLAYLIST_FILE_FILTER = "播放列表 (*.m3u *.m3u8 *.pls *.xspf *.json);;M3U播放列表 (*.m3u *.m3u8);;PLS播放列表 (*.pls);;XSPF播放列表 (*.xspf);;JSON播放列表 (*.json);;所有文件 (*.*)"
+
+def playlist_format(path):
+    return PLAYLIST_FORMATS.get(os.path.splitext(path)[1].lower(), "m3u")
+
+def _decode_playlist_line(raw):
+    """其他播放器导出的 M3U/PLS 编码不一，逐行先按 UTF-8 再按 GB18030 解码"""
+    for encoding in ("utf-8", "gb18030"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("latin-1")
+
+def _parse_seconds(value):
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(seconds * 1000) if seconds > 0 else None
+
+def _xml_local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def iter_m3u(path):
+    """逐行解析 M3U/M3U8，#EXTINF 提供下一条的标题和时长"""
+    name = duration = None
+    with open(path, "rb") as f:
+        for raw in f:
+            line = _decode_playlist_line(raw).strip().lstrip("\ufeff")
+            if not line:
+                continue
+            if line.startswith("#"):
+                if line[:8].upper() == "#EXTINF:":
+                    info, _, title = line[8:].partition(",")
+                    # 时长后面可能跟 tvg-id="..." 之类的属性
+                    fields = info.split()
+                    duration = _parse_seconds(fields[0]) if fields else None
+                    name = title.strip() or None
+                continue
+            yield {"location": line, "name": name, "duration": duration}
+            name = duration = None
+
+def iter_pls(path):
+    """逐行解析 PLS，同一序号的 File/Title/Length 合并为一条"""
+    number, entry = None, {}
+    with open(path, "rb") as f:
+        for raw in f:
+            match = re.match(r"(?i)\s*(file|title|length)(\d+)\s*=(.*)", _decode_playlist_line(raw))
+            if not match:
+                continue
+            key, value = match.group(1).lower(), match.group(3).strip()
+            if int(match.group(2)) != number:
+                if entry.get("location"):
+                    yield entry
+                number, entry = int(match.group(2)), {"location": None, "name": None, "duration": None}
+            if key == "file":
+                entry["location"] = value
+            elif key == "title":
+                entry["name"] = value or None
+            else:
+                entry["duration"] = _parse_seconds(value)
+    if entry.get("location"):
+        yield entry
+
+def iter_xspf(path):
+    """用 iterparse 流式解析 XSPF，每处理完一个 track 就释放节点"""
+    track_list = None
+    for event, element in ElementTree.iterparse(path, events=("start", "end")):
+        tag = _xml_local_name(element.tag)
+        if event == "start":
+            if tag == "trackList":
+                track_list = element
+            continue
+        if tag != "track":
+            continue
+        fields = {_xml_local_name(child.tag): (child.text or "").strip() for child in element}
+        if fields.get("location"):
+            title, creator = fields.get("title"), fields.get("creator")
+            duration = fields.get("duration", "")
+            yield {
+                "location": fields["location"],
+                "name": track_display_name({"title": title, "artist": creator}) or None,
+                "duration": int(duration) if duration.isdigit() else None,
+            }
+        element.clear()
+        if track_list is not None:
+            track_list.clear()
+
+class _JsonStream:
+    """按块读取 JSON 文本，逐个解码数组元素，不把整个文件读进内存"""
+    CHUNK_SIZE = 64 * 1024
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """下一个非空白字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 值被块边界截断，读入下一块后重试
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue  # 数字可能在块边界处被截断
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        if self.take() != "[":
+            raise ValueError("JSON 播放列表格式错误：应为数组")
+        if self.peek() == "]":
+            self.take()
+            return
+        while True:
+            yield self.value()
+            separator = self.take()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError("JSON 播放列表格式错误：数组元素之间缺少逗号")
+
+def _json_playlist_items(stream):
+    """顶层为对象时优先流式读取 "default"，没有时退回第一个列表（这个列表会整体读入）"""
+    stream.take()
+    fallback = None
+    while stream.peek() not in ("}", ""):
+        key = stream.value()
+        stream.take()  # ':'
+        if stream.peek() != "[":
+            stream.value()
+        elif key == "default":
+            found = False
+            for item in stream.iter_array():
+                found = True
+                yield item
+            if found:
+                return
+        elif fallback is None:
+            fallback = list(stream.iter_array())
+        else:
+            for _ in stream.iter_array():
+                pass
+        if stream.peek() == ",":
+            stream.take()
+    yield from fallback or []
+
+def iter_json_playlist(path):
+    """本程序的 JSON 播放列表（{"default": [...]}，条目为路径或 {"name", "path"}），逐条流式解码"""
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        first = stream.peek()
+        if first == "[":
+            items = stream.iter_array()
+        elif first == "{":
+            items = _json_playlist_items(stream)
+        else:
+            return
+        for item in items:
+            if isinstance(item, dict) and item.get("path"):
+                yield {"location": item["path"], "name": item.get("name"), "duration": None}
+            elif isinstance(item, str) and item:
+                yield {"location": item, "name": None, "duration": None}
+
+_PLAYLIST_READERS = {"m3u": iter_m3u, "pls": iter_pls, "xspf": iter_xspf, "json": iter_json_playlist}
+
+def iter_playlist_file(path):
+    """按扩展名选择解析器，逐条产出 {"location", "name", "duration"}"""
+    return _PLAYLIST_READERS[playlist_format(path)](path)
+
+def _location_to_path(location, base_dir):
+    """播放列表中的位置转为本地路径：file:// URI 解码，相对路径相对播放列表所在目录"""
+    if location.lower().startswith("file:"):
+        return os.path.normpath(urllib.request.url2pathname(urllib.parse.urlparse(location).path))
+    if location.startswith(("http://", "https://")):
+        return location
+    # 其他系统导出的播放列表分隔符可能不同
+    path = location.replace("\\", os.sep) if os.sep == "/" else location.replace("/", os.sep)
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return os.path.normpath(path)
+
+def _common_tail(path_a, path_b):
+    """两个路径末尾相同的层数（不区分大小写），用于在同名文件中挑最接近的"""
+    parts_a = re.split(r"[\\/]", path_a.lower())[::-1]
+    parts_b = re.split(r"[\\/]", path_b.lower())[::-1]
+    count = 0
+    for part_a, part_b in zip(parts_a, parts_b):
+        if part_a != part_b:
+            break
+        count += 1
+    return count
+
+def _resolve_playlist_batch(entries, base_dir, library):
+    paths = [_location_to_path(entry["location"], base_dir) for entry in entries]
+    tracks = library.get_tracks(path for path in paths if not path.startswith(("http://", "https://"))) if library else {}
+    results = [None] * len(entries)
+    missing = []
+    for index, path in enumerate(paths):
+        if path.startswith(("http://", "https://")) or path in tracks or os.path.exists(path):
+            results[index] = dict(entries[index], path=path, track=tracks.get(path))
+        else:
+            missing.append(index)
+    # 在别的电脑或别的目录结构下导出的列表，按文件名在媒体库中找
+    by_name = library.find_by_names({os.path.basename(paths[index]) for index in missing}) if library and missing else {}
+    for index in missing:
+        matches = by_name.get(os.path.basename(paths[index]))
+        if matches:
+            track = max(matches, key=lambda item: _common_tail(item["path"], entries[index]["location"]))
+            results[index] = dict(entries[index], path=track["path"], track=track)
+    resolved = [result for result in results if result is not None]
+    unresolved = [entries[index] for index, result in enumerate(results) if result is None]
+    return resolved, unresolved
+
+def resolve_playlist_entries(entries, base_dir, library=None, batch_size=500):
+    """按批解析条目位置：先查媒体库索引，再查磁盘，仍找不到时按文件名在索引中匹配。
+    逐批产出 (已解析条目, 未解析条目)，已解析条目带 path 和索引记录 track"""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield _resolve_playlist_batch(batch, base_dir, library)
+            batch = []
+    if batch:
+        yield _resolve_playlist_batch(batch, base_dir, library)
+
+def iter_export_entries(items, library=None, batch_size=500):
+    """把播放列表条目（路径或 {"name", "path"}）按批补上索引中的时长，供写入使用"""
+    items = iter(items)
+    while True:
+        batch = [item if isinstance(item, dict) else {"path": item} for item in itertools.islice(items, batch_size)]
+        if not batch:
+            return
+        tracks = library.get_tracks(item["path"] for item in batch) if library else {}
+        for item in batch:
+            track = tracks.get(item["path"]) or {}
+            name = item.get("name") or track_display_name(track) or os.path.splitext(os.path.basename(item["path"]))[0]
+            yield {"path": item["path"], "name": name, "duration": track.get("duration") or None}
+
+def _single_line(text):
+    return " ".join(str(text or "").split())
+
+def _write_m3u(f, entries):
+    f.write("#EXTM3U\n")
+    count = 0
+    for entry in entries:
+        seconds = round(entry["duration"] / 1000) if entry.get("duration") else -1
+        f.write(f"#EXTINF:{seconds},{_single_line(entry.get('name'))}\n{entry['path']}\n")
+        count += 1
+    return count
+
+def _write_pls(f, entries):
+    f.write("[playlist]\n")
+    count = 0
+    for count, entry in enumerate(entries, 1):
+        seconds = round(entry["duration"] / 1000) if entry.get("duration") else -1
+        f.write(f"File{count}={entry['path']}\nTitle{count}={_single_line(entry.get('name'))}\nLength{count}={seconds}\n")
+    f.write(f"NumberOfEntries={count}\nVersion=2\n")
+    return count
+
+def _write_xspf(f, entries):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<playlist version="1" xmlns="http://xspf.org/ns/0/">\n  <trackList>\n')
+    count = 0
+    for entry in entries:
+        path = entry["path"]
+        location = path if path.startswith(("http://", "https://")) else Path(os.path.abspath(path)).as_uri()
+        f.write(f"    <track>\n      <location>{xml_escape(location)}</location>\n")
+        if entry.get("name"):
+            f.write(f"      <title>{xml_escape(_single_line(entry['name']))}</title>\n")
+        if entry.get("duration"):
+            f.write(f"      <duration>{int(entry['duration'])}</duration>\n")
+        f.write("    </track>\n")
+        count += 1
+    f.write("  </trackList>\n</playlist>\n")
+    return count
+
+def _write_json_playlist(f, entries):
+    # 与 playlists.json 相同的格式，逐条写出而不是先拼出整个列表
+    f.write('{\n    "default": [')
+    count = 0
+    for entry in entries:
+        f.write(",\n" if count else "\n")
+        f.write("        " + json.dumps({"name": entry.get("name") or "", "path": entry["path"]}, ensure_ascii=False))
+        count += 1
+    f.write("\n    ]\n}\n")
+    return count
+
+_PLAYLIST_WRITERS = {"m3u": _write_m3u, "pls": _write_pls, "xspf": _write_xspf, "json": _write_json_playlist}
+
+def write_playlist_file(path, entries):
+    """按扩展名流式写出播放列表，写完后原子替换目标文件，返回写入条数"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        count = _PLAYLIST_WRITERS[playlist_format(path)](f, entries)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+class PlaylistImportThread(QThread):
+    """后台流式导入播放列表文件，按批发出已解析的歌曲，未找到的条目写入日志"""
+    batch_ready = pyqtSignal(list, list)  # 路径列表, 对应的歌曲信息（可为 None）
+    import_finished = pyqtSignal(int, int, list)  # 已解析数, 未解析数, 前若干条未解析的位置
+    import_failed = pyqtSignal(str)
+    SAMPLE_LIMIT = 20
+
+    def __init__(self, file_path, library=None, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.library = library
+
+    def run(self):
+        resolved_count = unresolved_count = 0
+        samples = []
+        try:
+            entries = iter_playlist_file(self.file_path)
+            base_dir = os.path.dirname(os.path.abspath(self.file_path))
+            for resolved, unresolved in resolve_playlist_entries(entries, base_dir, self.library):
+                if self.isInterruptionRequested():
+                    logger.info(f"播放列表导入已取消: {self.file_path}")
+                    break
+                if resolved:
+                    # 已索引的歌曲显示名称取自标签，其他用播放列表里的标题
+                    infos = [None if entry["track"] or not entry["name"] else {"name": entry["name"]} for entry in resolved]
+                    self.batch_ready.emit([entry["path"] for entry in resolved], infos)
+                resolved_count += len(resolved)
+                unresolved_count += len(unresolved)
+                for entry in unresolved:
+                    logger.warning(f"播放列表条目未找到: {entry['location']}")
+                    if len(samples) < self.SAMPLE_LIMIT:
+                        samples.append(entry["location"])
+        except Exception as e:
+            logger.error(f"导入播放列表失败 {self.file_path}: {str(e)}")
+            self.import_failed.emit(str(e))
+            return
+        logger.info(f"播放列表导入完成: {self.file_path}，找到 {resolved_count} 首，未找到 {unresolved_count} 首")
+        self.import_finished.emit(resolved_count, unresolved_count, samples)
+
+# =============== 无缝播放引擎 ===============
+class GaplessPlayer(QObject):
+    """双播放器无缝播放引擎，接口与 QMediaPlayer 保持一致。
+    当前曲目快结束时在备用播放器中提前打开并预缓冲下一首，到点直接切换，
+    可选在 playback.crossfade_ms 毫秒内交叉淡入淡出"""
+    positionChanged = pyqtSignal('qint64')
+    durationChanged = pyqtSignal('qint64')
+    stateChanged = pyqtSignal(int)
+    mediaStatusChanged = pyqtSignal(int)
+    volumeChanged = pyqtSignal(int)
+    track_changed = pyqtSignal(str)  # 无缝切换到预载曲目后发出，参数为路径或URL
+
+    PRELOAD_SECONDS = 5
+    STREAM_PRELOAD_SECONDS = 20  # 网络音源需要更早开始缓冲
+    FADE_STEP_MS = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.players = [QMediaPlayer(), QMediaPlayer()]
+        self.active = 0
+        self._volume = 100
+        # 返回下一首的路径或URL，没有下一首时返回 None
+        self.next_media_provider = None
+        self.preloaded = None
+        self._next_target = None
+        self._preload_requested = False
+        self._fade = None
+        self.fade_timer = QTimer(self)
+        self.fade_timer.setInterval(self.FADE_STEP_MS)
+        self.fade_timer.timeout.connect(self._fade_step)
+        for index, player in enumerate(self.players):
+            player.positionChanged.connect(lambda position, i=index: self._on_position(i, position))
+            player.durationChanged.connect(lambda duration, i=index: self._forward(i, self.durationChanged, duration))
+            player.stateChanged.connect(lambda state, i=index: self._forward(i, self.stateChanged, state))
+            player.mediaStatusChanged.connect(lambda status, i=index: self._on_status(i, status))
+
+    @property
+    def player(self):
+        """当前发声的播放器"""
+        return self.players[self.active]
+
+    @property
+    def standby(self):
+        return self.players[1 - self.active]
+
+    def __getattr__(self, name):
+        # 未覆盖的 QMediaPlayer 接口直接转发给当前播放器
+        players = self.__dict__.get("players")
+        if players is None:
+            raise AttributeError(name)
+        return getattr(players[self.__dict__.get("active", 0)], name)
+
+    # ---------- QMediaPlayer 兼容接口 ----------
+    def setMedia(self, content, stream=None):
+        self.clear_preload()
+        self.player.setMedia(content)
+
+    def play(self):
+        self.player.play()
+
+    def pause(self):
+        self._finish_fade()
+        self.player.pause()
+
+    def stop(self):
+        self.clear_preload()
+        self.player.stop()
+
+    def setPosition(self, position):
+        self.player.setPosition(position)
+        # 往回拖动后预载的下一首可能要重新选择
+        if self._preload_requested and self.player.duration() - position > self._preload_window("http://"):
+            self.clear_preload()
+
+    def position(self):
+        return self.player.position()
+
+    def duration(self):
+        return self.player.duration()
+
+    def state(self):
+        return self.player.state()
+
+    def mediaStatus(self):
+        return self.player.mediaStatus()
+
+    def volume(self):
+        return self._volume
+
+    def setVolume(self, volume):
+        self._volume = max(0, min(100, int(volume)))
+        if self._fade is None:
+            self.player.setVolume(self._volume)
+            self.standby.setVolume(self._volume)
+        self.volumeChanged.emit(self._volume)
+
+    def setNotifyInterval(self, interval):
+        for player in self.players:
+            player.setNotifyInterval(interval)
+
+    def setPlaybackRate(self, rate):
+        for player in self.players:
+            player.setPlaybackRate(rate)
+
+    def playbackRate(self):
+        return self.player.playbackRate()
+
+    # ---------- 预载与切换 ----------
+    def clear_preload(self):
+        """丢弃已预载的下一首（播放列表或播放模式变化时调用）"""
+        self._finish_fade()
+        if self.preloaded is not None:
+            self.standby.stop()
+            self.standby.setMedia(QMediaContent())
+        self.preloaded = None
+        self._next_target = None
+        self._preload_requested = False
+
+    def _preload_window(self, target=None):
+        seconds = get_settings_store().get_float("playback.preload_seconds", self.PRELOAD_SECONDS)
+        if target and target.startswith(("http://", "https://")):
+            seconds = max(seconds, self.STREAM_PRELOAD_SECONDS)
+        return int(max(seconds, self._crossfade_ms() / 1000.0 + 1) * 1000)
+
+    def _crossfade_ms(self):
+        return max(0, get_settings_store().get_int("playback.crossfade_ms", 0))
+
+    def _forward(self, index, signal, value):
+        if index == self.active:
+            signal.emit(value)
+
+    def _on_position(self, index, position):
+        if index != self.active:
+            return
+        self.positionChanged.emit(position)
+        duration = self.player.duration()
+        if duration <= 0 or self.player.state() != QMediaPlayer.PlayingState:
+            return
+        remaining = duration - position
+        if not self._preload_requested and remaining <= self._preload_window("http://"):
+            # 只询问一次下一首，随机模式下多次询问会得到不同结果
+            self._preload_requested = True
+            self._next_target = self.next_media_provider() if self.next_media_provider else None
+        if self._next_target and self.preloaded is None and remaining <= self._preload_window(self._next_target):
+            self._open_standby(self._next_target)
+        crossfade = self._crossfade_ms()
+        if (crossfade and self.preloaded and self._fade is None and remaining <= crossfade
+                and self.standby.mediaStatus() in (QMediaPlayer.LoadedMedia, QMediaPlayer.BufferedMedia)):
+            self._switch(min(crossfade, remaining))
+
+    def _open_standby(self, target):
+        if target.startswith(("http://", "https://")):
+            content = QMediaContent(QUrl(target))
+        else:
+            content = QMediaContent(QUrl.fromLocalFile(target))
+        standby = self.standby
+        standby.setMedia(content)
+        standby.setPlaybackRate(self.player.playbackRate())
+        standby.setVolume(self._volume)
+        # 暂停状态下加载会完成解码器初始化和预缓冲，切换时可立即出声
+        standby.pause()
+        self.preloaded = target
+        logger.info(f"预载下一首: {target}")
+
+    def _on_status(self, index, status):
+        if index != self.active:
+            return
+        if status == QMediaPlayer.EndOfMedia and self.preloaded:
+            self._switch(0)
+            return
+        self.mediaStatusChanged.emit(status)
+
+    def _switch(self, fade_ms):
+        outgoing = self.player
+        self.active = 1 - self.active
+        incoming = self.player
+        target, self.preloaded = self.preloaded, None
+        self._next_target = None
+        self._preload_requested = False
+        if fade_ms > 0:
+            incoming.setVolume(0)
+            incoming.play()
+            self._fade = (outgoing, incoming, time.monotonic(), fade_ms / 1000.0)
+            self.fade_timer.start()
+        else:
+            incoming.setVolume(self._volume)
+            incoming.play()
+            outgoing.stop()
+        self.durationChanged.emit(incoming.duration())
+        self.stateChanged.emit(incoming.state())
+        self.track_changed.emit(target)
+        logger.info(f"无缝切换到: {target}" + (f"（淡入淡出 {fade_ms}ms）" if fade_ms else ""))
+
+    def _fade_step(self):
+        if self._fade is None:
+            self.fade_timer.stop()
+            return
+        outgoing, incoming, started, length = self._fade
+        progress = (time.monotonic() - started) / length
+        if progress >= 1:
+            self._finish_fade()
+            return
+        incoming.setVolume(int(self._volume * progress))
+        outgoing.setVolume(int(self._volume * (1 - progress)))
+
+    def _finish_fade(self):
+        if self._fade is None:
+            return
+        outgoing, incoming, _, _ = self._fade
+        self._fade = None
+        self.fade_timer.stop()
+        outgoing.stop()
+        outgoing.setVolume(self._volume)
+        incoming.setVolume(self._volume)
+
+# =============== 歌词解析 ===============
+LRC_TIME_TAG = re.compile(r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+# 逐字时间标签：<mm:ss.xx>，也兼容行内的 [mm:ss.xx] 写法（行首时间标签已先被取走）
+LRC_WORD_TAG = re.compile(r"[<\[](\d+):(\d{1,2})(?:[.:](\d{1,3}))?[>\]]")
+YRC_LINE_TAG = re.compile(r"^\[(\d+),(\d+)\](.*)$")
+YRC_WORD_TAG = re.compile(r"\((\d+),(\d+),-?\d+\)")
+LRC_META_TAG = re.compile(r"^\[([A-Za-z#]+):(.*)\]\s*$")
+LYRICS_LAST_LINE_MS = 10000  # 最后一行没有下一行作为结束时，默认持续 10 秒
+
+def _lrc_time_ms(minutes, seconds, fraction):
+    # 小数部分按位数换算："5" 是 500ms，"05" 是 50ms，"005" 是 5ms
+    ms = int(fraction.ljust(3, "0")) if fraction else 0
+    return (int(minutes) * 60 + int(seconds)) * 1000 + ms
+
+class LyricsTimeline:
+    """解析后的歌词时间轴。行的开始/结束时间存放在 array 中，用 bisect 定位当前行；
+    逐字时间按行扁平存放：第 i 行的字在 word_index[i]:word_index[i+1] 范围内，
+    每个字记录开始、结束时间和它在行文本中的结束字符位置"""
+
+    def __init__(self):
+        self.starts = array.array("q")
+        self.ends = array.array("q")
+        self.texts = []
+        self.word_index = array.array("l", [0])
+        self.word_starts = array.array("q")
+        self.word_ends = array.array("q")
+        self.word_chars = array.array("l")
+        self.tags = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __bool__(self):
+        return bool(self.texts)
+
+    def line(self, index):
+        return self.starts[index], self.ends[index], self.texts[index]
+
+    def line_at(self, position):
+        """position 所在的行号，不在任何一行内时返回 -1"""
+        index = bisect.bisect_right(self.starts, position) - 1
+        if index < 0 or position >= self.ends[index]:
+            return -1
+        return index
+
+    def has_word_timing(self, index):
+        return self.word_index[index + 1] > self.word_index[index]
+
+    def sung_chars(self, index, position):
+        """第 index 行在 position 时已唱到的字符数（可带小数，表示一个字唱到一半）。
+        有逐字时间时按字插值，否则把整行时长平均分给每个字符"""
+        text_length = len(self.texts[index])
+        if not text_length:
+            return 0.0
+        lo, hi = self.word_index[index], self.word_index[index + 1]
+        if hi > lo:
+            word = bisect.bisect_right(self.word_starts, position, lo, hi) - 1
+            if word < lo:
+                return 0.0
+            char_start = self.word_chars[word - 1] if word > lo else 0
+            char_end = self.word_chars[word]
+            start, end = self.word_starts[word], self.word_ends[word]
+            fraction = 1.0 if end <= start else min(1.0, (position - start) / (end - start))
+            return char_start + (char_end - char_start) * fraction
+        start, end = self.starts[index], self.ends[index]
+        if end <= start:
+            return float(text_length)
+        return text_length * max(0.0, min(1.0, (position - start) / (end - start)))
+
+def _lrc_timestamp(ms):
+    return f"{ms // 60000:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+def yrc_to_lrc(yrc_text):
+    """把网易云逐字歌词 (yrc) 转成增强 LRC：[行开始]<字开始>字...<结束>。
+    字与字之间有停顿时插入一个空的结束标签，保留原始的每字时长"""
+    lines = []
+    for raw_line in (yrc_text or "").splitlines():
+        match = YRC_LINE_TAG.match(raw_line.strip())
+        if not match:
+            continue  # {"t":..,"c":[..]} 形式的制作人员信息
+        # split 结果：[前缀, 开始, 时长, 文本, 开始, 时长, 文本, ...]
+        parts = YRC_WORD_TAG.split(match.group(3))
+        line = f"[{_lrc_timestamp(int(match.group(1)))}]{parts[0]}"
+        words = [(int(parts[i]), int(parts[i]) + int(parts[i + 1]), parts[i + 2]) for i in range(1, len(parts), 3)]
+        for index, (start, end, word) in enumerate(words):
+            line += f"<{_lrc_timestamp(start)}>{word}"
+            if index + 1 == len(words) or end < words[index + 1][0]:
+                line += f"<{_lrc_timestamp(end)}>"
+        lines.append(line)
+    return "\n".join(lines)
+
+def _split_lrc_words(text):
+    """拆分增强 LRC 的 <mm:ss.xx> 逐字标签，返回 (纯文本, [(开始时间, 结束时间或 None, 结束字符位置)])"""
+    parts = LRC_WORD_TAG.split(text)
+    if len(parts) == 1:
+        return text, []
+    plain = parts[0]
+    # 第一个逐字标签前的文字从行开始时唱起，开始时间记为 None，由调用方填入行时间
+    words = [[None, None, len(plain)]] if plain.strip() else []
+    # split 结果：[前缀, 分, 秒, 小数, 文本, 分, 秒, 小数, 文本, ...]
+    for i in range(1, len(parts), 4):
+        start = _lrc_time_ms(parts[i], parts[i + 1], parts[i + 2])
+        word = parts[i + 3]
+        if words and words[-1][1] is None:
+            words[-1][1] = start
+        if word:
+            plain += word
+            words.append([start, None, len(plain)])
+    return plain, words
+
+def parse_lrc(lyrics_text):
+    """单遍解析 LRC：一行多个时间标签、[offset:] 偏移、不带小数的 mm:ss 以及增强 LRC 逐字时间"""
+    timeline = LyricsTimeline()
+    if not lyrics_text:
+        return timeline
+    entries = []
+    offset = 0
+    for raw_line in lyrics_text.splitlines():
+        line = raw_line.strip()
+        if not line.startswith("["):
+            continue
+        position = 0
+        times = []
+        while True:
+            match = LRC_TIME_TAG.match(line, position)
+            if not match:
+                break
+            times.append(_lrc_time_ms(*match.groups()))
+            position = match.end()
+        if not times:
+            meta = LRC_META_TAG.match(line)
+            if meta:
+                key, value = meta.group(1).lower(), meta.group(2).strip()
+                timeline.tags[key] = value
+                if key == "offset":
+                    try:
+                        offset = int(value)
+                    except ValueError:
+                        pass
+            continue
+        text, words = _split_lrc_words(line[position:])
+        text = text.strip() if not words else text
+        for line_time in times:
+            # 重复出现的行，逐字时间随行时间平移
+            shift = line_time - times[0]
+            entries.append((line_time, text, [(start + shift if start is not None else line_time,
+                                               end + shift if end is not None else None, chars)
+                                              for start, end, chars in words]))
+    entries.sort(key=lambda entry: entry[0])
+    for i, (start, text, words) in enumerate(entries):
+        # 正偏移表示歌词提前显示
+        start = max(0, start - offset)
+        end = max(start, entries[i + 1][0] - offset) if i + 1 < len(entries) else start + LYRICS_LAST_LINE_MS
+        timeline.starts.append(start)
+        timeline.ends.append(end)
+        timeline.texts.append(text)
+        for word_start, word_end, chars in words:
+            word_start = max(0, word_start - offset)
+            timeline.word_starts.append(word_start)
+            timeline.word_ends.append(max(word_start, (word_end - offset) if word_end is not None else end))
+            timeline.word_chars.append(chars)
+        timeline.word_index.append(len(timeline.word_starts))
+    return timeline
+
+_lyrics_cache = collections.OrderedDict()
+_lyrics_cache_lock = threading.Lock()
+LYRICS_CACHE_SIZE = 32
+
+def load_lyrics_timeline(lyrics_text):
+    """按内容哈希缓存的 parse_lrc，同一份歌词在多个窗口或重复播放时只解析一次"""
+    if not lyrics_text:
+        return LyricsTimeline()
+    key = hashlib.sha1(lyrics_text.encode("utf-8", "surrogatepass")).hexdigest()
+    with _lyrics_cache_lock:
+        timeline = _lyrics_cache.get(key)
+        if timeline is not None:
+            _lyrics_cache.move_to_end(key)
+            return timeline
+    timeline = parse_lrc(lyrics_text)
+    with _lyrics_cache_lock:
+        _lyrics_cache[key] = timeline
+        while len(_lyrics_cache) > LYRICS_CACHE_SIZE:
+            _lyrics_cache.popitem(last=False)
+    return timeline
+
+# =============== 歌词存储 ===============
+class LyricsStore:
+    """歌词库：歌词正文按内容 SHA1 存成文件，同一份歌词只存一次；索引表把
+    “音频内容指纹”和“归一化标题 + 艺术家 + 时长”映射到歌词，查找都是主键点查。
+    音频重命名或移动后按内容指纹仍能命中，网络歌词对同一首歌的所有副本只缓存一次"""
+    DURATION_BUCKET_MS = 2000  # 时长按 2 秒分桶，查找时同时查相邻桶
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(get_data_dir(), "lyrics_store")
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lyrics_index (
+                key TEXT PRIMARY KEY,
+                lyrics_hash TEXT NOT NULL,
+                translation_hash TEXT NOT NULL DEFAULT '',
+                duration INTEGER NOT NULL DEFAULT 0,
+                source TEXT NOT NULL DEFAULT '',
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    # ---------- 索引键 ----------
+    @staticmethod
+    def hash_key(content_hash):
+        return f"hash:{content_hash}" if content_hash else None
+
+    @classmethod
+    def meta_key(cls, title, artists, duration, bucket_offset=0):
+        # 标题、艺术家、时长缺一不可，否则 01.mp3 之类的通用名称会互相串歌词
+        title, artists = normalize_text(title), normalize_artists(artists)
+        if not title or not artists or not duration:
+            return None
+        return f"meta:{title}|{artists}|{int(duration) // cls.DURATION_BUCKET_MS + bucket_offset}"
+
+    # ---------- 歌词正文 ----------
+    def _blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest + ".lrc")
+
+    def _write_blob(self, text):
+        if not text:
+            return ""
+        digest = hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, path)
+        return digest
+
+    def _read_blob(self, digest):
+        if not digest:
+            return ""
+        try:
+            with open(self._blob_path(digest), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # ---------- 查询与写入 ----------
+    def get(self, content_hash=None, title="", artists="", duration=0):
+        """按内容指纹、再按标题 + 艺术家 + 时长查找，返回 (歌词, 翻译) 或 None"""
+        keys = [self.hash_key(content_hash)]
+        keys += [self.meta_key(title, artists, duration, offset) for offset in (0, -1, 1)]
+        with self._lock:
+            for key in filter(None, keys):
+                row = self.conn.execute(
+                    "SELECT lyrics_hash, translation_hash, duration FROM lyrics_index WHERE key = ?", (key,)
+                ).fetchone()
+                if not row or (key.startswith("meta:") and not durations_match(row[2], duration)):
+                    continue
+                lyrics = self._read_blob(row[0])
+                if lyrics is None:
+                    # 正文文件丢失，删除失效的索引
+                    self.conn.execute("DELETE FROM lyrics_index WHERE key = ?", (key,))
+                    self.conn.commit()
+                    continue
+                return lyrics, self._read_blob(row[1]) or ""
+        return None
+
+    def put(self, lyrics, translation="", content_hash=None, title="", artists="", duration=0, source=""):
+        """保存歌词并登记内容指纹和标题 + 艺术家 + 时长两个索引键"""
+        if not lyrics:
+            return
+        keys = list(filter(None, (self.hash_key(content_hash), self.meta_key(title, artists, duration))))
+        if not keys:
+            return
+        lyrics_hash = self._write_blob(lyrics)
+        translation_hash = self._write_blob(translation)
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO lyrics_index (key, lyrics_hash, translation_hash, duration, source, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, lyrics_hash, translation_hash, int(duration or 0), source, now) for key in keys]
+            )
+            self.conn.commit()
+
+    def identify(self, song_path, song_info=None):
+        """音频文件的索引信息：内容指纹（优先取媒体库中的记录）、标题、艺术家、时长（毫秒）。
+        标题和艺术家只取真实标签或带时长的网络歌曲信息，不用文件名凑，取不到时只按内容指纹索引"""
+        song_info = song_info or {}
+        track = get_media_library().get_track(os.path.abspath(song_path)) or {}
+        content_hash = track.get("content_hash", "")
+        if not content_hash:
+            try:
+                content_hash = quick_file_hash(song_path)
+            except OSError:
+                content_hash = ""
+        if track.get("title") and track.get("artist") and track.get("duration"):
+            return content_hash, track["title"], track["artist"], track["duration"]
+        if song_info.get("name") and song_info.get("artists") and song_info.get("duration"):
+            return content_hash, song_info["name"], song_info["artists"], song_info["duration"]
+        return content_hash, "", "", 0
+
+    def get_for_file(self, song_path, song_info=None):
+        content_hash, title, artists, duration = self.identify(song_path, song_info)
+        return self.get(content_hash, title, artists, duration)
+
+    def put_for_file(self, song_path, lyrics, translation="", song_info=None, source=""):
+        content_hash, title, artists, duration = self.identify(song_path, song_info)
+        self.put(lyrics, translation, content_hash, title, artists, duration, source)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+_lyrics_store = None
+_lyrics_store_lock = threading.Lock()
+
+def get_lyrics_store():
+    """获取进程内共享的歌词库"""
+    global _lyrics_store
+    if _lyrics_store is None:
+        with _lyrics_store_lock:
+            if _lyrics_store is None:
+                _lyrics_store = LyricsStore()
+    return _lyrics_store
+
 # =============== 歌词同步 ===============
 class LyricsSync(QObject):
     def __init__(self, media_player, external_lyrics):
         super().__init__()
         self.media_player = media_player
         self.external_lyrics = external_lyrics
-        self.lyrics_data = []  # 存储(开始时间, 结束时间, 文本)
+        self.timeline = LyricsTimeline()  # 原文歌词时间轴
+        self.translation = LyricsTimeline()  # 翻译歌词时间轴，按时间而不是行号对齐
         self.current_line_index = -1
         self.enabled = True
-        self.word_positions = []  # 存储每个字的开始和结束时间
-        self.karaoke_progress = 0  # 当前进度
+        self.karaoke_progress = 0.0  # 当前行已唱到的字符数
         self.normal_color = QColor("#FFFFFF")  # 白色
         self.highlight_color = QColor("#000000")  # 黑色
         self.next_line_color = QColor("#AAAAAA")  # 灰色
-        self.translation_data = []  # (开始时间, 结束时间, 翻译文本)
         self.show_translation = True  # 是否显示翻译
-        
-    def parse_lyrics(self, lyrics_text):
-        """解析歌词文本为结构化的歌词数据"""
-        if not lyrics_text:
-            return []
-            
-        lines = lyrics_text.splitlines()
-        lyrics_data = []
-        pattern = re.compile(r'\[(\d+):(\d+\.\d+)\](.*)')
-        
-        # 收集所有时间点
-        time_points = []
-        for line in lines:
-            match = pattern.match(line)
-            if match:
-                minutes = int(match.group(1))
-                seconds = float(match.group(2))
-                time_ms = int((minutes * 60 + seconds) * 1000)
-                text = match.group(3).strip()
-                time_points.append((time_ms, text))
-        
-        # 按时间排序
-        time_points.sort(key=lambda x: x[0])
-        
-        # 为每行计算结束时间（下一行的开始时间）
-        for i, (start_time, text) in enumerate(time_points):
-            if i < len(time_points) - 1:
-                end_time = time_points[i+1][0]
-            else:
-                # 最后一行：如果没有下一行，使用歌曲剩余时间或默认10秒
-                end_time = start_time + 10000  # 默认10秒
-            lyrics_data.append((start_time, end_time, text))
-        
-        return lyrics_data
-        
+        self.last_display = None
+
     def load_lyrics(self, lyrics_text, translation_text=""):
-        """加载歌词文本并解析"""
-        self.lyrics_data = self.parse_lyrics(lyrics_text)
-        # 解析翻译歌词
-        if translation_text:
-            self.translation_data = self.parse_lyrics(translation_text)
-        else:
-            self.translation_data = []
+        """加载歌词文本并解析（同一份歌词只解析一次）"""
+        self.timeline = load_lyrics_timeline(lyrics_text)
+        self.translation = load_lyrics_timeline(translation_text)
         self.current_line_index = -1
-        self.word_positions = []
-        
-        if not lyrics_text:
-            return
-            
-        lines = lyrics_text.splitlines()
-        pattern = re.compile(r'\[(\d+):(\d+\.\d+)\](.*)')
-        
-        # 第一遍：收集所有时间戳
-        time_points = []
-        for line in lines:
-            match = pattern.match(line)
-            if match:
-                minutes = int(match.group(1))
-                seconds = float(match.group(2))
-                time_ms = int((minutes * 60 + seconds) * 1000)
-                text = match.group(3).strip()
-                time_points.append((time_ms, text))
-        
-        # 按时间排序
-        time_points.sort(key=lambda x: x[0])
-        
-        # 为每行计算结束时间（下一行的开始时间）
-        for i in range(len(time_points)):
-            start_time, text = time_points[i]
-            if i < len(time_points) - 1:
-                end_time = time_points[i+1][0]
-            else:
-                # 最后一行：如果没有下一行，使用歌曲剩余时间或默认10秒
-                end_time = start_time + 10000  # 默认10秒
-            self.lyrics_data.append((start_time, end_time, text))
-    
+        self.karaoke_progress = 0.0
+        self.last_display = None
+
     def update_position(self, position):
         """根据播放位置更新歌词显示（添加渐变色效果）"""
-        if not self.enabled or not self.lyrics_data:
+        if not self.enabled or not self.timeline:
             return
-            
-        # 使用二分查找提高查找效率
-        low, high = 0, len(self.lyrics_data) - 1
-        current_line_idx = -1
-        
-        while low <= high:
-            mid = (low + high) // 2
-            start_time, end_time, text = self.lyrics_data[mid]
-            
-            if start_time <= position < end_time:
-                current_line_idx = mid
-                break
-            elif position < start_time:
-                high = mid - 1
-            else:
-                low = mid + 1
-        
+
+        current_line_idx = self.timeline.line_at(position)
+
         # 如果没有找到匹配行
         if current_line_idx == -1:
-            self.external_lyrics.update_lyrics("", "", 0)  # 传递三个参数
             self.current_line_index = -1
+            self.show_lines("", "", "")
             return
-            
-        # 如果是新行，重置卡拉OK效果
-        if current_line_idx != self.current_line_index:
-            self.current_line_index = current_line_idx
-            self.calculate_word_positions(
-                self.lyrics_data[current_line_idx][2], 
-                self.lyrics_data[current_line_idx][0]
-            )
-        
-        # 更新当前行内的卡拉OK效果
+
+        self.current_line_index = current_line_idx
+        start_time, end_time, text = self.timeline.line(current_line_idx)
         self.update_karaoke_effect(position)
 
-         # 获取翻译行
+        # 获取翻译行：取当前行开始时刻对应的翻译
         translation_line = ""
-        if self.show_translation and self.translation_data and current_line_idx < len(self.translation_data):
-            translation_line = self.get_styled_text(
-                self.translation_data[current_line_idx][2],  # 使用 current_line_idx
-                position
-            )
-        
+        if self.show_translation and self.translation:
+            translation_idx = self.translation.line_at(start_time)
+            if translation_idx != -1:
+                translation_line = self.translation.texts[translation_idx]
+
         # 准备下一行歌词
         next_text = ""
-        if current_line_idx + 1 < len(self.lyrics_data):
-            next_text = self.lyrics_data[current_line_idx + 1][2]
-            
-        # 获取当前行的卡拉OK效果文本
-        current_text = self.get_styled_text(
-            self.lyrics_data[current_line_idx][2], 
-            position
-        )
-        
-        # 更新歌词窗口
+        if current_line_idx + 1 < len(self.timeline):
+            next_text = self.timeline.texts[current_line_idx + 1]
+
+        self.show_lines(text, next_text, translation_line)
+        self.external_lyrics.set_karaoke_progress(self.karaoke_progress)
+
+    def show_lines(self, current_text, next_text, translation_line):
+        """把歌词推给外置歌词窗口，内容没有变化时跳过"""
+        display = (current_text, next_text, translation_line)
+        if display == self.last_display:
+            return
+        self.last_display = display
         self.external_lyrics.update_lyrics(current_text, next_text, translation_line)
+        if not current_text:
+            return
         # 在更新歌词后，确保当前行在视图中可见
         if hasattr(self.external_lyrics, 'scroll_area') and self.external_lyrics.scroll_area:
             # 计算当前行在滚动区域中的位置
             label_pos = self.external_lyrics.current_line_label.pos()
             scroll_pos = self.external_lyrics.scroll_area.verticalScrollBar().value()
             label_height = self.external_lyrics.current_line_label.height()
-            
+
             # 如果当前行不在视图中心，则滚动到中心
             if label_pos.y() < scroll_pos or label_pos.y() + label_height > scroll_pos + self.external_lyrics.scroll_area.height():
                 target_pos = max(0, label_pos.y() - self.external_lyrics.scroll_area.height() // 2)
                 self.external_lyrics.scroll_area.verticalScrollBar().setValue(target_pos)
 
-    def calculate_word_positions(self, text, position):
-        """计算歌词中每个字的位置和持续时间（用于渐变色效果）"""
-        self.word_positions = []
-        if not text:
-            return
-        
-        # 假设每个字平均分配时间
-        start_time = self.lyrics_data[self.current_line_index][0]
-        end_time = self.lyrics_data[self.current_line_index][1]
-        
-        total_chars = len(text)
-        duration_per_char = (end_time - start_time) / max(1, total_chars)
-        
-        for i in range(total_chars):
-            char_start = start_time + i * duration_per_char
-            char_end = char_start + duration_per_char
-            self.word_positions.append((char_start, char_end))
-    
     def update_karaoke_effect(self, position):
-        """更新卡拉OK效果（渐变着色）"""
-        if not self.word_positions:
+        """更新卡拉OK效果：记录当前行已唱到的字符数"""
+        if self.current_line_index == -1:
+            self.karaoke_progress = 0.0
             return
-        
-        # 找出当前播放到的字符位置
-        current_char_idx = 0
-        for i, (char_start, char_end) in enumerate(self.word_positions):
-            if position >= char_start:
-                current_char_idx = i
-            else:
-                break
-        
-        # 保存当前字符索引
-        self.karaoke_progress = current_char_idx
-    
-    def get_styled_text(self, text, position):
-        """获取带样式的歌词文本（卡拉OK效果）"""
-        if not self.word_positions or len(self.word_positions) != len(text):
-            return text
-        
-        # 找出当前播放到的字符位置
-        current_char_idx = 0
-        for i, (char_start, char_end) in enumerate(self.word_positions):
-            if position >= char_start:
-                current_char_idx = i
-            else:
-                break
-        
-        # 创建带样式的HTML
-        styled_text = ""
-        for i, char in enumerate(text):
-            if i < current_char_idx:
-                # 已播放部分 - 高亮颜色
-                styled_text += f'<span style="color: #000000;">{char}</span>'
-            elif i == current_char_idx:
-                # 当前播放字 - 添加过渡效果
-                # 计算当前字内的进度 (0-1)
-                char_start, char_end = self.word_positions[i]
-                if char_end > char_start:
-                    progress = (position - char_start) / (char_end - char_start)
-                    progress = max(0, min(1, progress))  # 限制在0-1范围
-                    
-                    # 创建渐变效果 (从高亮色到普通色)
-                    r1, g1, b1 = 255, 87, 34  # 橙色 (FF5722)
-                    r2, g2, b2 = 255, 255, 255  # 白色
-                    
-                    r = int(r1 + (r2 - r1) * progress)
-                    g = int(g1 + (g2 - g1) * progress)
-                    b = int(b1 + (b2 - b1) * progress)
-                    color = f"rgb({r},{g},{b})"
-                    
-                    styled_text += f'<span style="color: {color};">{char}</span>'
-                else:
-                    styled_text += f'<span style="color: #FF5722;">{char}</span>'
-            else:
-                # 未播放部分 - 普通颜色
-                styled_text += f'<span style="color: #FFFFFF;">{char}</span>'
-        
-        return styled_text
+        self.karaoke_progress = self.timeline.sung_chars(self.current_line_index, position)
 
 # =============== 睡眠定时器 ===============
 class SleepTimerDialog(QDialog):
@@ -2749,6 +6510,7 @@ class LogConsoleDialog(QDialog):
 # =============== 网易云音乐API ===============
 class NetEaseMusicAPI:
     """音乐捕捉器create bilibili by:Railgun_lover"""
+    CACHE_SOURCE = "netease_api"
     
     def __init__(self):
         self.header = {
@@ -2763,8 +6525,32 @@ class NetEaseMusicAPI:
         self.params = "D33zyir4L/58v1qGPcIPjSee79KCzxBIBy507IYDB8EL7jEnp41aDIqpHBhowfQ6iT1Xoka8jD+0p44nRKNKUA0dv+n5RWPOO57dZLVrd+T1J/sNrTdzUhdHhoKRIgegVcXYjYu+CshdtCBe6WEJozBRlaHyLeJtGrABfMOEb4PqgI3h/uELC82S05NtewlbLZ3TOR/TIIhNV6hVTtqHDVHjkekrvEmJzT5pk1UY6r0="
         self.enc_sec_key = "45c8bcb07e69c6b545d3045559bd300db897509b8720ee2b45a72bf2d3b216ddc77fb10daec4ca54b466f2da1ffac1e67e245fea9d842589dc402b92b262d3495b12165a721aed880bf09a0a99ff94c959d04e49085dc21c78bbbe8e3331827c0ef0035519e89f097511065643120cbc478f9c0af96400ba4649265781fc9079"
 
-    def fetch_data(self, keyword: str, limit=5) -> list[dict]:
-        """搜索歌曲"""
+    def fetch_data(self, keyword: str, limit=5, on_refresh=None) -> list[dict]:
+        """搜索歌曲（带缓存，过期结果先返回，后台刷新后通过 on_refresh 回调新结果）"""
+        cache = get_search_cache()
+        cached = cache.get(self.CACHE_SOURCE, keyword, 1, limit)
+        if cached is not None:
+            songs, stale = cached
+            if stale:
+                threading.Thread(
+                    target=self._refresh_cached_search, args=(keyword, limit, songs, on_refresh), daemon=True
+                ).start()
+            return songs
+        songs = self.fetch_data_remote(keyword, limit)
+        cache.put(self.CACHE_SOURCE, keyword, 1, limit, songs)
+        return songs
+
+    def _refresh_cached_search(self, keyword, limit, old_songs, on_refresh):
+        """后台刷新过期的搜索缓存"""
+        songs = self.fetch_data_remote(keyword, limit)
+        if not songs:
+            return
+        get_search_cache().put(self.CACHE_SOURCE, keyword, 1, limit, songs)
+        if on_refresh is not None and songs != old_songs:
+            on_refresh(songs)
+
+    def fetch_data_remote(self, keyword: str, limit=5) -> list[dict]:
+        """请求网易云搜索接口"""
         logger.info(f"搜索歌曲: {keyword}")
         url = "https://music.163.com/api/cloudsearch/pc"
         data = {
@@ -2774,7 +6560,7 @@ class NetEaseMusicAPI:
             "offset": 0
         }
         try:
-            response = requests.post(url, headers=self.header, cookies=self.cookies, data=data)
+            response = get_http_pool().post(url, source="netease", headers=self.header, cookies=self.cookies, data=data)
             response.encoding = 'utf-8' if 'utf-8' in response.headers.get('content-type', '').lower() else 'gbk'
             logger.debug(f"搜索响应状态码: {response.status_code}")
             result = response.json()
@@ -2800,17 +6586,23 @@ class NetEaseMusicAPI:
             logger.error(f"搜索歌曲失败: {str(e)}")
             return []
 
-    def fetch_lyrics(self, song_id, with_translation=False):
-        """获取歌词"""
+    def fetch_lyrics(self, song_id, with_translation=False, word_timing=True):
+        """获取歌词；有逐字歌词 (yrc) 时转换为增强 LRC 返回"""
         logger.info(f"获取歌词: ID={song_id}")
-        url = f"https://music.163.com/api/song/lyric?id={song_id}&lv=1&kv=1&tv=-1"
+        url = f"https://music.163.com/api/song/lyric?id={song_id}&lv=1&kv=1&tv=-1&yv=1"
         try:
-            response = requests.get(url, headers=self.header, cookies=self.cookies)
+            response = get_http_pool().get(url, source="netease", headers=self.header, cookies=self.cookies)
             result = response.json()
             
             if "lrc" in result and "lyric" in result["lrc"]:
                 logger.info("歌词获取成功")
                 lyric = result["lrc"]["lyric"]
+                yrc = (result.get("yrc") or {}).get("lyric", "") if word_timing else ""
+                if yrc:
+                    word_timed = yrc_to_lrc(yrc)
+                    if word_timed:
+                        logger.info("使用逐字歌词")
+                        lyric = word_timed
                 translation = result["tlyric"]["lyric"] if "tlyric" in result else ""
                 return lyric, translation
             else:
@@ -2826,7 +6618,7 @@ class NetEaseMusicAPI:
         logger.info(f"获取歌曲额外信息: ID={song_id}")
         url = f"https://music.163.com/api/song/detail?ids=[{song_id}]"
         try:
-            response = requests.get(url, headers=self.header, cookies=self.cookies)
+            response = get_http_pool().get(url, source="netease", headers=self.header, cookies=self.cookies)
             result = response.json()
             
             if result["code"] != 200 or not result["songs"]:
@@ -2840,9 +6632,15 @@ class NetEaseMusicAPI:
             album_info = song.get("al", {})
             cover_url = album_info.get("picUrl", "") if album_info else ""
             
+            author = "、".join(artist.get("name", "未知") for artist in song.get("ar", []))
             return {
+                "id": song_id,
                 "title": song.get("name", "未知歌曲"),
-                "author": "、".join(artist.get("name", "未知") for artist in song.get("ar", [])),
+                "author": author,
+                # 与搜索结果相同的字段名，歌词加载和歌词库按这些字段识别歌曲
+                "name": song.get("name", "未知歌曲"),
+                "artists": author,
+                "duration": song.get("dt", 0),
                 "cover_url": cover_url,
                 "audio_url": f"https://music.163.com/song/media/outer/url?id={song_id}",
             }
@@ -2850,33 +6648,20 @@ class NetEaseMusicAPI:
             logger.error(f"获取歌曲额外信息失败: {str(e)}")
             return {}
     
-    def download_song(self, audio_url: str, file_path: str) -> bool:
-        """下载歌曲文件"""
+    def download_song(self, audio_url: str, file_path: str, progress_callback=None, cancel_check=None) -> bool:
+        """下载歌曲文件（分段、可断点续传）；progress_callback 接收 0-100 的进度"""
         logger.info(f"开始下载歌曲: {file_path}")
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-                "Referer": "https://music.163.com/",
-                "Origin": "https://music.163.com"
-            }
-            
-            response = requests.get(audio_url, headers=headers, stream=True)
-            if response.status_code != 200:
-                logger.error(f"下载失败: HTTP状态码 {response.status_code}")
+            def report(downloaded, total):
+                if progress_callback is not None and total > 0:
+                    progress_callback(int(100 * downloaded / total))
+
+            downloader = SegmentedDownloader(
+                audio_url, file_path, source="netease", timeout=60,
+                progress_callback=report, cancel_check=cancel_check
+            )
+            if not downloader.run():
                 return False
-                
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        progress = int(100 * downloaded / total_size) if total_size > 0 else 0
-                        
-                        self.download_progress.emit(progress)
             
             logger.info(f"歌曲下载完成: {file_path}")
             return True
@@ -2911,7 +6696,7 @@ class NetEaseWorker(QThread):
     def run(self):
         try:
             if self.mode == "search":
-                songs = self.api.fetch_data(self.keyword)
+                songs = self.api.fetch_data(self.keyword, on_refresh=self.search_finished.emit)
                 self.search_finished.emit(songs)
             elif self.mode == "details":
                 song_info = self.api.fetch_extra(self.song_id)
@@ -2921,11 +6706,346 @@ class NetEaseWorker(QThread):
             self.error_occurred.emit(error_msg)
 
 # =============== 音乐工作线程 ===============
+FEDERATED_SOURCE_NAME = "全部音源"
+
+def normalize_text(text):
+    """归一化文本：全半角统一、小写、去掉空白和标点"""
+    text = unicodedata.normalize("NFKC", str(text or "")).lower()
+    return "".join(ch for ch in text if ch.isalnum())
+
+def normalize_artists(artists):
+    """归一化艺术家字段，忽略分隔符和顺序差异"""
+    parts = re.split(r"[、,，/&;；]|\s+feat\.?\s+", str(artists or ""), flags=re.IGNORECASE)
+    return "|".join(sorted(filter(None, (normalize_text(part) for part in parts))))
+
+def song_identity_key(name, artists):
+    """歌曲去重键：归一化标题 + 艺术家"""
+    return (normalize_text(name), normalize_artists(artists))
+
+def durations_match(duration_a, duration_b, tolerance_ms=3000):
+    """两个时长（毫秒）是否可视为同一首歌，任一未知时视为匹配"""
+    try:
+        duration_a, duration_b = int(duration_a or 0), int(duration_b or 0)
+    except (TypeError, ValueError):
+        return True
+    if not duration_a or not duration_b:
+        return True
+    return abs(duration_a - duration_b) <= tolerance_ms
+
+class MusicSourceError(Exception):
+    """音源请求或解析失败"""
+
+class SourceSearcher:
+    """按音源配置搜索并整理结果（普通对象，可在任意线程中使用）。
+    on_partial 接收酷狗等需要二次请求的音源按排名分批得到的结果，cancel_check 返回 True 时尽快结束"""
+    KUGOU_DETAIL_WORKERS = 6    # 酷狗详情并发请求数
+    KUGOU_DETAIL_DEADLINE = 8   # 单项详情请求的超时（秒）
+
+    def __init__(self, on_partial=None, cancel_check=None):
+        self.on_partial = on_partial
+        self.cancel_check = cancel_check or (lambda: False)
+
+    def search_source(self, config, keyword, max_results, timeout=30, max_retries=3, emit_partial=True):
+        """搜索单个音源并把结果整理为统一的歌曲字典列表"""
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+            "Accept": "application/json, text/javascript, */*; q=0.01",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+            "Connection": "keep-alive",
+            "Referer": "https://music.163.com/",
+            "Origin": "https://music.163.com",
+            "X-Requested-With": "XMLHttpRequest",
+            **config.get("headers", {})
+        }
+
+        params = config.get("params", {}).copy()
+        
+        # 替换查询参数中的占位符
+        for key, value in params.items():
+            if isinstance(value, str) and "{query}" in value:
+                params[key] = value.replace("{query}", keyword)
+        
+        api_key = config.get("api_key", "")
+        if api_key:
+            if "Authorization" in headers:
+                headers["Authorization"] = f"Bearer {api_key}"
+            else:
+                params["api_key"] = api_key
+        
+        method = config.get("method", "GET").upper()
+        url = config["url"]
+        retry_count = 0
+        pool = get_http_pool()
+        
+        while retry_count < max_retries:
+            try:
+                # 重试由本循环控制，连接池不再重复重试
+                if method == "GET":
+                    response = pool.get(url, source=config, params=params, headers=headers, timeout=timeout, retries=0)
+                else:
+                    response = pool.post(url, source=config, data=params, headers=headers, timeout=timeout, retries=0)
+
+                # 检查响应状态码
+                if response.status_code != 200:
+                    logger.warning(f"API返回非200状态码: {response.status_code}, 尝试重试...")
+                    retry_count += 1
+                    time.sleep(1)
+                    continue
+                    
+                # 检查响应内容是否为空
+                if not response.text.strip():
+                    logger.warning("API返回空响应, 尝试重试...")
+                    retry_count += 1
+                    time.sleep(1)
+                    continue
+
+                # 检查是否被重定向到验证页面
+                if "verify" in str(response.url) or "captcha" in str(response.url):
+                    logger.error("API请求被重定向到验证页面")
+                    raise MusicSourceError("请求被拦截，可能需要解决验证码")
+                
+                # 检查内容类型
+                content_type = response.headers.get('Content-Type', '')
+                if 'application/json' not in content_type:
+                    logger.warning(f"API返回非JSON内容: {content_type}, 原始内容: {response.text[:200]}")
+                    
+                    # 尝试解析可能的错误信息
+                    if 'text/html' in content_type:
+                        soup = BeautifulSoup(response.text, 'html.parser')
+                        title = soup.title.string if soup.title else "未知错误"
+                        raise MusicSourceError(f"API返回HTML页面: {title}")
+                    
+                # 尝试解析JSON
+                try:
+                    data = response.json()
+                except json.JSONDecodeError:
+                    logger.error(f"无法解析JSON响应, 原始内容: {response.text[:200]}")
+                    raise MusicSourceError(f"API返回了无效的JSON数据: {response.text[:100]}...")
+                    
+                # 成功获取数据，跳出重试循环
+                break
+
+            except httpx.TimeoutException:
+                logger.warning(f"API请求超时, 尝试重试 ({retry_count+1}/{max_retries})")
+                retry_count += 1
+                time.sleep(2)
+            except httpx.TransportError:
+                logger.warning(f"网络连接错误, 尝试重试 ({retry_count+1}/{max_retries})")
+                retry_count += 1
+                time.sleep(2)
+        
+        # 如果重试后仍然失败
+        if retry_count >= max_retries:
+            raise MusicSourceError("API请求失败，请检查网络连接或稍后再试")
+
+        video_list = self.parse_source_results(config, data, headers, max_results, emit_partial)
+        
+        # 限制结果数量
+        if len(video_list) > max_results:
+            video_list = video_list[:max_results]
+        return video_list
+
+    def search_source_cached(self, config, keyword, max_results, **kwargs):
+        """带缓存的单音源搜索：新鲜缓存直接返回，否则请求网络，失败时退回过期缓存"""
+        cache = get_search_cache()
+        source_name = config.get("name", "")
+        cached = cache.get(source_name, keyword, 1, max_results)
+        if cached is not None and not cached[1]:
+            return cached[0]
+        try:
+            results = self.search_source(config, keyword, max_results, **kwargs)
+        except Exception:
+            if cached is not None:
+                logger.warning(f"音源 {source_name} 请求失败，使用过期缓存")
+                return cached[0]
+            raise
+        cache.put(source_name, keyword, 1, max_results, results)
+        return results
+
+    def parse_source_results(self, config, data, headers, max_results, emit_partial=True):
+        """根据音源名称使用不同的解析方式"""
+        active_source_name = config.get("name", "")
+        if active_source_name == "网易云音乐":
+            if data["code"] == 200:
+                songs = data["result"]["songs"]
+                formatted_songs = []
+                for song in songs:
+                    # 解析艺术家信息
+                    artists = "、".join([ar["name"] for ar in song.get("ar", [])])
+                    
+                    # 解析专辑信息
+                    album_info = song.get("al", {})
+                    album_name = album_info.get("name", "未知专辑")
+                    
+                    # 构建歌曲信息
+                    formatted_songs.append({
+                        "id": song["id"],
+                        "name": song["name"],
+                        "artists": artists,
+                        "duration": song["dt"],
+                        "album": album_name,
+                        "url": f"https://music.163.com/song/media/outer/url?id={song['id']}",
+                        "pic": album_info.get("picUrl", ""),
+                    })
+                video_list = formatted_songs
+            else:
+                video_list = []
+
+        elif active_source_name == "酷狗音乐":
+            if data.get("status") == 1 and data.get("data"):
+                items = data["data"].get("lists", [])
+                # 并发获取每个搜索结果的完整信息，按排名增量显示
+                video_list = self.fetch_kugou_details(items, config, headers, max_results, emit_partial)
+            else:
+                video_list = []
+
+        elif active_source_name == "公共音乐API":
+            if data.get("code") == 200:
+                error_msg = data.get("message", "未知错误")
+                logger.error(f"公共音乐API错误: {error_msg}")
+                raise MusicSourceError(f"公共音乐API错误: {error_msg}")
+            else:
+                # 成功获取数据
+                video_list = data.get("data", [])
+                # 确保所有歌曲都有必要字段
+                for song in video_list:
+                    if "id" not in song:
+                        song["id"] = hashlib.md5(song["url"].encode()).hexdigest()
+                    if "duration" not in song:
+                        song["duration"] = 0
+                    if "artists" not in song:
+                        song["artists"] = "未知艺术家"
+                    if "album" not in song:
+                        song["album"] = "未知专辑"
+        else:
+            video_list = data.get("data", [])
+            if not isinstance(video_list, list):
+                logger.warning(f"音源 {active_source_name} 返回的 data 字段不是列表")
+                video_list = []
+            
+            formatted_songs = []
+            for song in video_list:
+                formatted_songs.append({
+                    "id": song.get("songid", ""),
+                    "name": song.get("title", "未知歌曲"),
+                    "artists": song.get("author", "未知艺术家"),
+                    "duration": self.parse_duration(song.get("duration", "00:00")),
+                    "album": song.get("album", "未知专辑"),
+                    "url": song.get("url", ""),
+                    "pic": song.get("pic", ""),
+                    "lrc": song.get("lrc", "")
+                })
+            video_list = formatted_songs
+        return video_list
+
+    def fetch_kugou_details(self, items, config, headers, max_results, emit_partial=True):
+        """并发请求酷狗 play/getdata 详情，结果按搜索排名增量发出"""
+        hashes = [item.get("FileHash", "") for item in items if item.get("FileHash")][:max_results]
+        if not hashes:
+            return []
+
+        results = [None] * len(hashes)
+        finished = [False] * len(hashes)
+        formatted_songs = []
+        next_rank = 0
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(self.KUGOU_DETAIL_WORKERS, len(hashes)),
+            thread_name_prefix="kugou-detail"
+        )
+        try:
+            futures = {
+                executor.submit(self.fetch_kugou_detail, config, headers, song_hash): rank
+                for rank, song_hash in enumerate(hashes)
+            }
+            pending = set(futures)
+            while pending and not self.cancel_check():
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=self.KUGOU_DETAIL_DEADLINE,
+                    return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.warning(f"酷狗详情请求超时，跳过剩余 {len(pending)} 项")
+                    break
+                for future in done:
+                    rank = futures[future]
+                    finished[rank] = True
+                    try:
+                        results[rank] = future.result()
+                    except Exception as e:
+                        logger.warning(f"获取酷狗歌曲详情失败: {str(e)}")
+
+                # 排名连续的前缀已就绪时立即发出，后面的结果等前面的到达
+                advanced = False
+                while next_rank < len(hashes) and finished[next_rank]:
+                    if results[next_rank]:
+                        formatted_songs.append(results[next_rank])
+                        advanced = True
+                    next_rank += 1
+                if advanced and pending and emit_partial and self.on_partial:
+                    self.on_partial(list(formatted_songs))
+
+            # 超时或中断时保留已经到达但排在未完成项之后的结果
+            for rank in range(next_rank, len(hashes)):
+                if results[rank]:
+                    formatted_songs.append(results[rank])
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return formatted_songs
+
+    def fetch_kugou_detail(self, config, headers, song_hash):
+        """获取单首酷狗歌曲的完整信息"""
+        params = config.get("params", {}).copy()
+        params["hash"] = song_hash
+        response = get_http_pool().get(
+            config["url"], source=config, params=params, headers=headers,
+            timeout=self.KUGOU_DETAIL_DEADLINE, retries=0
+        )
+        if response.status_code != 200:
+            return None
+        full_info = response.json()
+        if full_info.get("status") != 1 or not full_info.get("data"):
+            return None
+        song_data = full_info["data"]
+        return {
+            "id": song_data.get("hash", ""),
+            "name": song_data.get("song_name", "未知歌曲"),
+            "artists": song_data.get("author_name", "未知艺术家"),
+            "duration": int(song_data.get("timelength", 0)),
+            "album": song_data.get("album_name", "未知专辑"),
+            "url": song_data.get("play_url", ""),
+            "pic": song_data.get("img", ""),
+            "lrc": song_data.get("lyrics", "")
+        }
+
+    def parse_duration(self, duration_val):
+        """解析不同格式的时长"""
+        # 如果是整数，假设是毫秒
+        if isinstance(duration_val, int):
+            return duration_val
+    
+        # 如果是字符串，尝试解析 "mm:ss" 格式
+        if isinstance(duration_val, str) and ':' in duration_val:
+            try:
+                parts = duration_val.split(':')
+                if len(parts) == 2:
+                    minutes, seconds = parts
+                    return (int(minutes) * 60 + int(seconds)) * 1000
+                elif len(parts) == 3:
+                    hours, minutes, seconds = parts
+                    return (int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000
+            except:
+                return 0
+    
+        # 默认返回0
+        return 0
+
 class MusicWorker(QThread):
     search_finished = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
     download_progress = pyqtSignal(int)
     download_finished = pyqtSignal(str)
+
+    FEDERATED_SOURCE_TIMEOUT = 12   # 聚合搜索时每个音源的超时（秒）
     
     def __init__(self):
         super().__init__()
@@ -2934,240 +7054,65 @@ class MusicWorker(QThread):
         self.song = None
         self.audio_url = None
         self.file_path = None
+        self.searcher = SourceSearcher(on_partial=self.search_finished.emit, cancel_check=self.isInterruptionRequested)
         
     def search_songs(self, keyword):
         self.mode = "search"
         self.keyword = keyword
         self.start()
+
+    def search_all_sources(self, keyword):
+        """并发搜索所有已配置音源，合并去重后分批发出"""
+        self.mode = "federated"
+        self.keyword = keyword
+        self.start()
         
-    def download_song(self, audio_url, file_path):
+    def download_song(self, audio_url, file_path, source="netease"):
         self.mode = "download"
         self.audio_url = audio_url
         self.file_path = file_path
+        self.download_source = source
         self.start()
         
     def run(self):
         try:
             if self.mode == "search":
-                ensure_settings_file_exists()
-                config = get_active_source_config()
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-                    "Accept": "application/json, text/javascript, */*; q=0.01",
-                    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                    "Connection": "keep-alive",
-                    "Referer": "https://music.163.com/",
-                    "Origin": "https://music.163.com",
-                    "X-Requested-With": "XMLHttpRequest",
-                    **config.get("headers", {})
-                }
-
-                params = config.get("params", {}).copy()
-                max_results = load_settings()["other"]["max_results"]
-                
-                # 替换查询参数中的占位符
-                for key, value in params.items():
-                    if isinstance(value, str) and "{query}" in value:
-                        params[key] = value.replace("{query}", self.keyword)
-                
-                api_key = config.get("api_key", "")
-                if api_key:
-                    if "Authorization" in headers:
-                        headers["Authorization"] = f"Bearer {api_key}"
+                store = get_settings_store()
+                config = store.active_source_config()
+                max_results = store.get_int("other.max_results", 20)
+                source_name = config.get("name", "")
+                cache = get_search_cache()
+
+                # 命中缓存先立即显示，过期时继续请求网络刷新列表
+                cached = cache.get(source_name, self.keyword, 1, max_results)
+                if cached is not None:
+                    cached_results, stale = cached
+                    self.search_finished.emit(cached_results)
+                    if not stale:
+                        return
+                    logger.info(f"搜索缓存已过期，后台刷新: {self.keyword}")
+                try:
+                    video_list = self.searcher.search_source(config, self.keyword, max_results, emit_partial=cached is None)
+                except MusicSourceError as e:
+                    if cached is None:
+                        self.error_occurred.emit(str(e))
                     else:
-                        params["api_key"] = api_key
-                
-                method = config.get("method", "GET").upper()
-                url = config["url"]
-                timeout = 30
-                max_retries = 3
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        if method == "GET":
-                            response = requests.get(url, params=params, headers=headers, timeout=timeout)
-                        else:
-                            response = requests.post(url, data=params, headers=headers, timeout=timeout)
-
-                        # 检查响应状态码
-                        if response.status_code != 200:
-                            logger.warning(f"API返回非200状态码: {response.status_code}, 尝试重试...")
-                            retry_count += 1
-                            time.sleep(1)
-                            continue
-                            
-                        # 检查响应内容是否为空
-                        if not response.text.strip():
-                            logger.warning("API返回空响应, 尝试重试...")
-                            retry_count += 1
-                            time.sleep(1)
-                            continue
-
-                        # 检查是否被重定向到验证页面
-                        if "verify" in response.url or "captcha" in response.url:
-                            logger.error("API请求被重定向到验证页面")
-                            self.error_occurred.emit("请求被拦截，可能需要解决验证码")
-                            return
-                        
-                        # 检查内容类型
-                        content_type = response.headers.get('Content-Type', '')
-                        if 'application/json' not in content_type:
-                            logger.warning(f"API返回非JSON内容: {content_type}, 原始内容: {response.text[:200]}")
-                            
-                            # 尝试解析可能的错误信息
-                            if 'text/html' in content_type:
-                                soup = BeautifulSoup(response.text, 'html.parser')
-                                title = soup.title.string if soup.title else "未知错误"
-                                self.error_occurred.emit(f"API返回HTML页面: {title}")
-                                return
-                            
-                        # 尝试解析JSON
-                        try:
-                            data = response.json()
-                        except json.JSONDecodeError:
-                            logger.error(f"无法解析JSON响应, 原始内容: {response.text[:200]}")
-                            self.error_occurred.emit(f"API返回了无效的JSON数据: {response.text[:100]}...")
-                            return
-                            
-                        # 成功获取数据，跳出重试循环
-                        break
-
-                    except requests.exceptions.Timeout:
-                        logger.warning(f"API请求超时, 尝试重试 ({retry_count+1}/{max_retries})")
-                        retry_count += 1
-                        time.sleep(2)
-                    except requests.exceptions.ConnectionError:
-                        logger.warning(f"网络连接错误, 尝试重试 ({retry_count+1}/{max_retries})")
-                        retry_count += 1
-                        time.sleep(2)
-                
-                # 如果重试后仍然失败
-                if retry_count >= max_retries:
-                    self.error_occurred.emit("API请求失败，请检查网络连接或稍后再试")
+                        logger.warning(f"刷新搜索结果失败，保留缓存结果: {str(e)}")
                     return
+                cache.put(source_name, self.keyword, 1, max_results, video_list)
+                if cached is None or video_list != cached[0]:
+                    self.search_finished.emit(video_list)
 
-                # 根据音源名称使用不同的解析方式
-                active_source_name = config.get("name", "")
-                if active_source_name == "网易云音乐":
-                    if data["code"] == 200:
-                        songs = data["result"]["songs"]
-                        formatted_songs = []
-                        for song in songs:
-                            # 解析艺术家信息
-                            artists = "、".join([ar["name"] for ar in song.get("ar", [])])
-                            
-                            # 解析专辑信息
-                            album_info = song.get("al", {})
-                            album_name = album_info.get("name", "未知专辑")
-                            
-                            # 构建歌曲信息
-                            formatted_songs.append({
-                                "id": song["id"],
-                                "name": song["name"],
-                                "artists": artists,
-                                "duration": song["dt"],
-                                "album": album_name,
-                                "url": f"https://music.163.com/song/media/outer/url?id={song['id']}",
-                                "pic": album_info.get("picUrl", ""),
-                            })
-                        video_list = formatted_songs
-                    else:
-                        formatted_songs = []
-                        video_list = []
-
-                elif active_source_name == "酷狗音乐":
-                    search_response = response.json()
-                    if search_response.get("status") == 1 and search_response.get("data"):
-                        items = search_response["data"].get("lists", [])
-                        formatted_songs = []
-                    
-                        # 对于每个搜索结果，获取完整信息
-                        for item in items:
-                            # 获取歌曲hash
-                            song_hash = item.get("FileHash", "")
-                        
-                            # 使用hash获取完整信息
-                            if song_hash:
-                                # 构建获取完整信息的URL
-                                params = config.get("params", {}).copy()
-                                params["hash"] = song_hash
-                                full_info_url = config["url"] + "?" + urllib.parse.urlencode(params)
-                            
-                                # 请求完整信息
-                                full_info_response = requests.get(full_info_url, headers=headers, timeout=30)
-                                if full_info_response.status_code == 200:
-                                    full_info = full_info_response.json()
-                                
-                                    # 提取所需信息
-                                    if full_info.get("status") == 1 and full_info.get("data"):
-                                        song_data = full_info["data"]
-                                        formatted_songs.append({
-                                            "id": song_data.get("hash", ""),
-                                            "name": song_data.get("song_name", "未知歌曲"),
-                                            "artists": song_data.get("author_name", "未知艺术家"),
-                                            "duration": int(song_data.get("timelength", 0)),
-                                            "album": song_data.get("album_name", "未知专辑"),
-                                            "url": song_data.get("play_url", ""),
-                                            "pic": song_data.get("img", ""),
-                                            "lrc": song_data.get("lyrics", "")
-                                        })
-                        video_list = formatted_songs
-                    else:
-                        video_list = []
-
-                elif active_source_name == "公共音乐API":
-                    if data.get("code") == 200:
-                        error_msg = data.get("message", "未知错误")
-                        logger.error(f"公共音乐API错误: {error_msg}")
-                        self.error_occurred.emit(f"公共音乐API错误: {error_msg}")
-                        video_list = []
-                    else:
-                        # 成功获取数据
-                        video_list = data.get("data", [])
-                        # 确保所有歌曲都有必要字段
-                        for song in video_list:
-                            if "id" not in song:
-                                song["id"] = hashlib.md5(song["url"].encode()).hexdigest()
-                            if "duration" not in song:
-                                song["duration"] = 0
-                            if "artists" not in song:
-                                song["artists"] = "未知艺术家"
-                            if "album" not in song:
-                                song["album"] = "未知专辑"
-                else:
-                    video_list = data.get("data", [])
-                    if not isinstance(video_list, list):
-                        logger.warning(f"音源 {active_source_name} 返回的 data 字段不是列表")
-                        video_list = []
-                    
-                    formatted_songs = []
-                    for song in video_list:
-                        formatted_songs.append({
-                            "id": song.get("songid", ""),
-                            "name": song.get("title", "未知歌曲"),
-                            "artists": song.get("author", "未知艺术家"),
-                            "duration": self.parse_duration(song.get("duration", "00:00")),
-                            "album": song.get("album", "未知专辑"),
-                            "url": song.get("url", ""),
-                            "pic": song.get("pic", ""),
-                            "lrc": song.get("lrc", "")
-                        })
-                    video_list = formatted_songs
-                
-                # 限制结果数量
-                if len(video_list) > max_results:
-                    video_list = video_list[:max_results]
-                
-                self.search_finished.emit(video_list)
+            elif self.mode == "federated":
+                self.search_federated(self.keyword)
 
             elif self.mode == "download":
-                success = self.download_file(self.audio_url, self.file_path)
+                success = self.download_file(self.audio_url, self.file_path, self.download_source)
                 if success:
                     self.download_finished.emit(self.file_path)
                 else:
                     self.error_occurred.emit("歌曲下载失败")
-        except requests.exceptions.ConnectionError as e:
+        except httpx.TransportError as e:
             error_msg = f"网络连接失败: {str(e)}。请检查网络连接或尝试更换音源。"
             logger.error(error_msg)
             self.error_occurred.emit(error_msg)
@@ -3176,68 +7121,88 @@ class MusicWorker(QThread):
             logger.error(error_msg)
             self.error_occurred.emit(error_msg)
     
-    def download_file(self, url, file_path):
-        try:
-            # 公共音乐API有特殊的下载URL结构
-            if "api.railgun.live" in url:
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                download_url = url.replace("/info/", "/download/")
-                if not download_url.endswith(".mp3"):
-                    download_url += ".mp3"
-            else:
-                download_url = url
+    def search_federated(self, keyword):
+        """并发查询所有音源，按到达顺序合并去重并分批发出结果"""
+        store = get_settings_store()
+        sources = store.sources_list()
+        max_results = store.get_int("other.max_results", 20)
+        if not sources:
+            self.error_occurred.emit("没有可用的音源")
+            return
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-                "Referer": "https://music.163.com/",
-                "Origin": "https://music.163.com"
+        merged = []
+        seen = {}  # 去重键 -> 已收录的时长列表
+        errors = []
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(sources), thread_name_prefix="federated-search"
+        )
+        try:
+            futures = {
+                executor.submit(
+                    self.searcher.search_source_cached, config, keyword, max_results,
+                    timeout=self.FEDERATED_SOURCE_TIMEOUT, max_retries=1, emit_partial=False
+                ): config.get("name", "")
+                for config in sources
             }
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            if response.status_code != 200:
-                logger.error(f"下载失败: HTTP状态码 {response.status_code}")
+            # 酷狗等需要二次请求的音源额外留出详情请求的时间
+            deadline = time.monotonic() + self.FEDERATED_SOURCE_TIMEOUT + SourceSearcher.KUGOU_DETAIL_DEADLINE
+            pending = set(futures)
+            while pending and not self.isInterruptionRequested():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=remaining, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                added = False
+                for future in done:
+                    source_name = futures[future]
+                    try:
+                        songs = future.result()
+                    except Exception as e:
+                        logger.warning(f"音源 {source_name} 搜索失败: {str(e)}")
+                        errors.append(f"{source_name}: {str(e)}")
+                        continue
+                    for song in songs:
+                        key = song_identity_key(song.get("name"), song.get("artists"))
+                        durations = seen.setdefault(key, [])
+                        if any(durations_match(song.get("duration"), known) for known in durations):
+                            continue
+                        durations.append(song.get("duration"))
+                        song["source"] = source_name
+                        merged.append(song)
+                        added = True
+                    logger.info(f"音源 {source_name} 返回 {len(songs)} 首，合并后共 {len(merged)} 首")
+                if added:
+                    self.search_finished.emit(list(merged))
+
+            for future in pending:
+                logger.warning(f"音源 {futures[future]} 超时，已跳过")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if not merged:
+            detail = "；".join(errors) if errors else "所有音源均无结果"
+            self.error_occurred.emit(f"聚合搜索未找到结果: {detail}")
+
+    def download_file(self, url, file_path, source="netease"):
+        try:
+            downloader = SegmentedDownloader(
+                resolve_download_url(url), file_path, source=source,
+                progress_callback=self._emit_download_progress,
+                cancel_check=self.isInterruptionRequested
+            )
+            if not downloader.run():
                 return False
-                
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if self.isInterruptionRequested():
-                        logger.info("下载被中断")
-                        return False
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        progress = int(100 * downloaded / total_size) if total_size > 0 else 0
-                        self.download_progress.emit(progress)
-            
             logger.info(f"歌曲下载完成: {file_path}")
             return True
         except Exception as e:
             logger.error(f"下载歌曲失败: {str(e)}")
             return False
     
-    def parse_duration(self, duration_val):
-        """解析不同格式的时长"""
-        # 如果是整数，假设是毫秒
-        if isinstance(duration_val, int):
-            return duration_val
-    
-        # 如果是字符串，尝试解析 "mm:ss" 格式
-        if isinstance(duration_val, str) and ':' in duration_val:
-            try:
-                parts = duration_val.split(':')
-                if len(parts) == 2:
-                    minutes, seconds = parts
-                    return (int(minutes) * 60 + int(seconds)) * 1000
-                elif len(parts) == 3:
-                    hours, minutes, seconds = parts
-                    return (int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000
-            except:
-                return 0
-    
-        # 默认返回0
-        return 0
+    def _emit_download_progress(self, downloaded, total):
+        if total > 0:
+            self.download_progress.emit(int(100 * downloaded / total))
 
 # =============== 工具对话框 ===============
 class ToolsDialog(QDialog):
@@ -3542,29 +7507,44 @@ class ToolsDialog(QDialog):
             QMessageBox.critical(self, "错误", f"清理失败: {str(e)}")
             
     def batch_download(self):
-        """批量下载歌曲"""
-        song_names = self.song_list.toPlainText().strip().splitlines()
-        if not song_names:
-            QMessageBox.warning(self, "提示", "请输入歌曲名称")
+        """批量下载歌曲（未输入歌名时继续上次未完成的队列）"""
+        song_names = [name for name in self.song_list.toPlainText().strip().splitlines() if name.strip()]
+        if hasattr(self, 'batch_worker') and self.batch_worker.isRunning():
+            QMessageBox.warning(self, "提示", "批量下载正在进行中")
             return
             
+        # 创建工作线程（队列持久化，上次未完成的条目会一并继续）
+        self.batch_worker = BatchDownloadWorker(song_names)
+        if not self.batch_worker.queue.has_pending():
+            QMessageBox.warning(self, "提示", "请输入歌曲名称")
+            return
+        finished, total = self.batch_worker.queue.counts()
+
         # 创建进度对话框
-        self.progress_dialog = QProgressDialog("批量下载歌曲...", "取消", 0, len(song_names), self)
+        self.progress_dialog = QProgressDialog("批量下载歌曲...", "取消", 0, total, self)
         self.progress_dialog.setWindowTitle("批量下载")
         self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setValue(finished)
         self.progress_dialog.canceled.connect(self.cancel_batch_download)
         self.progress_dialog.show()
         
-        # 创建工作线程
-        self.batch_worker = BatchDownloadWorker(song_names)
         self.batch_worker.progress_updated.connect(self.update_batch_progress)
+        self.batch_worker.item_progress.connect(self.update_batch_item_progress)
         self.batch_worker.finished.connect(self.batch_download_completed)
-        self.batch_worker.start()
+        get_task_manager().start_thread(
+            self.batch_worker, "batch", TaskManager.PRIORITY_BACKGROUND, name=f"批量下载 ({total} 首)"
+        )
         
     def update_batch_progress(self, current, total, song_name):
-        """更新批量下载进度"""
+        """更新批量下载总进度"""
+        self.progress_dialog.setMaximum(total)
         self.progress_dialog.setValue(current)
-        self.progress_dialog.setLabelText(f"正在下载: {song_name}\n进度: {current}/{total}")
+        self.progress_dialog.setLabelText(f"已完成: {song_name}\n进度: {current}/{total}")
+
+    def update_batch_item_progress(self, item_id, song_name, percent):
+        """更新单首歌曲的下载进度"""
+        finished, total = self.batch_worker.queue.counts()
+        self.progress_dialog.setLabelText(f"正在下载: {song_name} ({percent}%)\n进度: {finished}/{total}")
         
     def batch_download_completed(self):
         """批量下载完成"""
@@ -3574,48 +7554,419 @@ class ToolsDialog(QDialog):
         
     def cancel_batch_download(self):
         """取消批量下载"""
-        if hasattr(self, 'batch_worker') and self.batch_worker.isRunning():
-            self.batch_worker.requestInterruption()
+        if hasattr(self, 'batch_worker'):
+            # 排队中的批量任务同样会被取消
+            get_task_manager().cancel_thread(self.batch_worker)
             self.download_status.setText("批量下载已取消")
             
             
+class HostRateLimiter:
+    """按主机限制请求间隔，多个下载线程共享"""
+    def __init__(self, min_interval=0.5):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_allowed = {}
+
+    def acquire(self, url, stop_check=None):
+        """等待直到该主机允许发起下一个请求"""
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            allowed_at = max(now, self._next_allowed.get(host, 0.0))
+            self._next_allowed[host] = allowed_at + self.min_interval
+        while True:
+            remaining = allowed_at - time.monotonic()
+            if remaining <= 0 or (stop_check and stop_check()):
+                return
+            time.sleep(min(remaining, 0.2))
+
+def pick_best_match(query, songs):
+    """从搜索结果中选出与查询最接近且可下载的一首"""
+    target = normalize_text(query)
+    best, best_score = None, -1.0
+    for rank, song in enumerate(songs):
+        if not song.get("url"):
+            continue
+        candidates = [
+            normalize_text(f"{song.get('name', '')}{song.get('artists', '')}"),
+            normalize_text(f"{song.get('artists', '')}{song.get('name', '')}"),
+            normalize_text(song.get("name", ""))
+        ]
+        score = max(difflib.SequenceMatcher(None, target, c).ratio() for c in candidates)
+        # 相似度相同时优先排名靠前的结果
+        score -= rank * 0.001
+        if score > best_score:
+            best, best_score = song, score
+    return best
+
+class BatchDownloadQueue:
+    """批量下载队列，保存在数据目录的 batch_download_queue.json 中，重启后可继续"""
+    def __init__(self, queue_path=None):
+        self.queue_path = queue_path or os.path.join(get_data_dir(), "batch_download_queue.json")
+        self._lock = threading.RLock()
+        self.items = []
+        self._next_id = 1
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.queue_path):
+            return
+        try:
+            with open(self.queue_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.items = data.get("items", [])
+            self._next_id = data.get("next_id", len(self.items) + 1)
+            # 上次退出时正在处理的条目重新排队
+            for item in self.items:
+                if item["status"] in ("resolving", "downloading"):
+                    item["status"] = "pending"
+        except Exception as e:
+            logger.error(f"读取批量下载队列失败: {str(e)}")
+            self.items = []
+
+    def save(self):
+        with self._lock:
+            try:
+                atomic_write_json(self.queue_path, {"next_id": self._next_id, "items": self.items}, indent=None)
+            except Exception as e:
+                logger.error(f"保存批量下载队列失败: {str(e)}")
+
+    def add_names(self, names):
+        """加入新的歌曲名，清理上一批已结束的条目并跳过重复名称"""
+        with self._lock:
+            self.items = [item for item in self.items if item["status"] not in ("done", "failed")]
+            queued = {normalize_text(item["name"]) for item in self.items}
+            for name in names:
+                name = name.strip()
+                if not name or normalize_text(name) in queued:
+                    continue
+                queued.add(normalize_text(name))
+                self.items.append({
+                    "id": self._next_id, "name": name, "status": "pending",
+                    "attempts": 0, "next_retry_at": 0, "file_path": "", "error": ""
+                })
+                self._next_id += 1
+            self.save()
+
+    def next_due(self, exclude_ids):
+        """取出一个已到重试时间的待处理条目"""
+        now = time.time()
+        with self._lock:
+            for item in self.items:
+                if (item["status"] == "pending" and item["id"] not in exclude_ids
+                        and item["next_retry_at"] <= now):
+                    return dict(item)
+        return None
+
+    def seconds_until_next_retry(self):
+        """距离最近一次待重试的秒数，没有待处理条目时返回 None"""
+        with self._lock:
+            waits = [item["next_retry_at"] for item in self.items if item["status"] == "pending"]
+        if not waits:
+            return None
+        return max(0.0, min(waits) - time.time())
+
+    def update(self, item_id, **fields):
+        with self._lock:
+            for item in self.items:
+                if item["id"] == item_id:
+                    item.update(fields)
+                    break
+            self.save()
+
+    def counts(self):
+        """返回 (已结束数, 总数)"""
+        with self._lock:
+            finished = sum(1 for item in self.items if item["status"] in ("done", "failed"))
+            return finished, len(self.items)
+
+    def has_pending(self):
+        with self._lock:
+            return any(item["status"] == "pending" for item in self.items)
+
 class BatchDownloadWorker(QThread):
-    """批量下载歌曲的工作线程"""
-    progress_updated = pyqtSignal(int, int, str)
+    """批量下载歌曲的工作线程：按当前音源搜索每个歌名、挑选最佳匹配后并发下载"""
+    progress_updated = pyqtSignal(int, int, str)    # 已结束数, 总数, 当前歌曲名
+    item_progress = pyqtSignal(int, str, int)       # 条目ID, 歌曲名, 下载进度(0-100)
+    item_status_changed = pyqtSignal(int, str, str) # 条目ID, 状态, 说明
+
+    MAX_ATTEMPTS = 3
+    RETRY_BASE_DELAY = 5    # 重试退避基数（秒）
     
-    def __init__(self, song_names):
+    def __init__(self, song_names=None):
         super().__init__()
-        self.song_names = song_names
+        self.queue = BatchDownloadQueue()
+        if song_names:
+            self.queue.add_names(song_names)
         self.success_count = 0
         self.fail_count = 0
         self._stop_requested = False
+        self._count_lock = threading.Lock()
+        store = get_settings_store()
+        self.concurrency = max(1, store.get_int("batch_download.concurrency", 3))
+        self.max_attempts = max(1, store.get_int("batch_download.max_attempts", self.MAX_ATTEMPTS))
+        self.rate_limiter = HostRateLimiter(store.get_float("batch_download.host_interval", 0.5))
         
     def run(self):
         self.success_count = 0
         self.fail_count = 0
-        
-        for i, song_name in enumerate(self.song_names):
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="batch-download"
+        ) as executor:
+            while not self._stop_requested:
+                # 填满空闲的下载槽位
+                while len(running) < self.concurrency:
+                    item = self.queue.next_due(set(running.values()))
+                    if item is None:
+                        break
+                    running[executor.submit(self.process_item, item)] = item["id"]
+
+                if not running:
+                    wait_seconds = self.queue.seconds_until_next_retry()
+                    if wait_seconds is None:
+                        break
+                    self.msleep(int(min(wait_seconds, 0.5) * 1000) + 10)
+                    continue
+
+                done, _ = concurrent.futures.wait(
+                    running, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"批量下载任务异常: {str(e)}")
+
+    def process_item(self, item):
+        """处理单个条目：搜索、挑选、下载，失败时按退避时间重新排队"""
+        item_id, name = item["id"], item["name"]
+        attempts = item["attempts"] + 1
+        try:
+            self._set_status(item_id, name, "resolving", "搜索中", attempts=attempts)
+            store = get_settings_store()
+            config = store.active_source_config()
+            self.rate_limiter.acquire(config.get("url", ""), self._is_stopped)
+            results = SourceSearcher().search_source_cached(
+                config, name, 10, timeout=15, max_retries=1, emit_partial=False
+            )
+            song = pick_best_match(name, results)
+            if song is None:
+                raise MusicSourceError("未找到可下载的匹配结果")
+
+            file_name = re.sub(r'[\\/*?:"<>|]', "_", f"{song.get('name', name)} - {song.get('artists', '')}")
+            file_path = os.path.join(store.save_path("music"), f"{file_name}.mp3")
+            self._set_status(item_id, name, "downloading", f"{song.get('name')} - {song.get('artists')}",
+                             file_path=file_path)
+            if os.path.exists(file_path):
+                self._finish(item_id, name, True, "文件已存在")
+                return
+
+            self.rate_limiter.acquire(song["url"], self._is_stopped)
+            downloader = SegmentedDownloader(
+                song["url"], file_path, source=config,
+                progress_callback=lambda done, total: self.item_progress.emit(
+                    item_id, name, int(100 * done / total) if total else 0),
+                cancel_check=self._is_stopped
+            )
+            if downloader.run():
+                self._finish(item_id, name, True, "下载完成")
+                return
             if self._stop_requested:
-                break
-                
-            if not song_name.strip():
-                continue
-                
-            self.progress_updated.emit(i+1, len(self.song_names), song_name)
-            
-            try:
-                # 这里添加实际的下载逻辑
-                # 简化示例：模拟下载过程
-                self.msleep(1000)  # 模拟下载延迟
+                # 取消的条目保持待处理，下次继续
+                self.queue.update(item_id, status="pending", attempts=attempts - 1)
+                return
+            raise MusicSourceError("下载失败")
+        except Exception as e:
+            if self._stop_requested:
+                self.queue.update(item_id, status="pending", attempts=attempts - 1)
+                return
+            if attempts < self.max_attempts:
+                delay = self.RETRY_BASE_DELAY * 2 ** (attempts - 1)
+                logger.warning(f"批量下载 {name} 失败: {str(e)}，{delay}秒后重试")
+                self.queue.update(item_id, status="pending", error=str(e), next_retry_at=time.time() + delay)
+                self.item_status_changed.emit(item_id, "pending", f"{delay}秒后重试: {str(e)}")
+            else:
+                logger.error(f"批量下载 {name} 失败: {str(e)}")
+                self._finish(item_id, name, False, str(e))
+
+    def _set_status(self, item_id, name, status, message, **fields):
+        self.queue.update(item_id, status=status, **fields)
+        self.item_status_changed.emit(item_id, status, message)
+
+    def _finish(self, item_id, name, success, message):
+        self._set_status(item_id, name, "done" if success else "failed", message, error="" if success else message)
+        with self._count_lock:
+            if success:
                 self.success_count += 1
-            except Exception:
+            else:
                 self.fail_count += 1
+        finished, total = self.queue.counts()
+        self.progress_updated.emit(finished, total, name)
+
+    def _is_stopped(self):
+        return self._stop_requested
                 
     def requestInterruption(self):
         """请求停止下载"""
         self._stop_requested = True
+        super().requestInterruption()
         
 # =============== 外置歌词窗口 ===============
+class KaraokeLabel(QWidget):
+    """卡拉OK歌词行。整行文字只在文本、字体、颜色、效果或尺寸变化时渲染成两张缓存位图
+    （未唱/已唱），播放进度通过裁剪矩形叠加已唱位图，每次刷新只是一次前缀宽度查表，
+    进度对应的像素位置不变时不重绘"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text = ""
+        self._advances = [0.0]  # _advances[i] 为前 i 个字符的宽度
+        self._pixmaps = None
+        self._sung_chars = 0.0
+        self._clip_x = 0
+        self.normal_color = QColor("#FFFFFF")
+        self.highlight_color = QColor("#FF5722")
+        self.effect_type = "fill"
+        self.outline_size = 2
+        self.glow_size = 10
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+
+    def text(self):
+        return self._text
+
+    def setText(self, text):
+        text = text or ""
+        if text == self._text:
+            return
+        self._text = text
+        self._sung_chars = 0.0
+        self._measure()
+        self.updateGeometry()
+        self.update()
+
+    def set_colors(self, normal_color, highlight_color):
+        self.normal_color = QColor(normal_color)
+        self.highlight_color = QColor(highlight_color)
+        palette = self.palette()
+        palette.setColor(QPalette.WindowText, self.normal_color)
+        self.setPalette(palette)
+        self._invalidate()
+
+    def set_effect(self, effect_type, outline_size=None, glow_size=None):
+        self.effect_type = effect_type
+        if outline_size:
+            self.outline_size = outline_size
+        if glow_size:
+            self.glow_size = glow_size
+        self.updateGeometry()
+        self._invalidate()
+
+    def set_progress(self, sung_chars):
+        """设置已唱字符数（可带小数），只重绘进度边界扫过的区域"""
+        self._sung_chars = sung_chars
+        clip_x = self._progress_x()
+        if clip_x == self._clip_x:
+            return
+        left, right = sorted((self._clip_x, clip_x))
+        self._clip_x = clip_x
+        self.update(QRect(left, 0, right - left + 1, self.height()))
+
+    def _margin(self):
+        if self.effect_type == "outline":
+            return self.outline_size
+        if self.effect_type == "glow":
+            return self.glow_size
+        return 0
+
+    def _measure(self):
+        metrics = QFontMetricsF(self.font())
+        advances = [0.0]
+        for i in range(1, len(self._text) + 1):
+            advances.append(metrics.horizontalAdvance(self._text[:i]))
+        self._advances = advances
+        self._invalidate()
+
+    def _invalidate(self):
+        self._pixmaps = None
+        self._clip_x = self._progress_x()
+        self.update()
+
+    def _text_left(self):
+        return max(0.0, (self.width() - self._advances[-1]) / 2)
+
+    def _progress_x(self):
+        length = len(self._text)
+        if not length:
+            return 0
+        chars = max(0.0, min(float(length), self._sung_chars))
+        index = min(int(chars), length - 1)
+        x = self._advances[index] + (self._advances[index + 1] - self._advances[index]) * (chars - index)
+        return int(round(self._text_left() + x))
+
+    def _render(self, color):
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.setFont(self.font())
+        metrics = QFontMetricsF(self.font())
+        baseline = (self.height() - metrics.height()) / 2 + metrics.ascent()
+        if self.effect_type == "fill":
+            painter.setPen(color)
+            painter.drawText(QPoint(int(self._text_left()), int(baseline)), self._text)
+        else:
+            path = QPainterPath()
+            path.addText(self._text_left(), baseline, self.font(), self._text)
+            if self.effect_type == "outline":
+                painter.strokePath(path, QPen(self.normal_color if color == self.highlight_color else self.highlight_color,
+                                              self.outline_size * 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+            else:
+                glow = QColor(color)
+                for width, alpha in ((self.glow_size * 2, 40), (self.glow_size, 80)):
+                    glow.setAlpha(alpha)
+                    painter.strokePath(path, QPen(glow, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+            painter.fillPath(path, color)
+        painter.end()
+        return pixmap
+
+    def sizeHint(self):
+        metrics = QFontMetricsF(self.font())
+        margin = self._margin()
+        return QSize(int(self._advances[-1]) + 2 * margin, int(metrics.height()) + 2 * margin)
+
+    def minimumSizeHint(self):
+        return QSize(0, self.sizeHint().height())
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.FontChange:
+            self._measure()
+            self.updateGeometry()
+        super().changeEvent(event)
+
+    def resizeEvent(self, event):
+        self._invalidate()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if not self._text or self.width() <= 0 or self.height() <= 0:
+            return
+        if self._pixmaps is None:
+            self._pixmaps = (self._render(self.normal_color), self._render(self.highlight_color))
+        normal, highlight = self._pixmaps
+        painter = QPainter(self)
+        painter.setClipRect(event.rect())
+        painter.drawPixmap(0, 0, normal)
+        if self._clip_x > 0:
+            painter.setClipRect(event.rect().intersected(QRect(0, 0, self._clip_x, self.height())))
+            painter.drawPixmap(0, 0, highlight)
+        painter.end()
+
 class ExternalLyricsWindow(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -3646,9 +7997,7 @@ class ExternalLyricsWindow(QMainWindow):
         self.lyrics_layout.addWidget(self.translation_label)
         
         # 当前行标签
-        self.current_line_label = QLabel("")
-        self.current_line_label.setAlignment(Qt.AlignCenter)
-        self.current_line_label.setStyleSheet("font-size: 48px; font-weight: bold; color: white;")
+        self.current_line_label = KaraokeLabel()
         
         # 下一行标签
         self.next_line_label = QLabel("")
@@ -3674,10 +8023,9 @@ class ExternalLyricsWindow(QMainWindow):
         self.customContextMenuRequested.connect(self.show_context_menu)
 
         # 歌词数据
-        self.lyrics_data = []
+        self.timeline = LyricsTimeline()
         self.current_line_index = -1
-        self.word_positions = []
-        self.karaoke_progress = 0
+        self.karaoke_progress = 0.0
 
         # 添加默认样式属性
         self.normal_color = QColor("#FFFFFF")
@@ -3709,7 +8057,7 @@ class ExternalLyricsWindow(QMainWindow):
         # 应用颜色
         if color:
             self.normal_color = QColor(color)
-            self.current_line_label.setStyleSheet(f"color: {color};")
+            self.current_line_label.set_colors(self.normal_color, self.highlight_color)
             # 下一行使用较浅的颜色
             self.next_line_color = QColor(self.normal_color)
             self.next_line_color.setAlpha(180)  # 设置透明度
@@ -3876,40 +8224,12 @@ class ExternalLyricsWindow(QMainWindow):
 
     def apply_font_style(self):
         """应用字体样式到标签"""
-        # 当前行样式
-        if self.effect_type == "fill":
-            style = f"""
-                QLabel {{
-                    font-family: '{self.font.family()}';
-                    font-size: {self.font.pointSize()}px;
-                    font-weight: bold;
-                    color: {self.highlight_color.name()};
-                    background-color: transparent;
-                }}
-            """
-        elif self.effect_type == "outline":
-            style = f"""
-                QLabel {{
-                    font-family: '{self.font.family()}';
-                    font-size: {self.font.pointSize()}px;
-                    font-weight: bold;
-                    color: {self.highlight_color.name()};
-                    background-color: transparent;
-                    text-outline: {self.outline_size}px {self.normal_color.name()};
-                }}
-            """
-        else:  # glow
-            style = f"""
-                QLabel {{
-                    font-family: '{self.font.family()}';
-                    font-size: {self.font.pointSize()}px;
-                    font-weight: bold;
-                    color: {self.highlight_color.name()};
-                    background-color: transparent;
-                    text-shadow: 0px 0px {self.glow_size}px {self.normal_color.name()};
-                }}
-            """
-        self.current_line_label.setStyleSheet(style)
+        # 当前行由 KaraokeLabel 自绘，颜色和效果直接交给它
+        current_font = QFont(self.font)
+        current_font.setBold(True)
+        self.current_line_label.setFont(current_font)
+        self.current_line_label.set_colors(self.normal_color, self.highlight_color)
+        self.current_line_label.set_effect(self.effect_type, self.outline_size, self.glow_size)
         
         # 下一行样式
         self.next_line_label.setStyleSheet(f"""
@@ -4095,6 +8415,19 @@ class ExternalLyricsWindow(QMainWindow):
             self.apply_style_settings()
             self.save_lyrics_settings()
     
+    def set_colors(self, normal_color, highlight_color, next_line_color=None):
+        """设置歌词颜色"""
+        self.normal_color = QColor(normal_color)
+        self.highlight_color = QColor(highlight_color)
+        if next_line_color is not None:
+            self.next_line_color = QColor(next_line_color)
+        self.apply_font_style()
+
+    def set_karaoke_progress(self, sung_chars):
+        """更新当前行的卡拉OK进度（已唱字符数）"""
+        if self.current_line_label:
+            self.current_line_label.set_progress(sung_chars)
+
     def set_effect(self, effect_type, outline_size=None, glow_size=None):
         """设置歌词效果"""
         self.effect_type = effect_type
@@ -4145,23 +8478,9 @@ class ExternalLyricsWindow(QMainWindow):
     
     def load_lyrics(self, lyrics_text):
         """加载歌词并解析时间标签"""
-        self.lyrics_data = []
-        lines = lyrics_text.splitlines()
-        pattern = re.compile(r'\[(\d+):(\d+\.\d+)\](.*)')
-        
-        for line in lines:
-            match = pattern.match(line)
-            if match:
-                minutes = int(match.group(1))
-                seconds = float(match.group(2))
-                time_ms = int((minutes * 60 + seconds) * 1000)
-                text = match.group(3).strip()
-                self.lyrics_data.append((time_ms, text))
-        
-        # 按时间排序
-        self.lyrics_data.sort(key=lambda x: x[0])
+        self.timeline = load_lyrics_timeline(lyrics_text)
         self.current_line_index = -1
-        self.word_positions = []
+        self.karaoke_progress = 0.0
 
     def update_lyrics(self, current_line, next_line="", translation_line=""):
         """更新歌词显示"""
@@ -4192,77 +8511,16 @@ class ExternalLyricsWindow(QMainWindow):
             else:
                 logger.error(f"更新歌词失败: {str(e)}")
     
-    def calculate_word_positions(self, text, position):
-        """计算歌词中每个字的位置和持续时间（简化版）"""
-        self.word_positions = []
-        if not text:
-            return
-        
-        # 假设每个字平均分配时间
-        start_time = self.lyrics_data[self.current_line_index][0]
-        end_time = self.lyrics_data[self.current_line_index + 1][0] if self.current_line_index + 1 < len(self.lyrics_data) else start_time + 5000
-        
-        total_chars = len(text)
-        duration_per_char = (end_time - start_time) / max(1, total_chars)
-        
-        for i in range(total_chars):
-            char_start = start_time + i * duration_per_char
-            char_end = char_start + duration_per_char
-            self.word_positions.append((char_start, char_end))
-    
     def update_karaoke_effect(self, position):
         """更新卡拉OK效果"""
-        if not self.word_positions:
+        index = self.timeline.line_at(position)
+        if index == -1:
             return
-        
-        current_text = self.lyrics_data[self.current_line_index][1]
-        styled_text = self.get_styled_text(current_text, position)
-        self.current_line_label.setText(styled_text)
-    
-    def get_styled_text(self, text, position):
-        """获取带样式的歌词文本（卡拉OK效果）"""
-        if not self.word_positions or len(self.word_positions) != len(text):
-            return text
-        
-        # 找出当前播放到的字符位置
-        current_char_idx = 0
-        for i, (char_start, char_end) in enumerate(self.word_positions):
-            if position >= char_start:
-                current_char_idx = i
-            else:
-                break
-        
-        # 创建带样式的HTML
-        styled_text = ""
-        for i, char in enumerate(text):
-            if i < current_char_idx:
-                # 已播放部分 - 高亮颜色
-                styled_text += f'<span style="color: {self.highlight_color.name()};">{char}</span>'
-            elif i == current_char_idx:
-                # 当前播放字 - 添加过渡效果
-                # 计算当前字内的进度 (0-1)
-                char_start, char_end = self.word_positions[i]
-                if char_end > char_start:
-                    progress = (position - char_start) / (char_end - char_start)
-                    progress = max(0, min(1, progress))  # 限制在0-1范围
-                    
-                    # 创建渐变效果 (从高亮色到普通色)
-                    r1, g1, b1, _ = self.highlight_color.getRgb()
-                    r2, g2, b2, _ = self.normal_color.getRgb()
-                    
-                    r = int(r1 + (r2 - r1) * progress)
-                    g = int(g1 + (g2 - g1) * progress)
-                    b = int(b1 + (b2 - b1) * progress)
-                    color = QColor(r, g, b)
-                    
-                    styled_text += f'<span style="color: {color.name()};">{char}</span>'
-                else:
-                    styled_text += f'<span style="color: {self.highlight_color.name()};">{char}</span>'
-            else:
-                # 未播放部分 - 普通颜色
-                styled_text += f'<span style="color: {self.normal_color.name()};">{char}</span>'
-        
-        return styled_text
+        if index != self.current_line_index:
+            self.current_line_label.setText(self.timeline.texts[index])
+        self.current_line_index = index
+        self.karaoke_progress = self.timeline.sung_chars(index, position)
+        self.current_line_label.set_progress(self.karaoke_progress)
         
         # 设置更大的初始尺寸以容纳长歌词
         self.setMinimumSize(1400, 200)
@@ -4505,6 +8763,7 @@ class SmartPlaylistManager:
 class AdvancedPlaylistDialog(QDialog):
     def __init__(self, playlist_manager):
         super().__init__()
+        self.playlist_manager = playlist_manager
         self.setWindowTitle("高级播放列表管理")
         self.setMinimumSize(800, 600)
         
@@ -4528,8 +8787,58 @@ class AdvancedPlaylistDialog(QDialog):
         btn_layout.addWidget(self.import_btn)
         btn_layout.addWidget(self.sync_btn)
         layout.addLayout(btn_layout)
+        self.export_btn.clicked.connect(self.export_playlist)
+        self.import_btn.clicked.connect(self.import_playlist)
         
         self.setLayout(layout)
+        self.update_playlist_tree()
+
+    def update_playlist_tree(self):
+        """刷新播放列表树"""
+        self.playlist_tree.clear()
+        for name, songs in self.playlist_manager.playlists.items():
+            QTreeWidgetItem(self.playlist_tree, [name, str(len(songs)), "普通"])
+
+    def selected_playlist_name(self):
+        item = self.playlist_tree.currentItem()
+        return item.text(0) if item else "default"
+
+    def export_playlist(self):
+        """把选中的播放列表导出为 M3U/PLS/XSPF/JSON"""
+        name = self.selected_playlist_name()
+        songs = list(self.playlist_manager.playlists.get(name, []))
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出播放列表", f"{name}.m3u8", PLAYLIST_FILE_FILTER)
+        if not file_path:
+            return
+        get_task_manager().submit(
+            lambda token: write_playlist_file(file_path, iter_export_entries(songs, get_media_library())),
+            "playlist_io", TaskManager.PRIORITY_USER, name=f"导出播放列表: {name}",
+            on_done=lambda count: QMessageBox.information(self, "成功", f"已导出 {count} 首歌曲到:\n{file_path}"),
+            on_error=lambda error: QMessageBox.critical(self, "错误", f"导出播放列表失败:\n{str(error)}")
+        )
+
+    def import_playlist(self):
+        """导入播放列表文件为新的播放列表"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "导入播放列表", "", PLAYLIST_FILE_FILTER)
+        if not file_path:
+            return
+        base_name = name = os.path.splitext(os.path.basename(file_path))[0]
+        suffix = 2
+        while name in self.playlist_manager.playlists:
+            name = f"{base_name} ({suffix})"
+            suffix += 1
+        self.playlist_manager.create_playlist(name)
+        store = self.playlist_manager.store
+        thread = PlaylistImportThread(file_path, get_media_library(), self)
+        thread.batch_ready.connect(lambda paths, infos: store.add(name, paths))
+        thread.import_finished.connect(lambda found, missing, samples: self.on_playlist_imported(name, found, missing))
+        thread.import_failed.connect(lambda error: QMessageBox.critical(self, "错误", f"导入播放列表失败:\n{error}"))
+        thread.finished.connect(thread.deleteLater)
+        get_task_manager().start_thread(thread, "playlist_io", TaskManager.PRIORITY_USER, name=f"导入播放列表: {name}")
+
+    def on_playlist_imported(self, name, found, missing):
+        self.update_playlist_tree()
+        QMessageBox.information(self, "导入完成", f"播放列表“{name}”: 找到 {found} 首，未找到 {missing} 首（详见日志）")
     
     def create_playlist_tab(self):
         widget = QWidget()
@@ -5685,9 +9994,11 @@ class SpectrumWidget(QWidget):
         super().__init__(parent)
         self.setMinimumSize(300, 150)
         self.bars = []
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
-        self.timer.start(30)  # 30ms刷新一次
+        
+    def on_clock_tick(self, position, duration):
+        """跟随播放时钟重绘，暂停时时钟停止，频谱也不再刷新"""
+        if self.isVisible():
+            self.update()
         
     def set_audio_probe(self, media_player):
         """设置音频探测器"""
@@ -5824,7 +10135,7 @@ class PhonePlayer(QObject):
             "position": position
         }
         
-        response = requests.post(url, json=data)
+        response = get_http_pool().post(url, json=data, retries=0)
         if response.status_code != 200:
             raise Exception(f"播放命令失败: {response.text}")
         
@@ -5836,9 +10147,8 @@ class PhonePlayer(QObject):
     def upload_song(self, file_path):
         """上传歌曲到手机"""
         url = f"http://{self.server_ip}:5000/api/upload"
-        files = {'file': open(file_path, 'rb')}
-        
-        response = requests.post(url, files=files)
+        with open(file_path, 'rb') as f:
+            response = get_http_pool().post(url, files={'file': f}, timeout=120, retries=0)
         if response.status_code != 200:
             raise Exception(f"上传歌曲失败: {response.text}")
     
@@ -5848,7 +10158,7 @@ class PhonePlayer(QObject):
             return
             
         url = f"http://{self.server_ip}:5000/api/play"
-        response = requests.post(url)
+        response = get_http_pool().post(url, retries=0)
         if response.status_code != 200:
             raise Exception(f"播放命令失败: {response.text}")
         
@@ -5860,7 +10170,7 @@ class PhonePlayer(QObject):
             return
             
         url = f"http://{self.server_ip}:5000/api/pause"
-        response = requests.post(url)
+        response = get_http_pool().post(url, retries=0)
         if response.status_code != 200:
             raise Exception(f"暂停命令失败: {response.text}")
         
@@ -5869,7 +10179,7 @@ class PhonePlayer(QObject):
     def stop(self):
         """停止播放"""
         url = f"http://{self.server_ip}:5000/api/stop"
-        response = requests.post(url)
+        response = get_http_pool().post(url, retries=0)
         if response.status_code != 200:
             raise Exception(f"停止命令失败: {response.text}")
         
@@ -5880,7 +10190,7 @@ class PhonePlayer(QObject):
         """跳转到指定位置"""
         url = f"http://{self.server_ip}:5000/api/seek"
         data = {"position": position}
-        response = requests.post(url, json=data)
+        response = get_http_pool().post(url, json=data, retries=0)
         if response.status_code != 200:
             raise Exception(f"跳转命令失败: {response.text}")
         
@@ -5890,7 +10200,7 @@ class PhonePlayer(QObject):
         """设置音量"""
         url = f"http://{self.server_ip}:5000/api/volume"
         data = {"volume": volume}
-        response = requests.post(url, json=data)
+        response = get_http_pool().post(url, json=data, retries=0)
         if response.status_code != 200:
             raise Exception(f"音量设置失败: {response.text}")
 
@@ -5901,28 +10211,100 @@ class SwitchDeviceEvent(QEvent):
         super().__init__(SwitchDeviceEvent.event_type)
         self.device = device
 
-class ProgressManager(QObject):
-    """统一的进度管理器"""
-    progress_updated = pyqtSignal(int, int)  # 当前位置, 总时长
-    
-    def __init__(self, parent=None):
+class PlaybackClock(QObject):
+    """统一的播放时钟。后端 positionChanged 只作为粗粒度的校准点，两次校准之间按经过的时间
+    和播放速率插值；帧定时器按屏幕刷新率发出 tick，暂停、停止或界面被挂起时定时器停止，
+    只在位置或时长变化时补发一次 tick"""
+    tick = pyqtSignal(int, int)  # 当前位置, 总时长
+
+    BACKEND_INTERVAL_MS = 200  # 后端位置通知间隔
+    SEEK_THRESHOLD_MS = 300  # 校准值与插值相差超过此值视为跳转，允许位置回退
+    MAX_EXTRAPOLATION_MS = 1000  # 后端长时间没有通知（缓冲中）时插值的上限
+    DEFAULT_FPS = 60
+
+    def __init__(self, media_player, parent=None):
         super().__init__(parent)
-        self.current_position = 0
-        self.total_duration = 0
-        self.update_timer = QTimer(self)
-        self.update_timer.setInterval(100)  # 100ms更新间隔
-        self.update_timer.timeout.connect(self.emit_progress)
-        self.update_timer.start()
-        
-    def set_position(self, position):
-        self.current_position = position
-        
+        self.media_player = media_player
+        self.anchor_position = 0
+        self.anchor_time = time.monotonic()
+        self.rate = 1.0
+        self.duration = 0
+        self.last_position = -1
+        self.last_duration = -1
+        self.playing = False
+        self.suspended = False
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self._emit)
+        media_player.setNotifyInterval(self.BACKEND_INTERVAL_MS)
+        media_player.positionChanged.connect(self.sync)
+        media_player.durationChanged.connect(self.set_duration)
+        media_player.stateChanged.connect(self.on_state_changed)
+
+    def position(self):
+        """插值后的当前播放位置（毫秒）"""
+        if not self.playing:
+            return self.anchor_position
+        elapsed = (time.monotonic() - self.anchor_time) * 1000 * self.rate
+        position = self.anchor_position + min(elapsed, self.MAX_EXTRAPOLATION_MS)
+        if self.duration > 0:
+            position = min(position, self.duration)
+        return int(position)
+
+    def sync(self, position):
+        """后端报告的位置作为新的校准点"""
+        if abs(position - self.position()) > self.SEEK_THRESHOLD_MS:
+            self.last_position = -1
+        self.anchor_position = position
+        self.anchor_time = time.monotonic()
+        self.rate = self.media_player.playbackRate() or 1.0
+        if not self.frame_timer.isActive():
+            self._emit()
+
     def set_duration(self, duration):
-        self.total_duration = duration
-        
-    def emit_progress(self):
-        if self.total_duration > 0:
-            self.progress_updated.emit(self.current_position, self.total_duration)
+        self.duration = duration
+        if not self.frame_timer.isActive():
+            self._emit()
+
+    def on_state_changed(self, state):
+        self.playing = state == QMediaPlayer.PlayingState
+        self.anchor_position = self.media_player.position()
+        self.anchor_time = time.monotonic()
+        self.last_position = -1
+        self._update_timer()
+        self._emit()
+
+    def set_suspended(self, suspended):
+        """没有界面需要逐帧刷新（如主窗口最小化）时挂起帧定时器"""
+        if suspended == self.suspended:
+            return
+        self.suspended = suspended
+        self._update_timer()
+        if not suspended:
+            self._emit()
+
+    def frame_interval(self):
+        fps = get_settings_store().get_int("playback.clock_fps", 0)
+        if fps <= 0:
+            screen = QApplication.primaryScreen()
+            fps = (screen.refreshRate() if screen else 0) or self.DEFAULT_FPS
+        return max(4, int(1000 / min(fps, 240)))
+
+    def _update_timer(self):
+        running = self.playing and not self.suspended
+        if running and not self.frame_timer.isActive():
+            self.frame_timer.start(self.frame_interval())
+        elif not running and self.frame_timer.isActive():
+            self.frame_timer.stop()
+
+    def _emit(self):
+        # 校准点略慢于插值时不回退，避免歌词和进度条来回抖动
+        position = max(self.position(), self.last_position)
+        if position == self.last_position and self.duration == self.last_duration:
+            return
+        self.last_position = position
+        self.last_duration = self.duration
+        self.tick.emit(position, self.duration)
 
 # =============== 主应用程序 ===============
 class MusicPlayerApp(QMainWindow):
@@ -5932,13 +10314,40 @@ class MusicPlayerApp(QMainWindow):
             self.api = None
             self.current_song = None
             self.current_song_info = None
+            self.lyrics_song_info = None  # 当前 LyricsSync 所显示歌词对应的歌曲信息
             self.search_results = []
             self.settings = load_settings()
-            self.media_player = QMediaPlayer()
-            self.media_player.setNotifyInterval(10)
+            # 其他地方修改设置后同步刷新本地副本，避免用旧副本覆盖新值
+            get_settings_store().settings_changed.connect(self.on_settings_changed)
+            # 专辑封面服务（后台下载并缓存缩略图）
+            self.cover_service = CoverArtService(self)
+            self.cover_waiters = {}
+            self.cover_service.cover_ready.connect(self.on_cover_ready)
+            # 双播放器无缝播放引擎，接口与 QMediaPlayer 一致
+            self.media_player = GaplessPlayer(self)
+            self.media_player.next_media_provider = self.next_gapless_media
+            self.media_player.track_changed.connect(self.on_gapless_track_changed)
+            self.preloaded_play_index = -1
+            # 远程歌曲的音频缓存与预取
+            self.audio_cache = AudioCache()
+            self.prefetcher = TrackPrefetcher(self.audio_cache, self)
+            self.prefetcher.prefetched.connect(self.on_track_prefetched)
+            self.prefetcher.failed.connect(self.on_prefetch_failed)
+            self.random_plan = []
+            self.awaiting_prefetch_url = None
+            self.playing_search_results = False
+            self.stream_url = None
             self.current_song_path = None
             self.log_console = None
-            self.active_threads = []
+            self.task_manager = get_task_manager()
+            self.library = get_media_library()
+            self.library_watcher = LibraryWatcher(self.library, self)
+            # 等待后台提取元数据的播放列表文件
+            self.metadata_requests = set()
+            self.metadata_queue = []
+            self.library_watcher.library_changed.connect(self.on_library_changed)
+            self.search_worker = None
+            self.download_worker = None
             self.tools_menu = None 
             # 初始化用户系统
             self.user_manager = UserManager()
@@ -5953,13 +10362,11 @@ class MusicPlayerApp(QMainWindow):
             self.is_maximized = False 
             # 初始化频谱可视化
             self.spectrum_widget = SpectrumWidget()
-            # 创建统一的进度管理器
-            self.progress_manager = ProgressManager(self)
-            self.progress_manager.progress_updated.connect(self.update_all_progress_bars)
+            # 统一的播放时钟，进度条、歌词、悬浮窗和频谱都跟随它刷新
+            self.playback_clock = PlaybackClock(self.media_player, self)
+            self.playback_clock.tick.connect(self.update_all_progress_bars)
+            self.playback_clock.tick.connect(self.spectrum_widget.on_clock_tick)
             self.main_layout = None
-            # 连接媒体播放器信号
-            self.media_player.positionChanged.connect(self.progress_manager.set_position)
-            self.media_player.durationChanged.connect(self.progress_manager.set_duration)
             # 初始化速度控制
             self.speed_control = SpeedControl(self.media_player)
         
@@ -5984,11 +10391,17 @@ class MusicPlayerApp(QMainWindow):
             self.setup_netease_connections()  # 连接网易云信号
             self.init_ui()
             self.setup_connections()
-            self.media_player.mediaStatusChanged.connect(self.handle_media_status_changed)
             logger.info("应用程序启动")
             self.playlist_file = "playlists.json"
             self.ensure_playlist_exists()
+            self.playlist_store = get_playlist_store(self.playlist_file)
             self.load_playlist_on_startup()
+            # 后台增量更新媒体库索引，完成后开始监视目录变化
+            self.task_manager.submit(
+                lambda token: self.library.scan(cancel_check=token),
+                "library", TaskManager.PRIORITY_BACKGROUND, name="扫描媒体库",
+                on_done=lambda result: self.library_watcher.start()
+            )
             self.results_list.setAutoFillBackground(True)
             self.song_info.setAutoFillBackground(True)
             self.playlist_widget.setAutoFillBackground(True)
@@ -6002,7 +10415,6 @@ class MusicPlayerApp(QMainWindow):
 
             # 添加音乐室服务器
             self.music_room_server = None
-            self.server_thread = None
         
             # 创建外置歌词窗口
             self.external_lyrics = ExternalLyricsWindow(self)
@@ -6012,8 +10424,7 @@ class MusicPlayerApp(QMainWindow):
             self.lyrics_sync = LyricsSync(self.media_player, self.external_lyrics)
         
             # 连接信号
-            self.media_player.positionChanged.connect(self.lyrics_sync.update_position)
-            self.media_player.mediaStatusChanged.connect(self.handle_media_status_changed)
+            self.playback_clock.tick.connect(self.lyrics_sync.update_position)
         
             # 进度条控制
             self.progress_slider.sliderMoved.connect(self.seek_position)
@@ -6060,7 +10471,7 @@ class MusicPlayerApp(QMainWindow):
             self.lyrics_sync.load_lyrics("")
         
             # 初始化播放列表
-            self.playlist_widget.setCurrentRow(-1)
+            self.playlist_widget.setCurrentIndex(QModelIndex())
 
             # 添加远程控制服务器
             self.remote_server = self.RemoteControlServer(self, port=5000)
@@ -6161,13 +10572,6 @@ class MusicPlayerApp(QMainWindow):
         """启动音乐室服务器"""
         if self.music_room_server and self.music_room_server.is_running():
             return
-        async def start_music_room_server(self):
-            self.music_room_server = MusicRoomServer()
-            await websockets.serve(
-                self.music_room_server.handle_connection,
-                "0.0.0.0",
-                self.music_room_server.port
-            )
         try:
             self.server_status_label.setText("音乐室服务器: 启动中...")
             QApplication.processEvents()
@@ -6175,19 +10579,13 @@ class MusicPlayerApp(QMainWindow):
             # 创建服务器对象
             self.music_room_server = MusicRoomServer()
             
-            # 在独立线程中运行服务器
-            self.server_thread = QThread()
-            self.music_room_server.moveToThread(self.server_thread)
-            self.server_thread.started.connect(self.music_room_server.run)
-            
             # 连接服务器信号
             self.music_room_server.started.connect(self.on_server_started)
             self.music_room_server.stopped.connect(self.on_server_stopped)
             self.music_room_server.error_occurred.connect(self.on_server_error)
             
-            # 启动线程
-            self.server_thread.start()
-
+            # 服务器运行在全局异步运行时中
+            self.music_room_server.start()
             
         except Exception as e:
             self.server_status_label.setText(f"音乐室服务器: 启动失败 - {str(e)}")
@@ -6198,14 +10596,6 @@ class MusicPlayerApp(QMainWindow):
         if self.music_room_server:
             self.music_room_server.stop()
             self.server_status_label.setText("音乐室服务器: 停止中...")
-            QApplication.processEvents()
-
-            # 等待服务器线程结束
-            if self.server_thread and self.server_thread.isRunning():
-                self.server_thread.quit()
-                if not self.server_thread.wait(3000):  # 等待3秒
-                    self.server_thread.terminate()
-                    self.server_thread.wait()
 
     def on_server_started(self, port):
         """服务器启动成功回调"""
@@ -6217,13 +10607,6 @@ class MusicPlayerApp(QMainWindow):
         """服务器停止回调"""
         self.server_status_label.setText("音乐室服务器: 已停止")
         logger.info("音乐室服务器已停止")
-        
-        # 清理线程
-        if self.server_thread and self.server_thread.isRunning():
-            self.server_thread.quit()
-            self.server_thread.wait()
-            self.server_thread = None
-            
         self.music_room_server = None
 
     def on_server_error(self, error):
@@ -6252,33 +10635,104 @@ class MusicPlayerApp(QMainWindow):
                 logger.error(f"创建播放列表文件失败: {str(e)}")
                 QMessageBox.critical(self, "错误", f"无法创建播放列表文件:\n{str(e)}")
     
+    def on_library_changed(self, changed, removed):
+        """媒体库变化后就地更新播放列表：被移动的文件改写路径，被删除的文件移出列表"""
+        added_by_hash = {track["content_hash"]: track["path"] for track in changed if track["content_hash"]}
+        moved = {}
+        for track in removed:
+            new_path = added_by_hash.get(track["content_hash"])
+            if new_path and new_path != track["path"]:
+                moved[track["path"]] = new_path
+        deleted = {track["path"] for track in removed} - set(moved)
+        modified = False
+        for old_path, new_path in moved.items():
+            row = self.playlist_model.row_of(old_path)
+            if row < 0:
+                continue
+            if self.playlist_model.set_path(row, new_path):
+                self.playlist_store.update("default", old_path, {"name": self.playlist_model.name_at(row), "path": new_path})
+                if old_path == self.current_song_path:
+                    self.current_song_path = new_path
+            else:
+                # 移动到的位置已在播放列表中，只保留一条
+                deleted.add(old_path)
+            modified = True
+        removed_paths = []
+        for song_path in deleted:
+            row = self.playlist_model.row_of(song_path)
+            if row < 0:
+                continue
+            self.playlist_model.remove_row(row)
+            removed_paths.append(song_path)
+            if row < self.current_play_index:
+                self.current_play_index -= 1
+            elif row == self.current_play_index:
+                self.current_play_index = -1
+            modified = True
+        if modified:
+            self.media_player.clear_preload()
+            self.playlist_store.remove("default", removed_paths)
+            logger.info(f"播放列表已同步媒体库变化: 移动 {len(moved)} 首，删除 {len(deleted)} 首")
+
+    def request_track_metadata(self, paths):
+        """把未索引的文件（如音乐目录之外的文件）排入后台元数据提取，
+        同一轮事件循环中的请求合并为一个任务；使用单独的 metadata 类型，不排在媒体库全量扫描之后"""
+        paths = [path for path in paths if path and path not in self.metadata_requests]
+        if not paths:
+            return
+        if not self.metadata_queue:
+            QTimer.singleShot(0, self.flush_track_metadata)
+        self.metadata_requests.update(paths)
+        self.metadata_queue.extend(paths)
+
+    def flush_track_metadata(self):
+        paths, self.metadata_queue = self.metadata_queue, []
+        if not paths:
+            return
+
+        def on_done(tracks):
+            self.metadata_requests.difference_update(paths)
+            self.on_track_metadata_ready(tracks)
+
+        self.task_manager.submit(
+            lambda token: self.library.index_files(paths, cancel_check=token),
+            "metadata", TaskManager.PRIORITY_USER, name=f"读取元数据（{len(paths)} 首）",
+            on_done=on_done, on_error=lambda error: self.metadata_requests.difference_update(paths)
+        )
+
+    def on_track_metadata_ready(self, tracks):
+        """元数据到达后，把仍以文件名显示的播放列表项改为“标题 - 艺术家”"""
+        for track in tracks:
+            row = self.playlist_model.row_of(track["path"])
+            name = track_display_name(track)
+            if row >= 0 and name and self.playlist_model.name_at(row) == os.path.splitext(track["name"])[0]:
+                self.playlist_model.set_name(row, name)
+                self.playlist_store.update("default", track["path"], {"name": name, "path": track["path"]})
+
     def load_playlist_on_startup(self):
         """启动时加载播放列表"""
         if os.path.exists(self.playlist_file):
             try:
-                with open(self.playlist_file, 'r', encoding='utf-8') as f:
-                    playlists = json.load(f)
-                
-                # 加载默认播放列表
-                default_playlist = playlists.get("default", [])
-                self.playlist_widget.clear()
+                # 加载默认播放列表（快照 + 日志重放）
+                default_playlist = [
+                    song if isinstance(song, dict) else {"path": song}
+                    for song in self.playlist_store.get("default")
+                ]
+                # 媒体库中已索引的文件无需逐个访问磁盘
+                indexed = self.library.known_paths(song_info.get("path", "") for song_info in default_playlist)
                 
+                songs = []
                 for song_info in default_playlist:
                     song_path = song_info.get("path", "")
-                    song_name = song_info.get("name", os.path.basename(song_path))
-                    
-                    if os.path.exists(song_path):
-                        item = QListWidgetItem(song_name)
-                        item.setData(Qt.UserRole, song_path)
-                        self.playlist_widget.addItem(item)
-                        try:
-                            logger.info(f"加载到播放列表: {song_name}")
-                        except UnicodeEncodeError:
-                            logger.info("加载到播放列表: [包含非ASCII字符的歌曲名称]")
+                    if song_path in indexed or os.path.exists(song_path):
+                        songs.append({"path": song_path, "name": song_info.get("name", os.path.basename(song_path))})
                     else:
                         logger.warning(f"文件不存在，跳过加载: {song_path}")
+                self.playlist_model.reset(songs)
                 
-                self.status_bar.showMessage(f"已加载 {self.playlist_widget.count()} 首歌曲")
+                # 不在索引中的文件后台补读元数据
+                self.request_track_metadata(song["path"] for song in songs if song["path"] not in indexed)
+                self.status_bar.showMessage(f"已加载 {self.playlist_model.rowCount()} 首歌曲")
                 logger.info(f"成功加载播放列表: {self.playlist_file}")
                 
             except Exception as e:
@@ -6293,8 +10747,7 @@ class MusicPlayerApp(QMainWindow):
 
     def update_lyrics_visibility(self):
         """根据设置更新歌词窗口的显示状态"""
-        settings = load_settings()
-        lyrics_settings = settings.get("lyrics", {})
+        lyrics_settings = get_settings_store().get("lyrics", {})
         show_lyrics = lyrics_settings.get("show_lyrics", True)
         # 获取样式设置
         font_str = lyrics_settings.get("font", "Microsoft YaHei,36")
@@ -6316,33 +10769,29 @@ class MusicPlayerApp(QMainWindow):
     
         # 设置歌词同步状态
         self.lyrics_sync.enabled = show_lyrics
+        self.update_clock_activity()
     
     def update_all_progress_bars(self, position, duration):
         """统一更新所有进度显示"""
         try:
-            # 更新主窗口进度条
+            # 更新主窗口进度条（拖动中不抢进度条）
             if duration > 0:
-                progress = int(1000 * position / duration)
-                self.progress_slider.blockSignals(True)
-                self.progress_slider.setValue(progress)
-                self.progress_slider.blockSignals(False)
+                if not self.progress_slider.isSliderDown():
+                    self.progress_slider.blockSignals(True)
+                    self.progress_slider.setValue(int(1000 * position / duration))
+                    self.progress_slider.blockSignals(False)
                 
-                # 更新时间显示
-                self.current_time_label.setText(self.format_time(position))
-                self.total_time_label.setText(self.format_time(duration))
+                # 更新时间显示（文字变化时才重新布局）
+                current_text = self.format_time(position)
+                if current_text != self.current_time_label.text():
+                    self.current_time_label.setText(current_text)
+                total_text = self.format_time(duration)
+                if total_text != self.total_time_label.text():
+                    self.total_time_label.setText(total_text)
             
             # 更新悬浮窗进度条
-            if hasattr(self, 'float_window') and self.float_window:
-                # 检查方法签名
-                import inspect
-                sig = inspect.signature(self.float_window.update_progress)
-                if len(sig.parameters) == 2:  # 包括self
-                    self.float_window.update_progress(position, duration)
-                else:
-                    # 回退到单参数调用
-                    if duration > 0:
-                        progress = int(1000 * position / duration)
-                        self.float_window.update_progress(progress)
+            if self.float_window:
+                self.float_window.update_progress(position, duration)
         except Exception as e:
             logger.error(f"更新进度条时出错: {str(e)}")
 
@@ -6395,9 +10844,7 @@ class MusicPlayerApp(QMainWindow):
 
     def update_lyrics_button_state(self):
         """根据歌词显示状态更新按钮"""
-        settings = load_settings()
-        lyrics_settings = settings.get("lyrics", {})
-        show_lyrics = lyrics_settings.get("show_lyrics", True)
+        show_lyrics = get_settings_store().get_bool("lyrics.show_lyrics", True)
     
         # 更新按钮状态和文本
         self.lyrics_button.setChecked(show_lyrics)
@@ -6452,14 +10899,16 @@ class MusicPlayerApp(QMainWindow):
                 with open(lyric_file, 'r', encoding='utf-8') as f:
                     lyrics = f.read()
                     self.lyrics_sync.load_lyrics(lyrics)
+                # 手动选择的歌词登记到歌词库，覆盖这首歌原有的歌词
+                if audio_files:
+                    get_lyrics_store().put_for_file(audio_files[0], lyrics, source="file")
             except Exception as e:
                 logger.error(f"加载歌词失败: {str(e)}")
                 QMessageBox.warning(self, "歌词错误", f"无法加载歌词文件:\n{str(e)}")
     
         # 处理音频文件
         if audio_files:
-            for file_path in audio_files:
-                self.add_to_playlist(file_path)
+            self.add_many(audio_files)
             # 播放第一个音频文件
             first_audio = audio_files[0]
             try:
@@ -6489,10 +10938,6 @@ class MusicPlayerApp(QMainWindow):
             except Exception as e:
                 logger.error(f"播放文件失败: {str(e)}")
                 QMessageBox.critical(self, "播放错误", f"无法播放文件:\n{str(e)}")
-        
-            # 将其余文件添加到播放列表
-            for path in audio_files[1:]:
-                self.add_to_playlist(path)
 
 
     def load_lyrics_for_song(self, song_path):
@@ -6504,6 +10949,7 @@ class MusicPlayerApp(QMainWindow):
                 'name': os.path.basename(song_path),
                 'lrc': ''
             }
+        self.lyrics_song_info = self.current_song_info
     
         # 检查歌词窗口是否仍然存在
         if not hasattr(self, 'external_lyrics') or not self.external_lyrics:
@@ -6513,10 +10959,12 @@ class MusicPlayerApp(QMainWindow):
         settings = load_settings()
         lyrics_settings = settings.get("lyrics", {})
 
-        # 首先尝试用户指定的歌词文件
-        lyrics_text = ""
+        # 首先从歌词库、同名歌词文件或歌曲自带的歌词加载
         if self.check_and_load_local_lyrics(song_path):
-            return            
+            return
+
+        # 其次尝试用户指定的歌词文件
+        lyrics_text = ""
         if lyrics_settings.get("lyrics_path") and os.path.exists(lyrics_settings["lyrics_path"]):
             try:
                 with open(lyrics_settings["lyrics_path"], 'r', encoding='utf-8') as f:
@@ -6524,32 +10972,6 @@ class MusicPlayerApp(QMainWindow):
                 logger.info(f"从用户指定文件加载歌词: {lyrics_settings['lyrics_path']}")
             except Exception as e:
                 logger.error(f"加载用户指定歌词失败: {str(e)}")
-        else:
-            # 其次尝试同目录下的.lrc文件
-            lrc_path = os.path.splitext(song_path)[0] + '.lrc'
-            if os.path.exists(lrc_path):
-                try:
-                    with open(lrc_path, 'r', encoding='utf-8') as f:
-                        lyrics_text = f.read()
-                    logger.info(f"从本地文件加载歌词: {lrc_path}")
-                except Exception as e:
-                    logger.error(f"加载歌词文件失败: {lrc_path} - {str(e)}")
-    
-        # 如果没有本地歌词文件，尝试从网络获取（如果有的话）
-        if not lyrics_text and hasattr(self, 'current_song_info'):
-            lyrics_text = self.current_song_info.get('lrc', '')
-            if lyrics_text:
-                logger.info("从网络获取歌词内容")
-            
-                # 如果设置了自动保存歌词，保存到本地
-                if lyrics_settings.get("auto_save", True):
-                    lrc_path = os.path.splitext(song_path)[0] + '.lrc'
-                    try:
-                        with open(lrc_path, 'w', encoding='utf-8') as f:
-                            f.write(lyrics_text)
-                        logger.info(f"歌词已保存到: {lrc_path}")
-                    except Exception as e:
-                        logger.error(f"保存歌词文件失败: {str(e)}")
     
         # 加载歌词
         self.lyrics_sync.load_lyrics(lyrics_text)
@@ -6559,22 +10981,38 @@ class MusicPlayerApp(QMainWindow):
             self.external_lyrics.update_lyrics("", "")
 
     def load_lyrics_from_network(self, song_info=None):
-        """尝试从网络加载歌词"""
+        """在后台从网易云加载歌词（优先使用逐字歌词）"""
         if not song_info and self.current_song_info:
             song_info = self.current_song_info
-    
-        if song_info and 'id' in song_info:
-            try:
-                # 使用网易云API获取歌词
-                api = NetEaseMusicAPI()
-                lyrics = api.fetch_lyrics(song_info['id'])
-                if lyrics and "歌词未找到" not in lyrics:
-                    self.lyrics_sync.load_lyrics(lyrics)
-                    self.external_lyrics.update_lyrics("网络歌词已加载")
-                    return True
-            except Exception as e:
-                logger.error(f"从网络加载歌词失败: {str(e)}")
-        return False
+        if not song_info or 'id' not in song_info:
+            return False
+        song_id = song_info['id']
+        self.task_manager.submit(
+            lambda token: NetEaseMusicAPI().fetch_lyrics(song_id, with_translation=True),
+            "search", TaskManager.PRIORITY_USER, name=f"获取歌词: {song_info.get('name', song_id)}",
+            on_done=lambda result: self.on_network_lyrics_ready(song_info, result),
+            on_error=lambda error: logger.error(f"从网络加载歌词失败: {str(error)}")
+        )
+        return True
+
+    def on_network_lyrics_ready(self, song_info, result):
+        # fetch_lyrics 失败时返回提示字符串
+        if not isinstance(result, tuple):
+            return
+        lyrics, translation = result
+        if lyrics:
+            # 下载后播放时 check_and_load_local_lyrics 直接使用这份歌词
+            song_info['lrc'] = lyrics
+            song_info['translation'] = translation
+            # 缓存到歌词库，同一首歌的其他副本不再请求网络
+            # （按标题 + 艺术家 + 时长；下载后播放时再按内容指纹登记）
+            get_lyrics_store().put(lyrics, translation, title=song_info.get('name', ''),
+                                   artists=song_info.get('artists', ''), duration=song_info.get('duration', 0),
+                                   source="netease")
+            # 只有这首歌已经在播放且还没有歌词时才更新显示，选中未播放的歌曲只做缓存
+            if song_info is self.lyrics_song_info and not self.lyrics_sync.timeline:
+                self.lyrics_sync.load_lyrics(lyrics, translation)
+                self.external_lyrics.update_lyrics("网络歌词已加载")
     
     def seek_position(self, value):
         """跳转到指定播放位置"""
@@ -6600,22 +11038,9 @@ class MusicPlayerApp(QMainWindow):
                 })
             
             # 遍历目录内容
-            for entry in os.listdir(path):
-                full_path = os.path.join(path, entry)
-                if os.path.isdir(full_path):
-                    items.append({
-                        "name": entry,
-                        "path": full_path,
-                        "type": "directory",
-                        "icon": "fas fa-folder"
-                    })
-                elif entry.lower().endswith(('.mp3', '.wav', '.flac', '.m4a')):
-                    items.append({
-                        "name": entry,
-                        "path": full_path,
-                        "type": "file",
-                        "icon": "fas fa-file-audio"
-                    })
+            for entry in self.list_directory(path):
+                entry["icon"] = "fas fa-folder" if entry["type"] == "directory" else "fas fa-file-audio"
+                items.append(entry)
             
             return {
                 "current_path": path,
@@ -6628,22 +11053,17 @@ class MusicPlayerApp(QMainWindow):
     def get_playlist_content(self):
         """获取当前播放列表内容"""
         playlist = []
-        for i in range(self.playlist_widget.count()):
-            item = self.playlist_widget.item(i)
-            file_path = item.data(Qt.UserRole)
-            
-            # 尝试获取歌曲元数据
-            try:
-                media = QMediaContent(QUrl.fromLocalFile(file_path))
-                metadata = self.media_player.metaData(media)
-                
-                title = metadata.get(QMediaMetaData.Title, os.path.basename(file_path))
-                artist = metadata.get(QMediaMetaData.AlbumArtist, "未知艺术家")
-                duration = metadata.get(QMediaMetaData.Duration, 0)
-            except:
-                title = os.path.splitext(os.path.basename(file_path))[0]
-                artist = "未知艺术家"
-                duration = 0
+        for i, song in enumerate(self.playlist_model.songs):
+            file_path = song["path"]
+            
+            # 歌曲元数据取自媒体库索引，未索引的文件排入后台提取
+            track = self.library.get_track(file_path)
+            if track is None:
+                self.request_track_metadata([file_path])
+                track = {}
+            title = track.get("title") or os.path.splitext(os.path.basename(file_path))[0]
+            artist = track.get("artist") or "未知艺术家"
+            duration = track.get("duration", 0)
                 
             playlist.append({
                 "index": i + 1,
@@ -7002,7 +11422,8 @@ class MusicPlayerApp(QMainWindow):
         
             # 音源设置
             active_source = self.source_combo.currentText()
-            self.settings["sources"]["active_source"] = active_source
+            if active_source != FEDERATED_SOURCE_NAME:
+                self.settings["sources"]["active_source"] = active_source
                 
             # 更新API密钥
             for source in self.settings["sources"]["sources_list"]:
@@ -7111,7 +11532,7 @@ class MusicPlayerApp(QMainWindow):
         if config["name"] == "公共音乐API":
             test_url = "https://api.railgun.live/music/search?keyword=test&source=kugou&page=1&limit=1"
             try:
-                response = requests.get(test_url, timeout=5)
+                response = get_http_pool().get(test_url, timeout=5, retries=0)
                 if response.status_code == 200:
                     data = response.json()
                     if data.get("code") == 200 and data.get("data"):
@@ -7125,7 +11546,7 @@ class MusicPlayerApp(QMainWindow):
         else:
             # 其他音源的测试逻辑
             try:
-                response = requests.get(url, timeout=5)
+                response = get_http_pool().get(url, source=config, timeout=5, retries=0)
                 if response.status_code == 200:
                     QMessageBox.information(self, "测试成功", f"API连接正常: {url}")
                 else:
@@ -7443,7 +11864,7 @@ class MusicPlayerApp(QMainWindow):
                     border-radius: 4px;
                 }}
         
-                QListWidget#playlistWidget {{
+                QListView#playlistWidget {{
                     background-color: rgba(45, 45, 48, 150);
                     color: #e0e0e0;
                     border: 1px solid rgba(63, 63, 70, 100);
@@ -7461,9 +11882,7 @@ class MusicPlayerApp(QMainWindow):
 
     def update_lyrics_visibility(self):
         """根据设置更新歌词窗口的显示状态"""
-        settings = load_settings()
-        lyrics_settings = settings.get("lyrics", {})
-        show_lyrics = lyrics_settings.get("show_lyrics", True)
+        show_lyrics = get_settings_store().get_bool("lyrics.show_lyrics", True)
     
         if show_lyrics:
             self.external_lyrics.show()
@@ -7472,6 +11891,7 @@ class MusicPlayerApp(QMainWindow):
     
         # 设置歌词同步状态
         self.lyrics_sync.enabled = show_lyrics
+        self.update_clock_activity()
 
     def update_lyrics_style(self):
         """更新歌词窗口样式"""
@@ -7562,7 +11982,7 @@ class MusicPlayerApp(QMainWindow):
                 border: 1px solid solid rgba(63, 63, 70, 100);  /* 边框半透明 */
                 border-radius: 4px;
             }
-            QListWidget#playlistWidget {
+            QListView#playlistWidget {
                 background-color: rgba(45, 45, 48, 150);  /* 添加透明度 */
                 color: #e0e0e0;
                 border: 1px solid rgba(63, 63, 70, 100);  /* 边框半透明 */
@@ -7759,6 +12179,7 @@ class MusicPlayerApp(QMainWindow):
             # 如果找不到函数，从全局作用域获取
             import __main__
             self.source_combo.addItems(__main__.get_source_names())
+        self.source_combo.addItem(FEDERATED_SOURCE_NAME)
         self.source_combo.setCurrentText(self.settings["sources"]["active_source"])
         self.source_combo.setFixedWidth(120)
         search_button = QPushButton("搜索")
@@ -7879,6 +12300,10 @@ class MusicPlayerApp(QMainWindow):
         log_action.triggered.connect(self.open_log_console)
         self.more_menu.addAction(log_action)
 
+        task_action = QAction("任务监视器", self)
+        task_action.triggered.connect(self.open_task_monitor)
+        self.more_menu.addAction(task_action)
+
         app_dir_action = QAction("打开程序目录", self)
         app_dir_action.triggered.connect(self.open_app_directory)
         self.more_menu.addAction(app_dir_action)
@@ -8059,10 +12484,15 @@ class MusicPlayerApp(QMainWindow):
         playlist_controls.addWidget(save_button)
 
         # 播放列表内容
-        self.playlist_widget = QListWidget()
+        self.playlist_model = PlaylistModel(self.cover_service, self.library, self)
+        self.playlist_widget = PlaylistView()
         self.playlist_widget.setObjectName("playlistWidget")
         self.playlist_widget.setAlternatingRowColors(True)
         self.playlist_widget.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        # 行高一致时视图不必逐行测量尺寸，上万首也能快速布局和滚动
+        self.playlist_widget.setUniformItemSizes(True)
+        self.playlist_widget.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.playlist_widget.setModel(self.playlist_model)
 
         playlist_layout.addLayout(playlist_controls)
         playlist_layout.addWidget(self.playlist_widget)
@@ -8260,7 +12690,8 @@ class MusicPlayerApp(QMainWindow):
         clear_button.clicked.connect(self.clear_playlist)
         save_button.clicked.connect(self.save_playlist)
         self.results_list.itemClicked.connect(self.song_selected)
-        self.playlist_widget.itemDoubleClicked.connect(self.play_playlist_item)
+        self.playlist_widget.doubleClicked.connect(self.play_playlist_item)
+        self.playlist_widget.files_dropped.connect(self.on_playlist_files_dropped)
         self.set_background()
 
     def toggle_sync_server(self):
@@ -8475,6 +12906,7 @@ class MusicPlayerApp(QMainWindow):
             self.float_window.close()
             self.float_window = None
             self.float_button.setText("悬浮窗")
+        self.update_clock_activity()
         
     def open_playlist_manager(self):
         """打开播放列表管理对话框"""
@@ -8805,9 +13237,7 @@ class MusicPlayerApp(QMainWindow):
 
         if dialog.exec_() == QDialog.Accepted:
             self.settings = load_settings()
-            self.source_combo.clear()
-            self.source_combo.addItems(get_source_names())
-            self.source_combo.setCurrentText(self.settings["sources"]["active_source"])
+            self.refresh_source_combo()
             self.set_background()
             self.create_necessary_dirs()
             QMessageBox.information(self, "设置", "设置已保存！")
@@ -8907,139 +13337,46 @@ class MusicPlayerApp(QMainWindow):
     
     def load_user_settings(self):
         """加载用户设置"""
-        if not self.current_user_id:
-            return
-            
-        settings = self.user_manager.get_user_settings(self.current_user_id)
-        if settings:
-            last_played, volume = settings
-            if volume is not None:
-                self.media_player.setVolume(volume)
-            
-            # 加载最后播放的歌曲
-            if last_played and os.path.exists(last_played):
-                if last_played.endswith(('.mp4', '.avi', '.mov')):
-                    self.play_video(last_played)
-                else:
-                    self.play_audio(last_played)
-    
-    def save_user_settings(self):
-        """保存用户设置"""
-        if not self.current_user_id:
-            return
-            
-        self.user_manager.save_user_settings(
-            self.current_user_id,
-            last_played=self.current_file_path,
-            volume=self.media_player.volume()
-        )
-    
-    def closeEvent(self, event):
-        """关闭应用程序时保存设置"""
-        self.save_user_settings()
-        
-        # 停止同步服务器和客户端
-        if self.sync_server.running:
-            self.sync_server.stop()
-        if self.sync_client.running:
-            self.sync_client.disconnect()
-        if self.float_window:
-            self.float_window.close()
-        super().closeEvent(event)
-
-    def toggle_lyrics_window(self):
-        """切换歌词窗口的显示状态"""
-        settings = load_settings()
-        lyrics_settings = settings.get("lyrics", {})
-    
-        # 切换显示状态
-        current_state = lyrics_settings.get("show_lyrics", True)
-        lyrics_settings["show_lyrics"] = not current_state
-    
-        # 保存设置
-        settings["lyrics"] = lyrics_settings
-        save_settings(settings)
-    
-        # 更新歌词窗口
-        self.update_lyrics_visibility()
-
-        # 更新按钮状态
-        self.update_lyrics_button_state()
-    
-        # 更新状态栏消息
-        new_state = "显示" if lyrics_settings["show_lyrics"] else "隐藏"
-        self.status_bar.showMessage(f"歌词窗口已{new_state}")
-
-    def download_current_song(self):
-        if self.source_combo.currentText() == "网易云音乐" and self.current_song_info:
-            # 使用网易云API下载
-            file_path = ...  # 文件路径选择逻辑
-            self.api = NetEaseMusicAPI()
-            self.api.download_song(self.current_song_info['audio_url'], file_path)
-        else:
-            # 原有下载逻辑
-            pass
-        if not self.current_song_info or 'url' not in self.current_song_info:
-            self.status_bar.showMessage("没有可下载的歌曲")
-            logger.warning("下载请求: 没有可下载的歌曲")
-            return
-        
-        # 创建lrc目录
-        lrc_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lrc")
-        if not os.path.exists(lrc_dir):
-            os.makedirs(lrc_dir, exist_ok=True)
-            logger.info(f"创建歌词目录: {lrc_dir}")
-    
-        # 获取歌曲信息
-        song_name = self.current_song_info.get('name', '未知歌曲')
-        safe_song_name = re.sub(r'[\\/*?:"<>|]', "", song_name)
-        default_name = f"{safe_song_name}.mp3"
-    
-        # 获取歌词URL
-        lrc_url = self.current_song_info.get('lrc_url', '')
-    
-        # 保存文件对话框
-        settings = load_settings()
-        music_dir = settings["save_paths"]["music"]
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, 
-            "保存歌曲", 
-            os.path.join(music_dir, default_name), 
-            "MP3文件 (*.mp3)"
-        )
-        if not file_path:
-            logger.info("下载取消: 用户未选择保存路径")
-            return
-        
-        # 生成歌词文件路径
-        base_path = os.path.splitext(file_path)[0]
-        lrc_path = os.path.join(lrc_dir, f"{safe_song_name}.lrc")
-    
-        logger.info(f"开始下载歌曲到: {file_path}")
-        self.progress_dialog = QProgressDialog("下载歌曲...", "取消", 0, 100, self)
-        self.progress_dialog.setWindowTitle("下载进度")
-        self.progress_dialog.setWindowModality(Qt.WindowModal)
-        self.progress_dialog.setAutoClose(True)
-        self.progress_dialog.setAutoReset(True)
-        self.progress_dialog.canceled.connect(self.cancel_download)
-        self.progress_dialog.show()
-    
-        # 创建下载线程
-        self.download_worker = MusicWorker()
-        self.download_worker.current_song_info = self.current_song_info
-        self.active_threads.append(self.download_worker)
-        self.download_worker.download_progress.connect(self.update_download_progress)
-        self.download_worker.download_finished.connect(self.download_completed)
-        self.download_worker.error_occurred.connect(self.display_error)
-        self.download_worker.finished.connect(self.remove_download_worker)
+        if not self.current_user_id:
+            return
+            
+        settings = self.user_manager.get_user_settings(self.current_user_id)
+        if settings:
+            last_played, volume = settings
+            if volume is not None:
+                self.media_player.setVolume(volume)
+            
+            # 加载最后播放的歌曲
+            if last_played and os.path.exists(last_played):
+                if last_played.endswith(('.mp4', '.avi', '.mov')):
+                    self.play_video(last_played)
+                else:
+                    self.play_audio(last_played)
     
-        # 设置歌词下载路径
-        self.download_worker.lrc_path = lrc_path
-        self.download_worker.lrc_url = lrc_url
+    def save_user_settings(self):
+        """保存用户设置"""
+        if not self.current_user_id:
+            return
+            
+        self.user_manager.save_user_settings(
+            self.current_user_id,
+            last_played=self.current_file_path,
+            volume=self.media_player.volume()
+        )
     
-       # 开始下载
-        self.download_worker.download_song(self.current_song_info['url'], file_path)
+    def closeEvent(self, event):
+        """关闭应用程序时保存设置"""
+        self.save_user_settings()
         
+        # 停止同步服务器和客户端
+        if self.sync_server.running:
+            self.sync_server.stop()
+        if self.sync_client.running:
+            self.sync_client.disconnect()
+        if self.float_window:
+            self.float_window.close()
+        super().closeEvent(event)
+
     def progress_pressed(self):
         self.was_playing = self.media_player.state() == QMediaPlayer.PlayingState
         if self.was_playing:
@@ -9066,12 +13403,13 @@ class MusicPlayerApp(QMainWindow):
         self.source_combo.clear()
     
         # 从设置中获取最新音源列表
-        settings = load_settings()
-        source_names = [source["name"] for source in settings["sources"]["sources_list"]]
+        store = get_settings_store()
+        source_names = store.source_names()
         self.source_combo.addItems(source_names)
+        self.source_combo.addItem(FEDERATED_SOURCE_NAME)
     
         # 设置当前选择的音源
-        current_source = settings["sources"]["active_source"]
+        current_source = store.active_source_name()
         if current_source in source_names:
             self.source_combo.setCurrentText(current_source)
         elif source_names:
@@ -9086,89 +13424,66 @@ class MusicPlayerApp(QMainWindow):
 
     def add_to_playlist(self, song_path, song_info=None):
         """添加歌曲到播放列表"""
-        if not os.path.exists(song_path):
-            logger.warning(f"无法添加到播放列表，文件不存在: {song_path}")
-            return
-            
-        # 检查是否已在播放列表中
-        for i in range(self.playlist_widget.count()):
-            item = self.playlist_widget.item(i)
-            if item.data(Qt.UserRole) == song_path:
-                logger.info(f"歌曲已在播放列表中: {song_path}")
-                return
-                
-        if song_info is None:
-            # 从文件路径解析歌曲信息
-            filename = os.path.basename(song_path)
-            song_name = os.path.splitext(filename)[0]
-            song_info = {"name": song_name, "artists": "未知艺术家"}
+        if self.playlist_model.contains(song_path):
+            logger.info(f"歌曲已在播放列表中: {song_path}")
+            return False
+        return self.add_many([song_path], [song_info]) == 1
+
+    def add_many(self, paths, infos=None):
+        """批量添加歌曲：一次查重、一次插入模型、一次写入存储，元数据和封面在后台补齐。
+        infos 与 paths 一一对应（元素可为 None），返回实际添加的条数"""
+        paths = list(paths)
+        infos = list(infos) if infos is not None else [None] * len(paths)
+        # 媒体库中已索引的文件直接取标签，无需逐个访问磁盘
+        tracks = self.library.get_tracks(paths)
+        songs, unindexed, seen = [], [], set()
+        for song_path, song_info in zip(paths, infos):
+            if not song_path or song_path in seen or self.playlist_model.contains(song_path):
+                continue
+            seen.add(song_path)
+            track = tracks.get(song_path)
+            if track is None and not os.path.exists(song_path):
+                logger.warning(f"无法添加到播放列表，文件不存在: {song_path}")
+                continue
+            if song_info and "artists" in song_info:
+                song_name = f"{song_info.get('name', '未知歌曲')} - {song_info.get('artists', '未知艺术家')}"
+            elif song_info and song_info.get("name"):
+                song_name = song_info["name"]
+            else:
+                # 未索引的文件先显示文件名，后台读取元数据后再更新
+                song_name = track_display_name(track) or os.path.splitext(os.path.basename(song_path))[0]
+                if track is None:
+                    unindexed.append(song_path)
+            # 专辑封面在列表绘制到该行时由封面服务加载
+            songs.append({"path": song_path, "name": song_name, "pic": (song_info or {}).get("pic")})
+        if not songs:
+            return 0
+        self.playlist_model.extend(songs)
+        self.playlist_store.add("default", [{"name": song["name"], "path": song["path"]} for song in songs])
+        self.request_track_metadata(unindexed)
+        if len(songs) == 1:
+            logger.info(f"已添加到播放列表: {songs[0]['name']}")
         else:
-            song_name = f"{song_info.get('name', '未知歌曲')} - {song_info.get('artists', '未知艺术家')}"
-        
-        item = QListWidgetItem(song_name)
-        item.setData(Qt.UserRole, song_path)
-        
-        # 尝试加载专辑封面
-        if song_info and song_info.get("pic"):
-            cache_dir = self.settings["save_paths"]["cache"]
-            pic_url = song_info["pic"]
-            try:
-                songid = song_info.get("id", f"song_{hashlib.md5(song_path.encode()).hexdigest()}")
-                safe_songid = re.sub(r'[\\/*?:"<>|]', "", songid)
-                image_path = os.path.join(cache_dir, f"{safe_songid}.jpg")
-                
-                if not os.path.exists(image_path):
-                    logger.info(f"下载专辑封面: {pic_url}")
-                    response = requests.get(pic_url, stream=True, timeout=10)
-                    if response.status_code == 200:
-                        with open(image_path, 'wb') as f:
-                            for chunk in response.iter_content(1024):
-                                f.write(chunk)
-                        logger.info(f"封面保存到: {image_path}")
-                    else:
-                        logger.warning(f"封面下载失败: HTTP {response.status_code}")
-                
-                if os.path.exists(image_path) and os.path.getsize(image_path) > 0:
-                    pixmap = QPixmap(image_path)
-                    if not pixmap.isNull():
-                        pixmap = pixmap.scaled(40, 40, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        item.setIcon(QIcon(pixmap))
-            except Exception as e:
-                logger.error(f"加载专辑封面失败: {str(e)}")
-        
-        self.playlist_widget.addItem(item)
-        logger.info(f"已添加到播放列表: {song_name}")
-        self.save_playlist_to_json()
+            logger.info(f"已添加 {len(songs)} 首歌曲到播放列表")
+        return len(songs)
+
+    def on_playlist_files_dropped(self, paths):
+        """拖入文件或文件夹时批量添加"""
+        added = self.add_many(expand_audio_paths(paths))
+        self.status_bar.showMessage(f"已添加 {added} 首歌曲到播放列表")
 
     def save_playlist_to_json(self):
-        """保存播放列表到JSON文件"""
-        try:
-            playlist_data = {"default": []}
-            
-            # 收集当前播放列表中的所有歌曲
-            for i in range(self.playlist_widget.count()):
-                item = self.playlist_widget.item(i)
-                song_path = item.data(Qt.UserRole)
-                song_name = item.text()
-                playlist_data["default"].append({
-                    "name": song_name,
-                    "path": song_path
-                })
-            
-            # 保存到文件
-            with open(self.playlist_file, 'w', encoding='utf-8') as f:
-                json.dump(playlist_data, f, ensure_ascii=False, indent=4)
-                
-            logger.info(f"播放列表已保存到: {self.playlist_file}")
-            return True
-        except Exception as e:
-            logger.error(f"保存播放列表失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"保存播放列表失败:\n{str(e)}")
+        """把当前播放列表整体写入存储（单条增删改由存储日志记录，无需调用）"""
+        songs = [{"name": song["name"], "path": song["path"]} for song in self.playlist_model.songs]
+        if not self.playlist_store.set("default", songs):
+            QMessageBox.critical(self, "错误", f"保存播放列表失败:\n{self.playlist_file}")
             return False
+        logger.info(f"播放列表已保存到: {self.playlist_file}")
+        return True
         
     def save_playlist(self):
         """保存播放列表到文件"""
-        if self.playlist_widget.count() == 0:
+        if self.playlist_model.rowCount() == 0:
             QMessageBox.information(self, "提示", "播放列表为空")
             return
             
@@ -9177,44 +13492,38 @@ class MusicPlayerApp(QMainWindow):
         file_path, _ = QFileDialog.getSaveFileName(
             self, 
             "保存播放列表", 
-            os.path.join(playlist_dir, "我的播放列表.json"), 
-            "JSON播放列表 (*.json);;所有文件 (*.*)"
+            os.path.join(playlist_dir, "我的播放列表.m3u8"), 
+            PLAYLIST_FILE_FILTER
         )
         
         if not file_path:
             return
             
-        try:
-            playlist_data = {"default": []}
-            
-            # 收集当前播放列表中的所有歌曲
-            for i in range(self.playlist_widget.count()):
-                item = self.playlist_widget.item(i)
-                song_path = item.data(Qt.UserRole)
-                song_name = item.text()
-                playlist_data["default"].append({
-                    "name": song_name,
-                    "path": song_path
-                })
-            
-            # 保存到文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(playlist_data, f, ensure_ascii=False, indent=4)
-                
+        # 按扩展名选择格式，在后台逐条写出
+        songs = [{"name": song["name"], "path": song["path"]} for song in self.playlist_model.songs]
+
+        def on_done(count):
             QMessageBox.information(self, "成功", f"播放列表已保存到:\n{file_path}")
-            logger.info(f"播放列表已保存: {file_path}")
-        except Exception as e:
-            logger.error(f"保存播放列表失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"保存播放列表失败:\n{str(e)}")
+            logger.info(f"播放列表已保存: {file_path}，共 {count} 首")
+
+        def on_error(error):
+            logger.error(f"保存播放列表失败: {str(error)}")
+            QMessageBox.critical(self, "错误", f"保存播放列表失败:\n{str(error)}")
+
+        self.task_manager.submit(
+            lambda token: write_playlist_file(file_path, iter_export_entries(songs, self.library)),
+            "playlist_io", TaskManager.PRIORITY_USER, name=f"导出播放列表: {os.path.basename(file_path)}",
+            on_done=on_done, on_error=on_error
+        )
 
             
     def clear_playlist(self):
         """清空播放列表"""
-        self.playlist_widget.clear()
+        self.playlist_model.clear()
         self.media_player.stop()
         self.status_bar.showMessage("播放列表已清空")
         logger.info("播放列表已清空")
-        self.save_playlist_to_json()
+        self.playlist_store.set("default", [])
     
     def open_playlist_file(self):
         """打开播放列表文件对话框"""
@@ -9224,52 +13533,78 @@ class MusicPlayerApp(QMainWindow):
             self, 
             "打开播放列表", 
             playlist_dir, 
-            "JSON播放列表 (*.json);;所有文件 (*.*)"
+            PLAYLIST_FILE_FILTER
         )
         
         if not file_path:
             return
+        if playlist_format(file_path) != "json":
+            # 其他播放器的播放列表导入为当前播放列表
+            self.import_playlist_file(file_path, replace=True)
+            return
             
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                playlists = json.load(f)
+            store = get_playlist_store(file_path)
             
             # 加载播放列表
-            default_playlist = playlists.get("default", [])
-            self.playlist_widget.clear()
-            
-            for song_info in default_playlist:
+            songs = []
+            for song_info in store.get("default"):
+                if not isinstance(song_info, dict):
+                    song_info = {"path": song_info}
                 song_path = song_info.get("path", "")
-                song_name = song_info.get("name", os.path.basename(song_path))
-                
                 if os.path.exists(song_path):
-                    item = QListWidgetItem(song_name)
-                    item.setData(Qt.UserRole, song_path)
-                    self.playlist_widget.addItem(item)
-                    try:
-                        logger.info(f"加载到播放列表: {song_name}")
-                    except UnicodeEncodeError:
-                        logger.info("加载到播放列表: [包含非ASCII字符的歌曲名称]")
+                    songs.append({"path": song_path, "name": song_info.get("name", os.path.basename(song_path))})
                 else:
                     logger.warning(f"文件不存在，跳过加载: {song_path}")
+            self.playlist_model.reset(songs)
             
-            self.status_bar.showMessage(f"已加载 {self.playlist_widget.count()} 首歌曲")
+            self.status_bar.showMessage(f"已加载 {self.playlist_model.rowCount()} 首歌曲")
             QMessageBox.information(self, "成功", f"播放列表已加载:\n{file_path}")
             logger.info(f"成功加载播放列表: {file_path}")
             
             # 设置当前播放列表文件
             self.playlist_file = file_path
+            self.playlist_store = store
             
         except Exception as e:
             logger.error(f"加载播放列表失败: {str(e)}")
             QMessageBox.critical(self, "错误", f"加载播放列表失败:\n{str(e)}")
+
+    def import_playlist_file(self, file_path, replace=False):
+        """后台流式导入 M3U/PLS/XSPF/JSON 播放列表，解析出的歌曲按批加入当前播放列表"""
+        if replace:
+            self.playlist_model.clear()
+            self.playlist_store.set("default", [])
+        thread = PlaylistImportThread(file_path, self.library, self)
+        thread.batch_ready.connect(self.add_many)
+        thread.import_finished.connect(
+            lambda found, missing, samples: self.on_playlist_imported(file_path, found, missing, samples)
+        )
+        thread.import_failed.connect(
+            lambda error: QMessageBox.critical(self, "错误", f"导入播放列表失败:\n{error}")
+        )
+        thread.finished.connect(thread.deleteLater)
+        self.task_manager.start_thread(
+            thread, "playlist_io", TaskManager.PRIORITY_USER, name=f"导入播放列表: {os.path.basename(file_path)}"
+        )
+        self.status_bar.showMessage(f"正在导入播放列表: {os.path.basename(file_path)}")
+
+    def on_playlist_imported(self, file_path, found, missing, samples):
+        self.status_bar.showMessage(f"播放列表导入完成: 找到 {found} 首，未找到 {missing} 首")
+        if missing:
+            more = f"\n……等共 {missing} 条，完整列表见日志" if missing > len(samples) else ""
+            QMessageBox.warning(
+                self, "部分歌曲未找到",
+                f"{os.path.basename(file_path)} 中有 {missing} 条未找到对应文件:\n" + "\n".join(samples) + more
+            )
     
-    
-    def play_playlist_item(self, item):
-        """播放播放列表中的歌曲"""
+    def play_playlist_item(self, index):
+        """播放播放列表中的歌曲，index 为播放列表模型中的 QModelIndex"""
         # 获取行号并保存为当前播放索引
-        self.current_play_index = self.playlist_widget.row(item)
-        song_path = item.data(Qt.UserRole)
+        self.current_play_index = index.row()
+        song_path = index.data(Qt.UserRole)
+        self.playing_search_results = False
+        self.prefetcher.schedule([])
         self.update_current_playlist()
         # 重置进度条
         self.progress_slider.setValue(0)
@@ -9278,51 +13613,82 @@ class MusicPlayerApp(QMainWindow):
         self.reset_lyrics()
         if not os.path.exists(song_path):
             QMessageBox.warning(self, "错误", "文件不存在，可能已被移动或删除")
-            self.playlist_widget.takeItem(self.playlist_widget.row(item))
-            self.save_playlist_to_json()
+            self.playlist_model.remove_row(self.playlist_model.row_of(song_path))
+            self.playlist_store.remove("default", [song_path])
             return
             
         try:
             self.current_song_path = song_path
             self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(song_path)))
-            self.media_player.setNotifyInterval(10)
-            settings = load_settings()
-            last_played = settings.get("last_played", {})
+            last_played = get_settings_store().get("last_played", {})
             if last_played.get("path") == song_path:
                 position = last_played.get("position", 0)
                 self.media_player.setPosition(position)
             self.media_player.play()
-            
-            self.play_button.setEnabled(True)
-            self.pause_button.setEnabled(True)
-            self.stop_button.setEnabled(True)
-
-            # 重置进度条
-            self.progress_slider.setValue(0)
-            self.current_time_label.setText("00:00")
-            self.total_time_label.setText("00:00")
-            
-            song_name = os.path.basename(song_path)
-            self.status_bar.showMessage(f"正在播放: {song_name}")
-            self.song_info.setText(f"<b>正在播放:</b> {song_name}")
-
-            # 高亮当前播放项
-            self.playlist_widget.setCurrentRow(self.current_play_index)
-
-            # 设置当前歌曲信息
-            self.current_song_info = {
-                'path': song_path,
-                'name': song_name,
-                'lrc': ''  # 初始化为空，后面会尝试加载本地歌词
-            }
-        
-            # +++ 新增: 检查本地歌词文件 +++
-            self.check_and_load_local_lyrics(song_path)
-            
+            if self.stream_url:
+                get_streaming_proxy().close(self.stream_url)
+                self.stream_url = None
+            self.show_playing_item(song_path)
             logger.info(f"播放播放列表歌曲: {song_path}")
         except Exception as e:
             logger.error(f"播放文件失败: {str(e)}")
             QMessageBox.critical(self, "播放错误", f"无法播放文件:\n{str(e)}")
+
+    def show_playing_item(self, song_path):
+        """更新界面为正在播放播放列表中的 song_path"""
+        self.play_button.setEnabled(True)
+        self.pause_button.setEnabled(True)
+        self.stop_button.setEnabled(True)
+
+        # 重置进度条
+        self.progress_slider.setValue(0)
+        self.current_time_label.setText("00:00")
+        self.total_time_label.setText("00:00")
+        
+        song_name = os.path.basename(song_path)
+        self.status_bar.showMessage(f"正在播放: {song_name}")
+        self.song_info.setText(f"<b>正在播放:</b> {song_name}")
+
+        # 高亮当前播放项
+        self.playlist_widget.setCurrentIndex(self.playlist_model.index(self.current_play_index))
+
+        # 设置当前歌曲信息
+        self.current_song_info = {
+            'path': song_path,
+            'name': song_name,
+            'lrc': ''  # 初始化为空，后面会尝试加载本地歌词
+        }
+    
+        # +++ 新增: 检查本地歌词文件 +++
+        self.check_and_load_local_lyrics(song_path)
+
+    def next_gapless_media(self):
+        """供无缝播放引擎预载的下一首，仅在播放播放列表歌曲时提供"""
+        if self.playlist_model.path_at(self.current_play_index) != self.current_song_path:
+            return None
+        next_index = self.get_next_song_index()
+        song_path = self.playlist_model.path_at(next_index)
+        if song_path is None:
+            return None
+        if not song_path.startswith(("http://", "https://")) and not os.path.exists(song_path):
+            return None
+        self.preloaded_play_index = next_index
+        return song_path
+
+    def on_gapless_track_changed(self, song_path):
+        """无缝播放引擎已切换到预载的下一首，只更新界面状态"""
+        index = self.preloaded_play_index
+        if self.playlist_model.path_at(index) != song_path:
+            # 预载后播放列表被修改过，按路径重新定位
+            index = self.playlist_model.row_of(song_path)
+            if index < 0:
+                index = self.current_play_index
+        self.current_play_index = index
+        self.preloaded_play_index = -1
+        self.current_song_path = song_path
+        self.reset_lyrics()
+        self.show_playing_item(song_path)
+        logger.info(f"无缝播放下一首: {song_path}")
         
     def reset_lyrics(self):
         """重置歌词状态"""
@@ -9330,32 +13696,23 @@ class MusicPlayerApp(QMainWindow):
         self.external_lyrics.update_lyrics("")  # 清空歌词窗口显示
 
     def update_current_playlist(self):
-        """更新当前播放列表状态"""
-        self.playlist = []
-        for i in range(self.playlist_widget.count()):
-            item = self.playlist_widget.item(i)
-            song_path = item.data(Qt.UserRole)
-            song_name = item.text()
-            self.playlist.append({
-                'path': song_path,
-                'name': song_name,
-                'artists': "未知艺术家"  # 播放列表中的歌曲可能没有艺术家信息
-            })
+        """更新当前播放列表状态（直接引用播放列表模型的条目，不再逐项复制）"""
+        self.playlist = self.playlist_model.songs
 
     def get_next_song_index(self):
         """根据播放模式获取下一首歌曲的索引"""
-        if self.playlist_widget.count() == 0:
+        if self.playlist_model.rowCount() == 0:
             return -1
         
         if self.play_mode == 2:  # 单曲循环
             return self.current_play_index
         if self.play_mode == 1:  # 随机播放
-            return random.randint(0, self.playlist_widget.count() - 1)
+            return random.randint(0, self.playlist_model.rowCount() - 1)
         # 顺序播放模式 - 直接递增索引
         next_index = self.current_play_index + 1
     
         # 检查是否超出范围
-        if next_index >= self.playlist_widget.count():
+        if next_index >= self.playlist_model.rowCount():
             # 根据设置决定是否循环播放
             if self.settings["other"]["repeat_mode"] == "all":
                 next_index = 0  # 循环到第一首
@@ -9366,37 +13723,35 @@ class MusicPlayerApp(QMainWindow):
         
     def get_prev_song_index(self):
         """根据播放模式获取上一首歌曲的索引"""
-        if self.playlist_widget.count() == 0:
+        if self.playlist_model.rowCount() == 0:
             return -1
         
         if self.play_mode == 2:  # 单曲循环
             return self.current_play_index
         elif self.play_mode == 1:  # 随机播放
-            return random.randint(0, self.playlist_widget.count() - 1)
+            return random.randint(0, self.playlist_model.rowCount() - 1)
         else:  # 顺序播放
             prev_index = self.current_play_index - 1
-            return prev_index if prev_index >= 0 else self.playlist_widget.count() - 1
+            return prev_index if prev_index >= 0 else self.playlist_model.rowCount() - 1
         
     def play_previous(self):
         """播放上一首歌曲"""
-        if self.playlist_widget.count() == 0:
+        if self.playlist_model.rowCount() == 0:
             return
             
         prev_index = self.get_prev_song_index()
-        if 0 <= prev_index < self.playlist_widget.count():
-            item = self.playlist_widget.item(prev_index)
-            self.play_playlist_item(item)
+        if 0 <= prev_index < self.playlist_model.rowCount():
+            self.play_playlist_item(self.playlist_model.index(prev_index))
 
     
     def play_next(self):
         """播放下一首歌曲"""
-        if self.playlist_widget.count() == 0:
+        if self.playlist_model.rowCount() == 0:
             return
             
         next_index = self.get_next_song_index()
-        if 0 <= next_index < self.playlist_widget.count():
-            item = self.playlist_widget.item(next_index)
-            self.play_playlist_item(item)
+        if 0 <= next_index < self.playlist_model.rowCount():
+            self.play_playlist_item(self.playlist_model.index(next_index))
 
     def handle_media_status_changed(self, status):
         """处理媒体状态变化"""
@@ -9406,7 +13761,10 @@ class MusicPlayerApp(QMainWindow):
                 self.load_lyrics_for_song(self.current_song_path)
         elif status == QMediaPlayer.EndOfMedia:
             # 播放完成，自动播放下一首
-            self.play_next()
+            if self.playing_search_results:
+                self.play_next_song()
+            else:
+                self.play_next()
 
     def save_play_position(self):
         """保存当前播放位置"""
@@ -9418,88 +13776,74 @@ class MusicPlayerApp(QMainWindow):
             if hasattr(self, 'current_song_info'):
                 self.current_song_info['last_position'] = position
                 
-            # 保存到设置
-            settings = load_settings()
-            settings["last_played"] = {
+            # 保存到设置（内存写入，防抖落盘）
+            get_settings_store().set("last_played", {
                 "path": self.current_song_path,
                 "position": position
-            }
-            save_settings(settings)
+            })
             logger.info(f"保存播放位置: {position}ms")
 
     def change_play_mode(self, index):
         """更改播放模式"""
         self.play_mode = index
-        settings = load_settings()
-        settings["other"]["playback_mode"] = ["list", "random", "single"][index]
-        save_settings(settings)
+        # 已预载/预取的下一首按旧模式选出，需要重新选择
+        self.media_player.clear_preload()
+        self.random_plan = []
+        if self.playing_search_results:
+            self.schedule_prefetch()
+        get_settings_store().set("other.playback_mode", ["list", "random", "single"][index])
         modes = ["顺序播放", "随机播放", "单曲循环"]
         self.status_bar.showMessage(f"播放模式已切换为: {modes[index]}")
         logger.info(f"播放模式切换: {modes[index]}")
 
     def check_and_load_local_lyrics(self, song_path):
-        """检查并加载与歌曲同目录的歌词文件，并验证是否匹配"""
+        """从歌词库按内容指纹或标题 + 艺术家 + 时长加载歌词；歌词库中没有时导入同名 .lrc
+        或当前歌曲自带的网络歌词"""
         try:
             # 清空现有歌词
             self.reset_lyrics()
-            # 检查是否存在同名的.lrc文件
-            base_path = os.path.splitext(song_path)[0]
-            lrc_path = f"{base_path}.lrc"
-            
-            if os.path.exists(lrc_path):
-                logger.info(f"检测到本地歌词文件: {lrc_path}")
+            store = get_lyrics_store()
+            cached = store.get_for_file(song_path, self.current_song_info)
+
+            # 同名 .lrc（同目录或歌词目录）优先，用户编辑后立即生效；内容有变化时同步到歌词库，
+            # 之后重命名或移动音频也能找到
+            lrc_path = find_lyrics_file(song_path)
+            if lrc_path:
                 with open(lrc_path, 'r', encoding='utf-8') as f:
                     lyrics_text = f.read()
-                    self.lyrics_sync.load_lyrics(lyrics_text)
-                    logger.info(f"成功加载本地歌词文件: {lrc_path}")
-                    return True
-            else:
-                logger.info(f"未找到本地歌词文件: {lrc_path}")
-                # 尝试从网络获取歌词（如果歌曲信息中有歌词内容）
-                if hasattr(self, 'current_song_info') and 'lrc' in self.current_song_info:
-                    self.lyrics_sync.load_lyrics(self.current_song_info['lrc'])
-                    return True
-                return False
+                if not cached or cached[0] != lyrics_text:
+                    store.put_for_file(song_path, lyrics_text, cached[1] if cached else "",
+                                       song_info=self.current_song_info, source="file")
+                self.lyrics_sync.load_lyrics(lyrics_text, cached[1] if cached else "")
+                logger.info(f"成功加载本地歌词文件: {lrc_path}")
+                return True
+
+            if cached:
+                self.lyrics_sync.load_lyrics(*cached)
+                logger.info(f"从歌词库加载歌词: {song_path}")
+                return True
+
+            # 歌曲信息自带的网络歌词，缓存一次供同一首歌的所有副本使用
+            song_info = self.current_song_info or {}
+            lyrics_text, translation = song_info.get('lrc', ''), song_info.get('translation', '')
+            if lyrics_text:
+                if get_settings_store().get_bool("lyrics.auto_save", True):
+                    store.put_for_file(song_path, lyrics_text, translation, song_info=song_info, source="network")
+                self.lyrics_sync.load_lyrics(lyrics_text, translation)
+                logger.info("从网络获取歌词内容")
+                return True
+            logger.info(f"未找到歌词: {song_path}")
+            return False
                 
         except Exception as e:
             logger.error(f"加载本地歌词失败: {str(e)}")
             self.external_lyrics.update_lyrics(f"歌词加载错误: {str(e)}")
             return False
-        
-    def is_lyrics_valid_for_song(self, lyrics_text, song_hash):
-        """
-        验证歌词是否属于当前歌曲
-        策略：检查歌词中是否包含歌曲名或艺术家名
-        """
-        if not hasattr(self, 'current_song_info') or not self.current_song_info:
-            return False
-            
-        # 从歌词中提取可能的歌曲标识信息
-        song_name = self.current_song_info.get('name', '').lower()
-        artist_name = self.current_song_info.get('artists', '').lower()
-        
-        # 如果歌曲名或艺术家名为空，认为匹配
-        if not song_name and not artist_name:
-            return True
-            
-        # 检查歌词中是否包含歌曲名或艺术家名
-        lyrics_lower = lyrics_text.lower()
-        
-        # 如果歌词中包含歌曲名，认为匹配
-        if song_name and song_name in lyrics_lower:
-            return True
-            
-        # 如果歌词中包含艺术家名，认为匹配
-        if artist_name and artist_name in lyrics_lower:
-            return True
-            
-        # 都不包含，则认为不匹配
-        return False
 
     def show_playlist_menu(self, pos):
         """显示播放列表的右键菜单"""
-        item = self.playlist_widget.itemAt(pos)
-        if not item:
+        index = self.playlist_widget.indexAt(pos)
+        if not index.isValid():
             return
             
         menu = QMenu(self)
@@ -9515,31 +13859,31 @@ class MusicPlayerApp(QMainWindow):
         """)
         
         play_action = QAction("播放", self)
-        play_action.triggered.connect(lambda: self.play_playlist_item(item))
+        play_action.triggered.connect(lambda: self.play_playlist_item(index))
         menu.addAction(play_action)
         
         remove_action = QAction("移除", self)
-        remove_action.triggered.connect(lambda: self.remove_playlist_item(item))
+        remove_action.triggered.connect(lambda: self.remove_playlist_item(index))
         menu.addAction(remove_action)
         
         menu.addSeparator()
         
         open_folder_action = QAction("打开所在文件夹", self)
-        open_folder_action.triggered.connect(lambda: self.open_song_folder(item))
+        open_folder_action.triggered.connect(lambda: self.open_song_folder(index))
         menu.addAction(open_folder_action)
         
         menu.exec_(self.playlist_widget.mapToGlobal(pos))
     
-    def remove_playlist_item(self, item):
+    def remove_playlist_item(self, index):
         """从播放列表中移除歌曲"""
-        row = self.playlist_widget.row(item)
-        self.playlist_widget.takeItem(row)
-        logger.info(f"从播放列表移除: {item.text()}")
-        self.save_playlist_to_json()
+        song = self.playlist_model.remove_row(index.row())
+        if song:
+            logger.info(f"从播放列表移除: {song['name']}")
+            self.playlist_store.remove("default", [song["path"]])
     
-    def open_song_folder(self, item):
+    def open_song_folder(self, index):
         """打开歌曲所在文件夹"""
-        song_path = item.data(Qt.UserRole)
+        song_path = index.data(Qt.UserRole)
         folder_path = os.path.dirname(song_path)
         
         if os.path.exists(folder_path):
@@ -9573,15 +13917,18 @@ class MusicPlayerApp(QMainWindow):
         dialog = ToolsDialog(self)
         dialog.exec_()
 
-    def remove_search_worker(self):
-        if self.search_worker in self.active_threads:
-            self.active_threads.remove(self.search_worker)
-        self.search_worker = None
-        
     def remove_download_worker(self):
-        if self.download_worker in self.active_threads:
-            self.active_threads.remove(self.download_worker)
-        self.download_worker = None   
+        self.download_worker = None
+
+    def start_download_worker(self, url, file_path, priority=TaskManager.PRIORITY_USER):
+        """通过任务管理器启动 self.download_worker 的下载（请求头按当前歌曲所属音源选择）"""
+        worker = self.download_worker
+        source = get_song_request_source(self.current_song_info)
+        self.task_manager.start_thread(
+            worker, "download", priority,
+            name=f"下载: {os.path.basename(file_path)}",
+            start=lambda: worker.download_song(url, file_path, source),
+        )
 
     def closeEvent(self, event):
         """重写关闭事件，确保窗口能被完全关闭"""
@@ -9614,7 +13961,7 @@ class MusicPlayerApp(QMainWindow):
 
         # 先断开所有信号连接
         try:
-            self.media_player.positionChanged.disconnect(self.lyrics_sync.update_position)
+            self.playback_clock.tick.disconnect(self.lyrics_sync.update_position)
         except:
             pass
             
@@ -9626,7 +13973,7 @@ class MusicPlayerApp(QMainWindow):
         # 关闭歌词窗口前断开信号连接
         if hasattr(self, 'lyrics_sync'):
             try:
-                self.media_player.positionChanged.disconnect(self.lyrics_sync.update_position)
+                self.playback_clock.tick.disconnect(self.lyrics_sync.update_position)
             except:
                 pass
             
@@ -9637,8 +13984,8 @@ class MusicPlayerApp(QMainWindow):
             self.external_lyrics.deleteLater()
             self.external_lyrics = None
             
-        # 终止所有线程
-        self.terminate_all_threads()
+        # 取消所有后台任务，限时等待其收尾
+        self.task_manager.shutdown(get_settings_store().get_float("tasks.shutdown_deadline", 5.0))
         
         # 停止媒体播放器
         self.media_player.stop()
@@ -9650,26 +13997,35 @@ class MusicPlayerApp(QMainWindow):
         if hasattr(self, 'log_console') and self.log_console:
             self.log_console.close()
      
-        # 保存播放列表
-        self.save_playlist_to_json()
+        # 把播放列表日志合并进快照
+        self.playlist_store.close()
+
+        # 把尚未落盘的设置立即写入
+        get_settings_store().flush()
+        self.cover_service.shutdown()
+        # 取消尚未完成的协程并停止异步运行时
+        get_async_runtime().shutdown()
     
         event.accept()
+
+    def on_settings_changed(self, key_path):
+        """设置服务中的数据变化后刷新窗口持有的设置副本：只复制变化的键，整体替换时才取完整快照"""
+        if not key_path:
+            self.settings = load_settings()
+            return
+        parts = key_path.split(".")
+        node = self.settings
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        node[parts[-1]] = get_settings_store().get(key_path)
    
-    def terminate_all_threads(self):
-        """终止所有运行中的线程"""
-        logger.info("终止所有运行中的线程")
-        threads_to_terminate = self.active_threads.copy()
-        for thread in threads_to_terminate:
-            if thread and thread.isRunning():
-                logger.debug(f"终止线程: {thread.__class__.__name__}")
-                thread.requestInterruption()
-                thread.quit()
-                if not thread.wait(2000):
-                    thread.terminate()
-                    thread.wait()
-                if thread in self.active_threads:
-                    self.active_threads.remove(thread)
-        
+    def open_task_monitor(self):
+        """打开任务监视器"""
+        dialog = TaskMonitorDialog(self)
+        dialog.exec_()
+
     def open_log_console(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("日志控制台")
@@ -9791,7 +14147,7 @@ class MusicPlayerApp(QMainWindow):
                     border-radius: 4px;
                 }}
             
-                QListWidget#playlistWidget {{
+                QListView#playlistWidget {{
                     background-color: rgba(45, 45, 48, 150);
                     color: #e0e0e0;
                     border: 1px solid rgba(63, 63, 70, 100);
@@ -9861,26 +14217,14 @@ class MusicPlayerApp(QMainWindow):
         
     def setup_connections(self):
         self.media_player.stateChanged.connect(self.update_button_states)
-        self.media_player.positionChanged.connect(self.update_progress)
+        self.media_player.positionChanged.connect(self.sync_room_position)
         self.local_file_button.clicked.connect(self.play_custom_file)
         self.media_player.stateChanged.connect(self.handle_player_state_changed)
         self.media_player.mediaStatusChanged.connect(self.handle_media_status_changed)
 
-    def remove_thread(self, thread):
-        """安全地从活动线程列表中移除线程"""
-        try:
-            if thread and thread in self.active_threads:
-                self.active_threads.remove(thread)
-        except ValueError:
-            # 线程可能已经被移除
-            logger.debug(f"尝试移除不在列表中的线程: {thread}")
-        except Exception as e:
-            logger.error(f"移除线程时出错: {str(e)}")
-    
-    def remove_search_worker(self):
-        """移除搜索线程"""
-        if self.search_worker:
-            self.remove_thread(self.search_worker)
+    def remove_search_worker(self, worker=None):
+        """搜索线程结束后清除引用（新的搜索可能已经替换了它）"""
+        if worker is None or worker is self.search_worker:
             self.search_worker = None
 
     def start_search(self):
@@ -9900,37 +14244,53 @@ class MusicPlayerApp(QMainWindow):
             logger.warning("搜索请求: 未输入关键词")
             return
         self.playlist = self.search_results if self.search_results else []
-        self.settings["sources"]["active_source"] = self.source_combo.currentText()
-        save_settings(self.settings)
+        federated = self.source_combo.currentText() == FEDERATED_SOURCE_NAME
+        if not federated:
+            self.settings["sources"]["active_source"] = self.source_combo.currentText()
+            get_settings_store().set("sources.active_source", self.source_combo.currentText())
         logger.info(f"开始搜索: {keyword}")
         self.status_bar.showMessage("搜索中...")
         self.results_list.clear()
         self.song_info.clear()
         self.external_lyrics.update_lyrics("")
         self.download_button.setEnabled(False)
-        self.search_worker = MusicWorker()
-        self.active_threads.append(self.search_worker)
-        self.search_worker.search_finished.connect(self.display_search_results)
-        self.search_worker.error_occurred.connect(self.display_error)
-        self.search_worker.finished.connect(lambda: self.remove_thread(self.search_worker)) 
-        self.search_worker.search_songs(keyword)
-
-    def update_progress(self, position):
-        """更新进度条显示"""
-        if self.room_manager.current_room:
-            # 每5秒同步一次进度
-            if position % 5000 < 100:
-                self.room_manager.send_playback_command("seek", position=position)
-        if self.media_player.duration() > 0:
-            # 计算当前播放进度的百分比（0-1000）
-            progress = int(1000 * position / self.media_player.duration())
-            self.progress_slider.setValue(progress)
-        
-            # 更新时间显示
-            self.current_time_label.setText(self.format_time(position))
-            self.total_time_label.setText(self.format_time(self.media_player.duration()))
+        # 新的搜索取代尚未结束的旧搜索
+        if self.search_worker is not None:
+            self.task_manager.cancel_thread(self.search_worker)
+        worker = MusicWorker()
+        self.search_worker = worker
+        worker.search_finished.connect(self.display_search_results)
+        worker.error_occurred.connect(self.display_error)
+        worker.finished.connect(lambda: self.remove_search_worker(worker))
+        if federated:
+            start = lambda: worker.search_all_sources(keyword)
+        else:
+            start = lambda: worker.search_songs(keyword)
+        self.task_manager.start_thread(worker, "search", name=f"搜索: {keyword}", start=start)
+
+    def sync_room_position(self, position):
+        """在音乐室中每5秒同步一次进度（进度条由播放时钟统一刷新）"""
+        if not self.room_manager.current_room:
+            return
+        now = time.monotonic()
+        if now - getattr(self, 'last_room_sync_time', 0) < 5:
+            return
+        self.last_room_sync_time = now
+        self.room_manager.send_playback_command("seek", position=position)
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.update_clock_activity()
+        super().changeEvent(event)
+
+    def update_clock_activity(self):
+        """主窗口最小化且桌面歌词、悬浮窗都不需要刷新时挂起播放时钟"""
+        if not hasattr(self, 'playback_clock'):
+            return
+        lyrics_enabled = hasattr(self, 'lyrics_sync') and self.lyrics_sync.enabled
+        needs_frames = not self.isMinimized() or lyrics_enabled or bool(self.float_window)
+        self.playback_clock.set_suspended(not needs_frames)
 
-        
     def display_search_results(self, songs):
         if not songs:
             self.status_bar.showMessage("未找到相关歌曲")
@@ -9938,68 +14298,60 @@ class MusicPlayerApp(QMainWindow):
             return
         logger.info(f"显示搜索结果: 共 {len(songs)} 首")
         self.status_bar.showMessage(f"找到 {len(songs)} 首歌曲")
-        self.search_results = songs
-        self.results_list.clear()
 
-        # 获取当前音源
+        # 单音源搜索的结果也记下所属音源，详情和下载按歌曲自己的音源处理
         current_source = self.source_combo.currentText()
+        if current_source != FEDERATED_SOURCE_NAME:
+            for song in songs:
+                song.setdefault("source", current_source)
+
+        # 搜索线程会按排名分批发出结果，新结果以已显示结果为前缀时只追加新增部分
+        shown = len(self.search_results)
+        if (0 < shown <= len(songs) and self.results_list.count() == shown
+                and songs[:shown] == self.search_results):
+            start = shown
+        else:
+            start = 0
+            self.results_list.clear()
+            # 丢弃旧搜索结果中尚未等到封面的条目
+            self.cover_waiters = {key: items for key, items in self.cover_waiters.items() if key[1] != 100}
+        self.search_results = songs
+
+        for i, song in enumerate(songs[start:], start):
+            duration = self.format_time(song["duration"])
+            item_text = f"{i+1}. {song['name']} - {song['artists']} ({duration})"
+            item = QListWidgetItem(item_text)
+            item.setData(Qt.UserRole, i)
+            pic_url = song.get("pic", "")
+            # 网易云音源跳过专辑封面获取
+            if pic_url and song.get("source") != "网易云音乐":
+                self.set_item_cover(item, pic_url, 100)
+            self.results_list.addItem(item)
 
-        if current_source == "网易云音乐":
-            logger.info("网易云音源 - 跳过专辑封面获取")
-            for i, song in enumerate(songs):
-                duration = self.format_time(song["duration"])
-                item_text = f"{i+1}. {song['name']} - {song['artists']} ({duration})"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, i)
-                self.results_list.addItem(item)
+    def set_item_cover(self, item, pic_url, size):
+        """为列表项设置封面：缩略图已缓存时立即设置，否则等待封面服务下载完成"""
+        path = self.cover_service.request(pic_url, size)
+        if path:
+            item.setIcon(QIcon(path))
         else:
+            self.cover_waiters.setdefault((pic_url, size), []).append(item)
 
-            cache_dir = self.settings["save_paths"]["cache"]
-            if not os.path.exists(cache_dir):
-                os.makedirs(cache_dir, exist_ok=True)
-                logger.info(f"创建缓存目录: {cache_dir}")
-            for i, song in enumerate(songs):
-                duration = self.format_time(song["duration"])
-                item_text = f"{i+1}. {song['name']} - {song['artists']} ({duration})"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, i)
-                pic_url = song.get("pic", "")
-                if pic_url:
-                    try:
-                        songid = song.get("id", f"song_{i}")
-                        safe_songid = re.sub(r'[\\/*?:"<>|]', "", songid)
-                        image_path = os.path.join(cache_dir, f"{safe_songid}.jpg")
-                        if not os.path.exists(image_path):
-                            logger.info(f"下载专辑封面: {pic_url}")
-                            response = requests.get(pic_url, stream=True, timeout=10)
-                            if response.status_code == 200:
-                                with open(image_path, 'wb') as f:
-                                    for chunk in response.iter_content(1024):
-                                        f.write(chunk)
-                                logger.info(f"封面保存到: {image_path}")
-                            else:
-                                logger.warning(f"封面下载失败: HTTP {response.status_code}")
-                        if os.path.exists(image_path) and os.path.getsize(image_path) > 0:
-                            pixmap = QPixmap(image_path)
-                            if not pixmap.isNull():
-                                pixmap = pixmap.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                                item.setIcon(QIcon(pixmap))
-                            else:
-                                logger.warning(f"无效的图片文件: {image_path}")
-                        else:
-                            logger.warning(f"图片文件不存在或为空: {image_path}")
-                    except Exception as e:
-                        logger.error(f"加载专辑封面失败: {str(e)}")
-                self.results_list.addItem(item)
+    def on_cover_ready(self, pic_url, size, path):
+        """封面缩略图生成后更新等待中的列表项图标"""
+        icon = None
+        for item in self.cover_waiters.pop((pic_url, size), []):
+            try:
+                if icon is None:
+                    icon = QIcon(path)
+                item.setIcon(icon)
+            except RuntimeError:
+                # 列表已被清空，条目对象已销毁
+                pass
             
     def song_selected(self, item):
         index = item.data(Qt.UserRole)
-        if self.source_combo.currentText() == "网易云音乐":
-            song_id = item.data(Qt.UserRole)  
-            self.netease_worker.fetch_details(song_id)
-        else:
-            # 原有逻辑
-            pass
+        if index < len(self.search_results) and self.search_results[index].get("source") == "网易云音乐":
+            self.netease_worker.fetch_details(self.search_results[index]["id"])
         if index < len(self.search_results):
             self.current_song = self.search_results[index]
             logger.info(f"选择歌曲: {self.current_song['name']}")
@@ -10049,6 +14401,16 @@ class MusicPlayerApp(QMainWindow):
         self.song_info.setHtml(info_text)
         self.download_button.setEnabled(True)
         self.current_song_info = details
+        self.prefetch_netease_lyrics(details)
+
+    def prefetch_netease_lyrics(self, song_info):
+        """预取网易云歌曲的歌词存入歌词库和歌曲信息，开始播放时由 load_lyrics_for_song 加载"""
+        cached = get_lyrics_store().get(title=song_info.get('name', ''), artists=song_info.get('artists', ''),
+                                        duration=song_info.get('duration', 0))
+        if cached:
+            song_info['lrc'], song_info['translation'] = cached
+            return
+        self.load_lyrics_from_network(song_info)
 
     def handle_player_state_changed(self, state):
         """处理播放状态变化"""
@@ -10069,22 +14431,52 @@ class MusicPlayerApp(QMainWindow):
                 self.room_manager.send_playback_command("stop")
 
     def play_next_song(self):
+        """播放搜索结果列表中的下一首（与预取使用同一份播放计划）"""
         if not self.playlist:
             return
-        if self.repeat_mode == "single":
+        if self.play_mode == 2:  # 单曲循环
             self.play_song_by_index(self.current_play_index)
             return
-        if self.is_random_play:
-            next_index = random.randint(0, len(self.playlist) - 1)
+        if self.play_mode == 1:  # 随机播放
+            self.upcoming_search_indices()
+            next_index = self.random_plan.pop(0) if self.random_plan else random.randint(0, len(self.playlist) - 1)
         else:
             next_index = self.current_play_index + 1
             if next_index >= len(self.playlist):
-                if self.repeat_mode == "list":
-                    next_index = 0
-                else:
+                if self.settings["other"]["repeat_mode"] != "all":
                     self.stop_song()
                     return
+                next_index = 0
         self.play_song_by_index(next_index)
+
+    def upcoming_search_indices(self):
+        """按播放模式列出搜索结果列表中接下来要播放的歌曲索引"""
+        count = len(self.playlist)
+        lookahead = self.prefetcher.lookahead()
+        if not count or not lookahead or self.play_mode == 2:
+            return []
+        if self.play_mode == 1:
+            # 随机模式提前抽好后面几首，play_next_song 按同一顺序播放
+            self.random_plan = [index for index in self.random_plan if index < count]
+            while len(self.random_plan) < lookahead:
+                self.random_plan.append(random.randint(0, count - 1))
+            return self.random_plan[:lookahead]
+        indices = []
+        for step in range(1, lookahead + 1):
+            index = self.current_play_index + step
+            if index >= count:
+                if self.settings["other"]["repeat_mode"] != "all":
+                    break
+                index %= count
+            if index != self.current_play_index and index not in indices:
+                indices.append(index)
+        return indices
+
+    def schedule_prefetch(self):
+        """预取接下来几首远程歌曲到音频缓存"""
+        songs = [self.playlist[index] for index in self.upcoming_search_indices()]
+        urls = [song.get('url') for song in songs]
+        self.prefetcher.schedule(urls, {song.get('url'): get_song_request_source(song) for song in songs})
     
     def play_song_by_index(self, index):
         if index < 0 or index >= len(self.playlist):
@@ -10092,29 +14484,109 @@ class MusicPlayerApp(QMainWindow):
         self.current_play_index = index
         song = self.playlist[index]
         self.current_song_info = song
+        self.playing_search_results = True
         self.download_current_song_for_playback()
+        self.schedule_prefetch()
     
     def download_current_song_for_playback(self):
         if not self.current_song_info or 'url' not in self.current_song_info:
             return
+        url = self.current_song_info['url']
         default_name = f"{self.current_song_info['name']}.mp3".replace("/", "_").replace("\\", "_")
         file_path = os.path.join(self.settings["save_paths"]["music"], default_name)
-        if not os.path.exists(file_path):
-            self.download_worker = MusicWorker()
-            self.active_threads.append(self.download_worker)
-            self.download_worker.download_finished.connect(self.handle_download_for_playback)
-            self.download_worker.error_occurred.connect(self.display_error)
-            self.download_worker.download_song(self.current_song_info['url'], file_path)
-        else:
+        if os.path.exists(file_path):
             self.play_downloaded_song(file_path)
+            return
+        cached = self.audio_cache.get(url)
+        if cached:
+            self.play_downloaded_song(cached)
+            return
+        if self.prefetcher.is_running(url):
+            # 预取已经在下载这首，等它完成，避免两个下载写同一个文件
+            self.awaiting_prefetch_url = url
+            self.status_bar.showMessage("正在缓冲...")
+            return
+        self.prefetcher.cancel(url)
+        self.awaiting_prefetch_url = None
+        if get_settings_store().get_bool("streaming.enabled", True):
+            self.start_streaming_playback(url)
+        else:
+            self.start_playback_download(url)
+
+    def start_streaming_playback(self, url):
+        """边下边播：通过本机代理播放，数据到达即可开始播放，跳转时按需拉取"""
+        self.status_bar.showMessage("正在缓冲...")
+        proxy = get_streaming_proxy()
+        source = get_song_request_source(self.current_song_info)
+        self.task_manager.submit(
+            lambda token: proxy.open(url, self.audio_cache, source),
+            "playback", TaskManager.PRIORITY_PLAYBACK,
+            name=f"边下边播: {self.current_song_info.get('name', '')}",
+            on_done=lambda local_url: self.on_stream_ready(url, local_url),
+            on_error=lambda error: self.on_stream_failed(url, error),
+        )
+
+    def on_stream_ready(self, url, local_url):
+        if not self.current_song_info or self.current_song_info.get('url') != url:
+            # 已经切到别的歌曲
+            get_streaming_proxy().close(local_url)
+            return
+        self.play_downloaded_song(self.audio_cache.path_for(url), media_url=local_url)
+
+    def on_stream_failed(self, url, error):
+        logger.warning(f"边下边播不可用，改为完整下载后播放: {str(error)}")
+        if self.current_song_info and self.current_song_info.get('url') == url:
+            self.start_playback_download(url)
+
+    def start_playback_download(self, url):
+        """完整下载到音频缓存后再播放"""
+        # 试听下载只进音频缓存，用户点击下载时才保存到音乐库
+        self.download_worker = MusicWorker()
+        self.download_worker.download_finished.connect(self.handle_download_for_playback)
+        self.download_worker.error_occurred.connect(self.display_error)
+        # 播放所需的下载优先于其他任务
+        self.start_download_worker(url, self.audio_cache.path_for(url), TaskManager.PRIORITY_PLAYBACK)
     
     def handle_download_for_playback(self, file_path):
         self.play_downloaded_song(file_path)
+        self.audio_cache.evict()
+
+    def on_track_prefetched(self, url, file_path):
+        if url == self.awaiting_prefetch_url:
+            self.awaiting_prefetch_url = None
+            if self.current_song_info and self.current_song_info.get('url') == url:
+                self.play_downloaded_song(file_path)
+
+    def on_prefetch_failed(self, url):
+        # 正在等待的预取失败时改为直接下载
+        if url == self.awaiting_prefetch_url:
+            self.awaiting_prefetch_url = None
+            if self.current_song_info and self.current_song_info.get('url') == url:
+                self.download_current_song_for_playback()
+
+    def promote_cached_song(self, file_path):
+        """当前歌曲已在音频缓存中时直接复制到 file_path，免去重新下载"""
+        url = (self.current_song_info or {}).get('url')
+        try:
+            if url and self.audio_cache.promote(url, file_path):
+                self.download_completed(file_path)
+                return True
+        except OSError as e:
+            logger.warning(f"从缓存保存歌曲失败，改为重新下载: {str(e)}")
+        return False
     
-    def play_downloaded_song(self, file_path):
+    def play_downloaded_song(self, file_path, media_url=None):
+        """播放本地文件；media_url 为边下边播代理地址时从代理读取"""
         self.current_song_path = file_path
-        self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(file_path)))
+        if media_url:
+            self.media_player.setMedia(QMediaContent(QUrl(media_url)))
+        else:
+            self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(file_path)))
         self.media_player.play()
+        # 播放器已切走，关闭上一首的边下边播会话
+        if self.stream_url and self.stream_url != media_url:
+            get_streaming_proxy().close(self.stream_url)
+        self.stream_url = media_url
         
         # 重置进度条
         self.progress_slider.setValue(0)
@@ -10159,26 +14631,22 @@ class MusicPlayerApp(QMainWindow):
         self.progress_dialog.setAutoReset(True)
         self.progress_dialog.canceled.connect(self.cancel_download)
         self.progress_dialog.show()
+        if self.promote_cached_song(file_path):
+            return
         self.download_worker = MusicWorker()
-        self.active_threads.append(self.download_worker)
         self.download_worker.download_progress.connect(self.update_download_progress)
         self.download_worker.download_finished.connect(self.download_completed)
-        self.download_worker.finished.connect(lambda: self.remove_thread(self.download_worker))
         self.download_worker.finished.connect(self.remove_download_worker)
-        self.download_worker.download_song(self.current_song_info['url'], file_path)
+        self.start_download_worker(self.current_song_info['url'], file_path)
         
     def update_download_progress(self, progress):
         self.progress_dialog.setValue(progress)
         
     def cancel_download(self):
         logger.warning("下载取消: 用户取消")
-        if hasattr(self, 'download_worker') and self.download_worker and self.download_worker.isRunning():
-            self.download_worker.requestInterruption()
-            self.download_worker.quit()
-            self.download_worker.wait(1000)
-            if self.download_worker.isRunning():
-                self.download_worker.terminate()
-                self.download_worker.wait()
+        if hasattr(self, 'download_worker') and self.download_worker:
+            # 下载循环会在下一个数据块前退出，已下载的分段保留用于续传
+            self.task_manager.cancel_thread(self.download_worker)
         self.status_bar.showMessage("下载已取消")
         
     def download_completed(self, file_path):
@@ -10428,8 +14896,7 @@ class MusicPlayerApp(QMainWindow):
                 self.running = False
                 # 发送一个终止信号
                 try:
-                    import requests
-                    requests.get(f"http://localhost:{self.port}/shutdown", timeout=1)
+                    get_http_pool().get(f"http://localhost:{self.port}/shutdown", timeout=1, retries=0)
                 except:
                     pass
 
@@ -10480,6 +14947,9 @@ class MusicPlayerApp(QMainWindow):
                 self.play_file_remote(event.file_path)
             elif isinstance(event, SwitchDeviceEvent):
                 self.switch_playback_device(event.device)
+            elif isinstance(event, SearchEvent):
+                self.search_input.setText(event.keyword)
+                self.start_search()
             return super().event(event)
         except KeyboardInterrupt:
             # 优雅地处理键盘中断
@@ -10511,7 +14981,12 @@ class MusicPlayerApp(QMainWindow):
         }
 
     def list_directory(self, path):
-        """列出目录内容"""
+        """列出目录内容，已索引的目录直接读取媒体库，不再扫描文件系统"""
+        listing = self.library.list_directory(path)
+        if listing is not None:
+            dirs, tracks = listing
+            return ([{"name": os.path.basename(d), "type": "directory", "path": d} for d in dirs] +
+                    [{"name": t["name"], "type": "file", "path": t["path"]} for t in tracks])
         if not os.path.exists(path):
             return []
             
@@ -10533,14 +15008,24 @@ class MusicPlayerApp(QMainWindow):
         return items
 
     def search_songs_remote(self, keyword):
-        """远程搜索歌曲"""
-        self.search_input.setText(keyword)
-        self.start_search()
-        # 等待搜索完成
-        time.sleep(1)
+        """远程搜索歌曲：优先使用搜索缓存，未命中时在请求线程中直接搜索"""
+        store = get_settings_store()
+        config = store.active_source_config()
+        max_results = store.get_int("other.max_results", 20)
+        cached = get_search_cache().get(config.get("name", ""), keyword, 1, max_results)
+        if cached is not None:
+            results = cached[0]
+        else:
+            try:
+                results = SourceSearcher().search_source_cached(config, keyword, max_results, emit_partial=False)
+            except Exception as e:
+                logger.error(f"远程搜索失败: {str(e)}")
+                results = []
+        # 同步到桌面端搜索列表（主线程中执行，会命中刚写入的缓存）
+        self.post_event(SearchEvent(keyword))
         return {
-            "results": self.search_results,
-            "count": len(self.search_results)
+            "results": results,
+            "count": len(results)
         }
 
     def download_song_remote(self, song_id, url):
@@ -10563,31 +15048,24 @@ class MusicPlayerApp(QMainWindow):
     
     def get_playlist_for_remote(self):
         """获取播放列表（简化版）"""
-        playlist = []
-        for i in range(self.playlist_widget.count()):
-            item = self.playlist_widget.item(i)
-            playlist.append({
-                "name": item.text(),
-                "path": item.data(Qt.UserRole)
-            })
-        return playlist
+        return [{"name": song["name"], "path": song["path"]} for song in self.playlist_model.songs]
     
     def add_to_playlist_remote(self, song_path):
         """远程添加到播放列表"""
         if os.path.exists(song_path):
             song_name = os.path.basename(song_path)
-            item = QListWidgetItem(song_name)
-            item.setData(Qt.UserRole, song_path)
-            self.playlist_widget.addItem(item)
-            return True
+            if self.playlist_model.append(song_path, song_name):
+                self.playlist_store.add("default", [{"name": song_name, "path": song_path}])
+                return True
         return False
     
     def remove_from_playlist_remote(self, index):
         """从播放列表移除歌曲"""
-        if 0 <= index < self.playlist_widget.count():
-            self.playlist_widget.takeItem(index)
-            return True
-        return False
+        song = self.playlist_model.remove_row(index)
+        if song is None:
+            return False
+        self.playlist_store.remove("default", [song["path"]])
+        return True
 
     def set_sleep_timer(self, minutes):
         """设置睡眠定时器"""
@@ -10657,9 +15135,14 @@ class MusicPlayerApp(QMainWindow):
         if not path.startswith(music_dir):
             return {"error": "访问受限"}
             
+        listing = self.library.list_directory(path)
+        if listing is not None:
+            files = [{"name": t["name"], "path": t["path"], "size": t["size"]} for t in listing[1]]
+            return {"path": path, "files": files}
+
         if not os.path.exists(path):
             return {"error": "路径不存在"}
-            
+
         files = []
         for entry in os.listdir(path):
             full_path = os.path.join(path, entry)
@@ -11275,63 +15758,38 @@ class MusicRoomServer(QObject):
     def is_running(self):
         return self.running
         
-    def run(self):
-        """运行服务器（在独立线程中调用）"""
+    def start(self):
+        """在全局异步运行时中启动服务器"""
+        runtime = get_async_runtime()
+        self.loop = runtime.loop
+        runtime.submit(self.serve())
+
+    async def serve(self):
+        """启动 WebSocket 服务并一直等待到服务器关闭"""
         try:
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            
-            # 创建服务器并显式传递事件循环
-            start_server = websockets.serve(
-                self.handle_connection, 
-                "0.0.0.0", 
-                self.port,
-                loop=self.loop  # 显式传递事件循环
-            )
-            
-            # 启动服务器并等待其准备就绪
-            self.server = self.loop.run_until_complete(start_server)
+            self.server = await websockets.serve(self.handle_connection, "0.0.0.0", self.port)
             self.running = True
             self.started.emit(self.port)
-            
             logger.info(f"音乐室服务器已启动，端口: {self.port}")
-            
-            # 运行事件循环
-            self.loop.run_forever()
-            
+            await self.server.wait_closed()
+        except asyncio.CancelledError:
+            if self.server:
+                self.server.close()
+            raise
         except Exception as e:
-            self.running = False
             self.error_occurred.emit(str(e))
             logger.error(f"音乐室服务器错误: {str(e)}\n{traceback.format_exc()}")
         finally:
-            # 清理资源
-            if self.loop and not self.loop.is_closed():
-                try:
-                    # 关闭所有WebSocket连接
-                    if self.server:
-                        self.loop.run_until_complete(self.server.close())
-                        self.loop.run_until_complete(self.server.wait_closed())
-                    
-                    # 取消所有任务
-                    tasks = asyncio.all_tasks(self.loop)
-                    for task in tasks:
-                        task.cancel()
-                    # 等待任务完成
-                    self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
-                    
-                    # 关闭事件循环
-                    self.loop.close()
-                except:
-                    pass
-                
+            self.server = None
             self.running = False
             self.stopped.emit()
-            logger.info("音乐室服务器已关闭") 
+            logger.info("音乐室服务器已关闭")
     
     def stop(self):
         """停止服务器"""
-        if self.running and self.loop:
-            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.running and self.server:
+            # 关闭监听与所有连接后 serve() 随之结束
+            get_async_runtime().call_soon(self.server.close)
             self.running = False
     
     async def handle_connection(self, websocket, path):
@@ -11573,6 +16031,8 @@ def draw_lyrics(
 
 # =============== 主程序入口 ===============
 if __name__ == "__main__":
+    # 打包后的程序中，元数据进程池的子进程从这里进入
+    multiprocessing.freeze_support()
     try:
         os.environ["QT_MULTIMEDIA_PREFERRED_PLUGINS"] = "windowsmediafoundation"
         app = QApplication(sys.argv)